@@ -0,0 +1,187 @@
+"""Baseline: the schema Base.metadata.create_all used to build
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Creates every table on an empty database. Every deployment so far was built
+by create_all at startup, which creates missing tables but never alters an
+existing one, so tables that already exist are completed instead: columns
+and indexes added to the models since the table was first created are added
+(NOT NULL columns are backfilled for the existing rows).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from geoalchemy2 import Geography
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _uuid():
+    return postgresql.UUID(as_uuid=True)
+
+
+def _location():
+    # geography(POINT, 4326) on PostGIS, EWKT text elsewhere (app.models.hazard.GeoPoint);
+    # the spatial index is created by 0002
+    return sa.Text().with_variant(Geography(geometry_type="POINT", srid=4326, spatial_index=False), "postgresql")
+
+
+def _users():
+    return [
+        sa.Column("user_id", _uuid(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.Column("token_version", sa.Integer, nullable=False, server_default="0"),
+    ]
+
+
+def _hazards():
+    return [
+        sa.Column("hazard_id", _uuid(), primary_key=True),
+        sa.Column("user_id", _uuid(), sa.ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False),
+        sa.Column("device_id", _uuid(), nullable=False),
+        sa.Column("hazard_type", sa.String(50)),
+        sa.Column("location", _location(), nullable=False),
+        sa.Column("latitude", sa.Float, nullable=False),
+        sa.Column("longitude", sa.Float, nullable=False),
+        sa.Column("confidence", sa.Float, nullable=False),
+        sa.Column("image_url", sa.Text),
+        sa.Column("original_image_url", sa.Text),
+        sa.Column("thumbnail_url", sa.Text),
+        sa.Column("medium_url", sa.Text),
+        sa.Column("content_hash", sa.String(64)),
+        sa.Column("detected_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("processing_attempts", sa.Integer, nullable=False),
+        sa.Column("processing_error", sa.Text),
+        sa.Column("canonical_id", _uuid(), sa.ForeignKey("hazards.hazard_id", ondelete="SET NULL")),
+        sa.Column("geohash", sa.String(12)),
+        sa.Column("report_count", sa.Integer, nullable=False),
+        sa.Column("aggregate_confidence", sa.Float),
+        sa.Column("last_reported_at", sa.DateTime(timezone=True)),
+        sa.CheckConstraint("confidence >= 0 AND confidence <= 1", name="confidence_range"),
+    ]
+
+
+def _image_objects():
+    return [
+        sa.Column("content_hash", sa.String(64), primary_key=True),
+        sa.Column("blurred_hash", sa.String(64)),
+        sa.Column("dhash", sa.BigInteger),
+        sa.Column("dhash_band0", sa.Integer),
+        sa.Column("dhash_band1", sa.Integer),
+        sa.Column("dhash_band2", sa.Integer),
+        sa.Column("dhash_band3", sa.Integer),
+        sa.Column("image_url", sa.Text, nullable=False),
+        sa.Column("thumbnail_url", sa.Text),
+        sa.Column("medium_url", sa.Text),
+        sa.Column("ref_count", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ]
+
+
+def _hazard_tile_cells():
+    return [
+        sa.Column("z", sa.SmallInteger, primary_key=True),
+        sa.Column("x", sa.Integer, primary_key=True),
+        sa.Column("y", sa.Integer, primary_key=True),
+        sa.Column("hazard_count", sa.Integer, nullable=False),
+        sa.Column("sum_latitude", sa.Float, nullable=False),
+        sa.Column("sum_longitude", sa.Float, nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    ]
+
+
+def _hazard_tombstones():
+    return [
+        sa.Column("hazard_id", _uuid(), primary_key=True),
+        sa.Column("latitude", sa.Float, nullable=False),
+        sa.Column("longitude", sa.Float, nullable=False),
+        sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=False),
+    ]
+
+
+# table: (columns, [(index name, columns, unique)], {column: value for existing rows})
+TABLES = {
+    "users": (_users, [
+        ("ix_users_email", ["email"], True),
+        ("ix_users_updated_at", ["updated_at"], False),
+    ], {}),
+    "hazards": (_hazards, [
+        ("ix_hazards_content_hash", ["content_hash"], False),
+        ("ix_hazards_status", ["status"], False),
+        ("ix_hazards_canonical_id", ["canonical_id"], False),
+        ("ix_hazards_geohash", ["geohash"], False),
+        ("ix_hazards_updated_at_hazard_id", ["updated_at", "hazard_id"], False),
+    ], {
+        # Hazards stored before background processing were uploaded synchronously
+        "status": sa.literal("ready"),
+        "processing_attempts": sa.literal(0),
+        "report_count": sa.literal(1),
+        "updated_at": sa.text("coalesce(created_at, CURRENT_TIMESTAMP)"),
+    }),
+    "image_objects": (_image_objects, [
+        ("ix_image_objects_blurred_hash", ["blurred_hash"], False),
+        ("ix_image_objects_dhash_band0", ["dhash_band0"], False),
+        ("ix_image_objects_dhash_band1", ["dhash_band1"], False),
+        ("ix_image_objects_dhash_band2", ["dhash_band2"], False),
+        ("ix_image_objects_dhash_band3", ["dhash_band3"], False),
+    ], {}),
+    "hazard_tile_cells": (_hazard_tile_cells, [], {}),
+    "hazard_tombstones": (_hazard_tombstones, [
+        ("ix_hazard_tombstones_deleted_at_hazard_id", ["deleted_at", "hazard_id"], False),
+    ], {}),
+}
+
+
+def _complete_table(name, columns, backfill):
+    """Add the columns an existing table is missing"""
+    bind = op.get_bind()
+    existing = {column["name"] for column in sa.inspect(bind).get_columns(name)}
+    for column in columns:
+        if not isinstance(column, sa.Column) or column.name in existing:
+            continue
+        if bind.dialect.name != "postgresql":
+            # SQLite adds no column with a foreign key or a non-constant default
+            default = column.server_default
+            if isinstance(getattr(default, "arg", None), sa.ClauseElement):
+                default = None
+            column = sa.Column(column.name, column.type, nullable=column.nullable, server_default=default)
+        required = not column.nullable and column.server_default is None
+        column.nullable = column.nullable or required
+        op.add_column(name, column)
+        if required:
+            op.execute(sa.table(name, sa.column(column.name)).update().values({column.name: backfill[column.name]}))
+            if bind.dialect.name == "postgresql":
+                op.alter_column(name, column.name, nullable=False)
+    if name == "hazards" and bind.dialect.name == "postgresql":
+        op.alter_column("hazards", "image_url", nullable=True)  # Set by the ingestion worker now
+
+
+def upgrade():
+    for name, (columns, indexes, backfill) in TABLES.items():
+        inspector = sa.inspect(op.get_bind())
+        if inspector.has_table(name):
+            _complete_table(name, columns(), backfill)
+            present = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(name)}
+        else:
+            op.create_table(name, *columns())
+            present = set()
+        for index_name, index_columns, unique in indexes:
+            if index_name not in present:
+                op.create_index(index_name, name, index_columns, unique=unique)
+
+
+def downgrade():
+    for name in reversed(list(TABLES)):
+        op.drop_table(name)
@@ -0,0 +1,62 @@
+"""Spatial and time indexes for the hazards table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+- ix_hazards_location_canonical: GIST on location for canonical hazards
+  (PostgreSQL). /nearby and /route filter on ST_DWithin and
+  canonical_id IS NULL, so duplicate reports stay out of the index. It
+  replaces the full idx_hazards_location that geoalchemy2 added to
+  databases created before location became a GeoPoint (fresh deploys had
+  none, and /nearby ran as a sequential scan).
+- ix_hazards_detected_at: retention scans and the partition key.
+- ix_hazards_user_id: the users ON DELETE CASCADE.
+
+On PostgreSQL the indexes are built CONCURRENTLY (outside a transaction) so
+a live table keeps taking writes; an invalid leftover of an interrupted
+build is dropped and rebuilt.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ("ix_hazards_location_canonical", "USING gist (location) WHERE canonical_id IS NULL"),
+    ("ix_hazards_detected_at", "(detected_at)"),
+    ("ix_hazards_user_id", "(user_id)"),
+)
+
+
+def _invalid(name):
+    return op.get_bind().execute(sa.text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index("ix_hazards_detected_at", "hazards", ["detected_at"], if_not_exists=True)
+        op.create_index("ix_hazards_user_id", "hazards", ["user_id"], if_not_exists=True)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            if _invalid(name):
+                op.execute(f"DROP INDEX CONCURRENTLY {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON hazards {definition}")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_hazards_location")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index("ix_hazards_user_id", "hazards")
+        op.drop_index("ix_hazards_detected_at", "hazards")
+        return
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -0,0 +1,59 @@
+"""hazards_archive: where the retention job moves stale hazards
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Same columns as hazards plus archived_at; no foreign keys or secondary
+indexes (archived rows are read rarely, by hazard_id). A column added to
+hazards later must be added here too (app.models.hazard.hazards_archive
+copies the hazards columns).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from geoalchemy2 import Geography
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table("hazards_archive"):
+        return  # Built by create_all
+    uuid = postgresql.UUID(as_uuid=True)
+    location = sa.Text().with_variant(Geography(geometry_type="POINT", srid=4326, spatial_index=False), "postgresql")
+    op.create_table(
+        "hazards_archive",
+        sa.Column("hazard_id", uuid, primary_key=True),
+        sa.Column("user_id", uuid, nullable=False),
+        sa.Column("device_id", uuid, nullable=False),
+        sa.Column("hazard_type", sa.String(50)),
+        sa.Column("location", location, nullable=False),
+        sa.Column("latitude", sa.Float, nullable=False),
+        sa.Column("longitude", sa.Float, nullable=False),
+        sa.Column("confidence", sa.Float, nullable=False),
+        sa.Column("image_url", sa.Text),
+        sa.Column("original_image_url", sa.Text),
+        sa.Column("thumbnail_url", sa.Text),
+        sa.Column("medium_url", sa.Text),
+        sa.Column("content_hash", sa.String(64)),
+        sa.Column("detected_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("processing_attempts", sa.Integer, nullable=False),
+        sa.Column("processing_error", sa.Text),
+        sa.Column("canonical_id", uuid),
+        sa.Column("geohash", sa.String(12)),
+        sa.Column("report_count", sa.Integer, nullable=False),
+        sa.Column("aggregate_confidence", sa.Float),
+        sa.Column("last_reported_at", sa.DateTime(timezone=True)),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table("hazards_archive")
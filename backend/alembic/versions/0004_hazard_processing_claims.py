@@ -0,0 +1,42 @@
+"""Processing claims: which process is working on a pending hazard
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+claimed_by / claimed_until on hazards (and hazards_archive, which copies
+the hazards columns). An ingestion worker claims a pending hazard with a
+conditional UPDATE before processing it, so two processes sharing a spool
+directory never blur and upload the same image twice.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+TABLES = ("hazards", "hazards_archive")
+
+
+def _columns():
+    return (
+        sa.Column("claimed_by", sa.String(64)),
+        sa.Column("claimed_until", sa.DateTime(timezone=True)),
+    )
+
+
+def upgrade():
+    for table in TABLES:
+        present = {column["name"] for column in sa.inspect(op.get_bind()).get_columns(table)}
+        for column in _columns():
+            if column.name not in present:  # Built by create_all
+                op.add_column(table, column)
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch:
+            for column in _columns():
+                batch.drop_column(column.name)
@@ -5,12 +5,37 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database (supports FREE options: Neon, Supabase, Railway PostgreSQL)
     DATABASE_URL: str
+    # Connection pools (one async pool for the API routes, one sync pool for
+    # worker threads; each gets these limits)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection (0 behind pgbouncer)
+    DB_MIGRATE_ON_STARTUP: bool = True  # alembic upgrade head when the API starts (False = run it as a deploy step)
 
     # Authentication
     JWT_SECRET_KEY: str
+    AUTH_MODE: str = "stateless"  # "stateless" (trust signed claims) or "database" (load the user on cache misses)
+    AUTH_CACHE_ENTRIES: int = 10000  # Verified tokens kept per process
+    AUTH_CACHE_TTL_SECONDS: int = 300
+    AUTH_REVOCATION_SYNC_SECONDS: float = 5.0  # How stale another process's logout-all can be
+    AUTH_REVOCATION_SETTLE_SECONDS: float = 60.0  # Re-read window for logout-alls that commit late
+    BCRYPT_ROUNDS: int = 12  # Work factor; existing hashes are upgraded on their next login
+    PASSWORD_HASH_WORKERS: int = 2  # bcrypt threads (it releases the GIL)
+    PASSWORD_HASH_QUEUE_SIZE: int = 32  # Waiting register/login requests beyond this get 503
+    PASSWORD_HASH_NICE: int = 10  # Lower CPU priority of bcrypt threads so request handling wins (Linux)
 
     # Storage Backend Selection
     USE_CLOUDINARY: bool = False  # Set to True for FREE Cloudinary storage
+    STORAGE_BACKEND: Optional[str] = None  # "cloudinary", "gcs" or "local"; unset = follow USE_CLOUDINARY
+    STORAGE_MAX_CONCURRENCY: int = 8  # Concurrent uploads / pooled HTTP connections per backend
+
+    # Local filesystem storage (development and offline load testing)
+    LOCAL_STORAGE_DIR: str = "./media"
+    LOCAL_STORAGE_BASE_URL: str = "/media"
+    LOCAL_STORAGE_LATENCY_MS: int = 0  # Simulated per-upload round trip for offline load tests
 
     # Cloudinary (FREE tier: 25GB storage, no credit card required)
     CLOUDINARY_CLOUD_NAME: Optional[str] = None
@@ -20,6 +45,113 @@ class Settings(BaseSettings):
     # Google Cloud Storage (Original paid option)
     GCS_BUCKET_NAME: Optional[str] = None
     GOOGLE_APPLICATION_CREDENTIALS: Optional[str] = None
+    GCS_PREDEFINED_ACL: Optional[str] = "publicRead"  # Unset for uniform bucket-level access
+
+    # Ingestion pipeline (privacy blurring + upload run off the request path)
+    SPOOL_DIR: str = "/tmp/safar-nexus-spool"
+    INGEST_WORKERS: int = 16  # Mostly waiting on the blur engine / storage I/O
+    INGEST_MAX_RETRIES: int = 3
+    INGEST_RETRY_BACKOFF_SECONDS: float = 2.0
+    INGEST_CLAIM_SECONDS: float = 600.0  # A worker's claim on a hazard; another process may take over after this
+    INGEST_MAX_BACKLOG: int = 256  # Uploads beyond this are rejected with 503
+    HAZARD_BATCH_MAX_ITEMS: int = 100  # Hazards per POST /hazards/batch
+    # Group commit: concurrent POST /hazards reports share one insert transaction
+    HAZARD_WRITE_BATCH_SIZE: int = 64  # Max reports per transaction (1 = each report commits on its own)
+    HAZARD_WRITE_BATCH_WAIT_MS: int = 0  # Extra wait for a group to fill (0 = what queued during the last flush)
+
+    # Upload limits (checked while the body streams in, before any decode)
+    UPLOAD_MAX_IMAGE_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_MAX_PIXELS: int = 40_000_000  # Width x height; a decoded frame costs 3 bytes per pixel
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024  # Read size when streaming an upload into the spool
+    REQUEST_MAX_BODY_BYTES: int = 1024 * 1024  # Routes without an upload
+
+    # Image dedup (skip blur/upload for already-stored content)
+    DEDUP_ENABLED: bool = True
+    DEDUP_DHASH_MAX_DISTANCE: int = 3  # Max differing dHash bits for a near-duplicate (-1 = exact only)
+    DEDUP_MAX_CANDIDATES: int = 50
+
+    # Duplicate report clustering
+    CLUSTERING_ENABLED: bool = True
+    CLUSTER_RADIUS_M: float = 25.0
+    CLUSTER_WINDOW_HOURS: float = 24 * 30  # Reports older than this start a new hazard
+    CLUSTER_GEOHASH_PRECISION: int = 7  # ~153m cells; must stay larger than CLUSTER_RADIUS_M
+    CLUSTER_MAX_CANDIDATES: int = 100
+
+    # /nearby query engine
+    SPATIAL_ENGINE: str = "auto"  # "postgis", "memory" (in-process index) or "auto" (postgis on PostgreSQL)
+    SPATIAL_INDEX_CELL_DEGREES: float = 0.05  # Memory engine grid cell size (~5.5km of latitude)
+    SPATIAL_INDEX_SYNC_SECONDS: float = 5.0  # Memory engine catch-up interval for other workers' inserts
+    SPATIAL_INDEX_SETTLE_SECONDS: float = 60.0  # Memory engine catch-up re-read window for late commits
+
+    # /nearby read-through cache (in-process LRU in front of Redis)
+    REDIS_URL: Optional[str] = None  # Unset = in-memory stand-in (single process only)
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.1  # Cache errors fall back to the database
+    NEARBY_CACHE_ENABLED: bool = True
+    NEARBY_CACHE_TTL_SECONDS: int = 30
+    NEARBY_CACHE_LOCAL_ENTRIES: int = 2048
+    NEARBY_CACHE_PRECISION: int = 7  # Geohash cell queries are quantized to (~153m); dense areas use the next level
+    NEARBY_CACHE_VERSION_TTL_MS: int = 1000  # Invalidation counters re-read from Redis after this (0 = every request)
+
+    # Route-corridor query (POST /hazards/route)
+    ROUTE_MAX_POINTS: int = 20000  # Decoded polyline vertices
+    ROUTE_MAX_KM: float = 1000.0
+    ROUTE_MAX_BUFFER_M: float = 500.0
+    ROUTE_MAX_RESULTS: int = 5000
+
+    # Live hazard stream (WebSocket /hazards/stream)
+    STREAM_CELL_DEGREES: float = 0.05  # Subscriber index grid cell size (~5.5km of latitude)
+    STREAM_QUEUE_SIZE: int = 256  # Undelivered events per client before it is told to resync
+    STREAM_SNAPSHOT_LIMIT: int = 500  # Hazards sent for the area a client moves into
+
+    # Delta sync (/hazards/sync, for clients keeping a local hazard store)
+    SYNC_PAGE_LIMIT: int = 1000  # Max changes per page
+    SYNC_SETTLE_SECONDS: float = 5.0  # Changes newer than this wait for the next call (in-flight commits)
+    SYNC_TOMBSTONE_DAYS: int = 30  # Deletions are reported this long; older cursors must sync from scratch
+
+    # Retention and table maintenance (retention_service; see also `python -m app.maintenance`)
+    RETENTION_DAYS: int = 0  # Hazards not reported for this long leave the hazards table (0 = keep everything)
+    RETENTION_ARCHIVE: bool = True  # Move them to hazards_archive (False = delete them)
+    RETENTION_BATCH_SIZE: int = 1000  # Hazards moved per transaction
+    RETENTION_INTERVAL_MINUTES: float = 60.0  # Maintenance pass in the API process (0 = only via the CLI)
+    HAZARD_PARTITION_MONTHS_AHEAD: int = 3  # Partitioned hazards table: monthly partitions created in advance
+
+    # Map tiles (/hazards/tiles/{z}/{x}/{y}, pre-aggregated on insert)
+    TILE_MAX_ZOOM: int = 16  # Each canonical insert updates TILE_MAX_ZOOM + 1 cell rows
+
+    # Blur engine (privacy blurring in worker processes)
+    BLUR_WORKERS: int = 0  # 0 = one process per CPU core
+    BLUR_QUEUE_SIZE: int = 64  # Saturated (uploads shed) at min(BLUR_QUEUE_SIZE, INGEST_WORKERS) waiting images
+    BLUR_BATCH_SIZE: int = 4
+    BLUR_BATCH_WAIT_MS: int = 10
+    BLUR_RESULT_TIMEOUT_SECONDS: float = 120.0  # An image still not blurred after this fails its attempt (retried)
+
+    # Privacy blur quality/CPU trade-off
+    BLUR_MODE: str = "accurate"  # "accurate" (full-res detection) or "fast" (downscaled detection)
+    BLUR_DETECT_MAX_DIM: int = 960  # Fast mode: longest side of the detection image
+    BLUR_FAST_PADDING: float = 0.1  # Fast mode: box padding (fraction of box size)
+    BLUR_FAST_FILTER: str = "pixelate"  # Fast mode: "pixelate", "box" or "gaussian"
+
+    # Privacy detection stages, run in order on one shared decoded frame
+    PRIVACY_STAGES: str = "face,plate"
+    PLATE_DETECT_MAX_DIM: int = 960  # Plate cascade runs on a copy no larger than this
+    PLATE_ONNX_MODEL_PATH: Optional[str] = None  # Unset = Haar plate cascade
+    PLATE_ONNX_INPUT_SIZE: int = 320
+    PLATE_ONNX_SCORE_THRESHOLD: float = 0.4
+
+    # Privacy pipeline output
+    IMAGE_PASSTHROUGH: bool = True  # Keep original bytes (metadata stripped) when nothing is blurred
+    IMAGE_OUTPUT_FORMAT: str = "jpeg"  # "jpeg" or "webp" when blurring happened
+    IMAGE_JPEG_QUALITY: int = 85
+    IMAGE_JPEG_PROGRESSIVE: bool = True
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_DERIVATIVES: str = "thumbnail:160,medium:640"  # name:longest side, stored next to the full image
+
+    # Slow request profiler (app.profiler; metrics are always on at /metrics)
+    PROFILE_SAMPLE_RATE: float = 0.0  # Fraction of requests profiled (0 = off)
+    PROFILE_SLOW_MS: float = 1000.0  # Profiles of requests at least this slow are kept
+    PROFILE_INTERVAL_MS: float = 5.0  # Stack sampling interval while a profiled request runs
+    PROFILE_DIR: str = "./profiles"  # Kept profiles, folded stacks (flamegraph.pl, speedscope)
+    HEALTH_DB_TIMEOUT_SECONDS: float = 2.0  # /health database check
 
     class Config:
         env_file = ".env"
@@ -31,7 +163,9 @@ settings = Settings()
 # Validate configuration
 def validate_storage_config():
     """Ensure at least one storage backend is configured"""
-    if settings.USE_CLOUDINARY:
+    if settings.STORAGE_BACKEND == "local":
+        return
+    if settings.STORAGE_BACKEND == "cloudinary" or (not settings.STORAGE_BACKEND and settings.USE_CLOUDINARY):
         if not all([
             settings.CLOUDINARY_CLOUD_NAME,
             settings.CLOUDINARY_API_KEY,
@@ -1,20 +1,125 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.metrics import Gauge
 
 # Database URL from environment
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+# The API routes use the async engine (asyncpg / aiosqlite) so queries don't
+# block the event loop; worker threads, startup tasks and scripts use the
+# sync engine. Either driver form of DATABASE_URL works for both.
+_SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2", "sqlite": "sqlite"}
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def _with_driver(url: str, drivers: dict):
+    parsed = make_url(url)
+    return parsed.set(drivername=drivers.get(parsed.get_backend_name(), parsed.drivername))
+
+
+def _pool_options() -> dict:
+    """Pool settings shared by both engines (SQLite uses SQLAlchemy's defaults)"""
+    if make_url(DATABASE_URL).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _async_connect_args() -> dict:
+    if make_url(DATABASE_URL).get_backend_name() == "postgresql":
+        # SQLAlchemy-side cache of asyncpg prepared statements (0 behind pgbouncer)
+        return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    return {}
+
+
+engine = create_engine(_with_driver(DATABASE_URL, _SYNC_DRIVERS), **_pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(
+    _with_driver(DATABASE_URL, _ASYNC_DRIVERS),
+    connect_args=_async_connect_args(),
+    **_pool_options(),
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+def _queue_pools():
+    # Pools with a fixed size (not SQLite's per-thread or static pools)
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        if hasattr(pool, "checkedout"):
+            yield name, pool
+
+
+def _pool_connections():
+    values = {}
+    for name, pool in _queue_pools():
+        values[(name, "checked_out")] = pool.checkedout()
+        values[(name, "idle")] = pool.checkedin()
+        values[(name, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+Gauge(
+    "safar_db_pool_connections", "Database pool connections by engine and state (checked_out, idle, overflow)",
+    _pool_connections, ("engine", "state"),
+)
+Gauge(
+    "safar_db_pool_size", "Database pool size by engine (overflow connections come on top)",
+    lambda: {(name,): pool.size() for name, pool in _queue_pools()}, ("engine",),
+)
+
 
 def get_db():
-    """Dependency for database session"""
+    """Dependency for a blocking database session (sync routes and threads)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MIGRATION_LOCK_KEY = 0x5AFA2001  # pg_advisory_lock key: one process migrates, the others wait
+
+
+def upgrade_schema():
+    """
+    alembic upgrade head (DB_MIGRATE_ON_STARTUP). On PostgreSQL processes
+    starting together take turns under an advisory lock, so the migrations
+    run once and the rest find the schema current.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "alembic"))
+    config.attributes["configure_logger"] = False  # Keep the app's logging setup
+    if engine.dialect.name != "postgresql":
+        command.upgrade(config, "head")
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        try:
+            command.upgrade(config, "head")
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
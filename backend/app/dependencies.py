@@ -1,31 +1,45 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import User
-from app.database import get_db
-from app.config import settings
+from app.database import AsyncSessionLocal, get_async_db
+from app.services.auth_cache import InvalidToken, get_token_cache
 
 security = HTTPBearer()
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
-    """Validate JWT token and return current user"""
-    token = credentials.credentials
+    """
+    Validate JWT token and return current user
 
+    Served from the verified-token cache; in AUTH_MODE=stateless the user is
+    built from the token claims and is not attached to a session.
+    """
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        return await get_token_cache().authenticate(credentials.credentials, db)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e))
 
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
 
-    return user
+async def get_websocket_user(websocket: WebSocket) -> Optional[User]:
+    """
+    User for a WebSocket handshake, or None if the token is missing/invalid
+
+    Accepts an `Authorization: Bearer` header or, for clients that can't
+    set headers on a WebSocket, a `token` query parameter.
+    """
+    token = websocket.query_params.get("token")
+    header = websocket.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        token = header[7:]
+    if not token:
+        return None
+    async with AsyncSessionLocal() as db:
+        try:
+            return await get_token_cache().authenticate(token, db)
+        except InvalidToken:
+            return None
@@ -1,13 +1,41 @@
+import asyncio
+import os
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from app.routers import auth, hazards
-from app.database import engine, Base
+from app.config import settings
+from app.database import SessionLocal, async_engine, upgrade_schema
+from app.metrics import REGISTRY
+from app.middleware import BodySizeLimitMiddleware, RequestMetricsMiddleware
+from app.profiler import slow_request_profiler
+from app.services.blur_engine import blur_engine
+from app.services.hazard_writer import get_hazard_writer
+from app.services.ingestion_service import ingestion_pool, recover_pending_hazards
+from app.services.retention_service import retention_job
+from app.services.storage_backends import close_storage_backend, configured_backend_name
+from app.services.tile_service import ensure_tile_cells
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Bring the schema up to date (alembic upgrade head)
+if settings.DB_MIGRATE_ON_STARTUP:
+    upgrade_schema()
 
 app = FastAPI(title="SAFAR-Nexus API", version="1.0.0")
 
+# Oversized bodies are cut off while streaming in (added first so CORS wraps its 413s)
+_FORM_OVERHEAD_BYTES = 64 * 1024  # Multipart boundaries and metadata fields, per image
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    default_limit=settings.REQUEST_MAX_BODY_BYTES,
+    limits={
+        ("POST", "/api/v1/hazards"): settings.UPLOAD_MAX_IMAGE_BYTES + _FORM_OVERHEAD_BYTES,
+        ("POST", "/api/v1/hazards/batch"):
+            settings.HAZARD_BATCH_MAX_ITEMS * (settings.UPLOAD_MAX_IMAGE_BYTES + _FORM_OVERHEAD_BYTES),
+    },
+)
+
 # CORS middleware (allow mobile app origins)
 app.add_middleware(
     CORSMiddleware,
@@ -17,16 +45,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost: request latency covers the other middleware too
+app.add_middleware(RequestMetricsMiddleware, profiler=slow_request_profiler)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(hazards.router, prefix="/api/v1/hazards", tags=["Hazards"])
 
+# Serve locally stored images (STORAGE_BACKEND=local, development/load testing)
+if configured_backend_name() == "local":
+    os.makedirs(settings.LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(settings.LOCAL_STORAGE_BASE_URL, StaticFiles(directory=settings.LOCAL_STORAGE_DIR), name="media")
+
+
+@app.on_event("startup")
+def start_ingestion_workers():
+    blur_engine.start()
+    ingestion_pool.start()
+    recover_pending_hazards()
+
+
+@app.on_event("startup")
+def build_tile_cells():
+    db = SessionLocal()
+    try:
+        ensure_tile_cells(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+def start_retention_job():
+    retention_job.start()
+
+
+@app.on_event("shutdown")
+async def flush_hazard_writes():
+    # Before the workers stop: stored pending hazards are queued for processing
+    await get_hazard_writer().stop()
+
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    retention_job.stop()
+    ingestion_pool.stop()
+    blur_engine.stop()
+    close_storage_backend()
+
 
 @app.get("/")
 async def root():
     return {"message": "SAFAR-Nexus API", "version": "1.0.0"}
 
 
+async def _database_reachable() -> bool:
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    try:
+        await asyncio.wait_for(ping(), settings.HEALTH_DB_TIMEOUT_SECONDS)
+        return True
+    except Exception:
+        return False
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """
+    503 if the database is unreachable; "degraded" while uploads are being
+    shed because the ingestion pipeline is saturated, or while the blur
+    engine is down or crash-looping
+    """
+    if not await _database_reachable():
+        return JSONResponse({"status": "unhealthy", "database": "unreachable"}, status_code=503)
+    blur_ok = blur_engine.healthy
+    status = "degraded" if ingestion_pool.saturated or not blur_ok else "healthy"
+    return {
+        "status": status,
+        "database": "ok",
+        "blur_engine": "ok" if blur_ok else "unhealthy",
+        "ingestion_backlog": ingestion_pool.backlog,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return REGISTRY.render()
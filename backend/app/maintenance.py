@@ -0,0 +1,111 @@
+"""
+Hazards table maintenance from the command line (run in backend/)
+
+    python -m app.maintenance retention           one retention pass now (RETENTION_*)
+    python -m app.maintenance partition-hazards   convert hazards to monthly partitions (PostgreSQL)
+    python -m app.maintenance explain-nearby      check /nearby still uses the spatial index
+
+explain-nearby prints the PostGIS /nearby plan with sequential scans
+disabled, so the planner takes an index whenever one can serve the query,
+and exits 1 if hazards (or one of its partitions) is still scanned
+sequentially: a missing or unusable index, whatever the table size.
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.partition_service import partition_hazards
+from app.services.retention_service import maintenance_lock, run_maintenance
+from app.services.spatial_engine import PostGISQueryEngine
+
+_SEQ_SCAN = re.compile(r"Seq Scan on hazards\w*")
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN <statement>, with the statement's bind parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+def retention(args):
+    report = run_maintenance(wait=args.wait)
+    if report is None:
+        print("Another process is running maintenance (use --wait)", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def partition(args):
+    db = SessionLocal()
+    try:
+        # Holds off the retention job, which would delete rows behind the copy
+        with maintenance_lock(db.get_bind(), wait=True):
+            partition_hazards(db, args.batch_size, settings.HAZARD_PARTITION_MONTHS_AHEAD, log=print)
+    finally:
+        db.close()
+    return 0
+
+
+def explain_nearby(args):
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name != "postgresql":
+            print("explain-nearby needs PostgreSQL (PostGIS spatial engine)", file=sys.stderr)
+            return 2
+        db.execute(text("SET LOCAL enable_seqscan = off"))
+        query = PostGISQueryEngine().nearby_query(db, args.lat, args.lon, args.radius_m, args.limit)
+        plan = [line for (line,) in db.connection().execute(Explain(query.statement))]
+        db.rollback()
+    finally:
+        db.close()
+    print("\n".join(plan))
+    scans = sorted({match.group(0) for line in plan for match in _SEQ_SCAN.finditer(line)})
+    if scans:
+        print(f"\n/nearby is not index-backed: {', '.join(scans)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("retention", help="Run one retention and table maintenance pass")
+    command.add_argument("--wait", action="store_true", help="Wait for a pass running elsewhere instead of exiting")
+    command.set_defaults(run=retention)
+
+    command = commands.add_parser("partition-hazards", help="Partition hazards by month of detected_at")
+    command.add_argument("--batch-size", type=int, default=10000, help="Rows copied per transaction")
+    command.set_defaults(run=partition)
+
+    command = commands.add_parser("explain-nearby", help="Print the /nearby plan, exit 1 on a sequential scan")
+    command.add_argument("--lat", type=float, default=0.0)
+    command.add_argument("--lon", type=float, default=0.0)
+    command.add_argument("--radius-m", type=float, default=1000.0)
+    command.add_argument("--limit", type=int, default=100)
+    command.set_defaults(run=explain_nearby)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+ASGI middleware: request body size limits and request metrics
+
+Starlette parses a multipart form (spooling files to disk) before a route
+runs, so a size check in the handler comes after the whole upload has been
+received. BodySizeLimitMiddleware rejects a request with 413 up front when
+its Content-Length is over the route's limit, and otherwise counts bytes as
+they arrive, aborting the request (chunked uploads included) once it passes
+it.
+
+RequestMetricsMiddleware records every HTTP request's latency by handler and
+status, and runs the sampled ones under the slow request profiler.
+"""
+
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.metrics import Histogram
+from app.profiler import SlowRequestProfiler
+from app.services.ingestion_service import upload_rejected
+
+_TOO_LARGE = "Request body too large"
+
+
+class BodySizeLimitMiddleware:
+    def __init__(self, app, default_limit: int, limits: Dict[Tuple[str, str], int] = None):
+        """
+        Args:
+            default_limit: Max body bytes for routes not in `limits`
+            limits: (method, path) -> max body bytes
+        """
+        self.app = app
+        self.default_limit = default_limit
+        self.limits = limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get((scope["method"], scope["path"]), self.default_limit)
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            upload_rejected.inc(reason="body_size")
+            await JSONResponse({"detail": _TOO_LARGE}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    upload_rejected.inc(reason="body_size")
+                    # Raised into the form parser; FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=_TOO_LARGE)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            # Body read outside a route (nothing converted it to a response)
+            if e.status_code != 413 or response_started:
+                raise
+            await JSONResponse({"detail": e.detail}, status_code=413)(scope, receive, send)
+
+
+http_request_seconds = Histogram(
+    "safar_http_request_seconds",
+    "HTTP request latency by handler (endpoint function) and status",
+    ("handler", "status"),
+)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app, profiler: SlowRequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Unless a response starts
+
+        async def tracking_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profile = self.profiler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            # The router stores the matched endpoint in the scope
+            handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            http_request_seconds.observe(time.perf_counter() - start, handler=handler, status=status)
+            if profile is not None:
+                self.profiler.finish(profile, f"{scope['method']} {scope['path']}")
@@ -1,4 +1,7 @@
 from app.models.user import User
-from app.models.hazard import Hazard
+from app.models.hazard import Hazard, hazards_archive
+from app.models.image_object import ImageObject
+from app.models.tile_cell import HazardTileCell
+from app.models.tombstone import HazardTombstone
 
-__all__ = ["User", "Hazard"]
+__all__ = ["User", "Hazard", "hazards_archive", "ImageObject", "HazardTileCell", "HazardTombstone"]
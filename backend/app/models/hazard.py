@@ -1,10 +1,35 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, CheckConstraint, Text
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, CheckConstraint, Text, Integer, Index, Table, text
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.sql import func
 from geoalchemy2 import Geography
 import uuid
+from datetime import datetime, timezone
 from app.database import Base
 
+# Hazard processing states (image blurring + upload happen in the background)
+STATUS_PENDING = "pending"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class GeoPoint(TypeDecorator):
+    """
+    PostGIS geography(POINT, 4326); plain EWKT text on other databases
+    (SQLite dev/tests, where /nearby is served by the in-memory spatial index)
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(Geography(geometry_type='POINT', srid=4326))
+        return dialect.type_descriptor(Text())
+
 
 class Hazard(Base):
     __tablename__ = "hazards"
@@ -13,15 +38,54 @@ class Hazard(Base):
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
     device_id = Column(UUID(as_uuid=True), nullable=False)
     hazard_type = Column(String(50), default="pothole")
-    location = Column(Geography(geometry_type='POINT', srid=4326), nullable=False)
+    location = Column(GeoPoint, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
     confidence = Column(Float, nullable=False)
-    image_url = Column(Text, nullable=False)
+    image_url = Column(Text, nullable=True)  # Set once the ingestion worker has uploaded the blurred image
     original_image_url = Column(Text, nullable=True)
+    thumbnail_url = Column(Text, nullable=True)  # IMAGE_DERIVATIVES renditions of image_url
+    medium_url = Column(Text, nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # image_objects.content_hash of the upload
+
     detected_at = Column(DateTime(timezone=True), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set on every insert and update (ORM and bulk); the /sync cursor orders by (updated_at, hazard_id)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=_utcnow, onupdate=_utcnow,
+                        server_default=func.now())
+    status = Column(String(20), nullable=False, default=STATUS_PENDING, index=True)
+    processing_attempts = Column(Integer, nullable=False, default=0)
+    processing_error = Column(Text, nullable=True)
+    # Ingestion worker processing the hazard (ingestion_service.PROCESS_ID) and until when
+    claimed_by = Column(String(64), nullable=True)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+
+    # Duplicate-report clustering: reports point at a canonical hazard
+    # (canonical_id NULL = canonical), which aggregates its reports
+    canonical_id = Column(UUID(as_uuid=True), ForeignKey("hazards.hazard_id", ondelete="SET NULL"), nullable=True, index=True)
+    geohash = Column(String(12), nullable=True, index=True)
+    report_count = Column(Integer, nullable=False, default=1)
+    aggregate_confidence = Column(Float, nullable=True)
+    last_reported_at = Column(DateTime(timezone=True), nullable=True)
 
     __table_args__ = (
         CheckConstraint('confidence >= 0 AND confidence <= 1', name='confidence_range'),
+        Index('ix_hazards_updated_at_hazard_id', 'updated_at', 'hazard_id'),
+        # /nearby and /route: ST_DWithin over canonical hazards only
+        Index(
+            'ix_hazards_location_canonical', 'location', postgresql_using='gist',
+            postgresql_where=text('canonical_id IS NULL'),
+        ).ddl_if(dialect='postgresql'),
+        Index('ix_hazards_detected_at', 'detected_at'),  # Retention scans, partition key
+        Index('ix_hazards_user_id', 'user_id'),  # users ON DELETE CASCADE
     )
+
+
+# Stale hazards moved out of the hot table by the retention job
+# (retention_service); same columns, no foreign keys or secondary indexes
+hazards_archive = Table(
+    'hazards_archive', Base.metadata,
+    *(Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+      for column in Hazard.__table__.columns),
+    Column('archived_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, String, DateTime, Text, Integer, BigInteger
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ImageObject(Base):
+    """
+    Stored (blurred) image, addressed by the SHA-256 of the raw upload
+
+    Lets byte-identical and perceptually near-duplicate uploads reference an
+    existing object instead of being blurred and uploaded again.
+    """
+    __tablename__ = "image_objects"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the raw upload
+    blurred_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the stored bytes
+    dhash = Column(BigInteger, nullable=True)  # 64-bit difference hash (signed)
+    # dhash split into 16-bit bands: a near-duplicate within 3 bits shares at least one
+    dhash_band0 = Column(Integer, nullable=True, index=True)
+    dhash_band1 = Column(Integer, nullable=True, index=True)
+    dhash_band2 = Column(Integer, nullable=True, index=True)
+    dhash_band3 = Column(Integer, nullable=True, index=True)
+    image_url = Column(Text, nullable=False)
+    thumbnail_url = Column(Text, nullable=True)
+    medium_url = Column(Text, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
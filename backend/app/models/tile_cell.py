@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, Float, DateTime, SmallInteger
+from app.database import Base
+
+
+class HazardTileCell(Base):
+    """
+    Pre-aggregated canonical hazards per map grid cell
+
+    A cell is a web-mercator tile at zoom z; a map tile at zoom z - CELL_BITS
+    is answered from its (2^CELL_BITS)^2 cells with one primary-key range
+    scan. Maintained incrementally by create_hazard (see tile_service).
+    """
+    __tablename__ = "hazard_tile_cells"
+
+    z = Column(SmallInteger, primary_key=True)
+    x = Column(Integer, primary_key=True)
+    y = Column(Integer, primary_key=True)
+    hazard_count = Column(Integer, nullable=False, default=0)
+    sum_latitude = Column(Float, nullable=False, default=0.0)  # centroid = sum / hazard_count
+    sum_longitude = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Float, DateTime, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class HazardTombstone(Base):
+    """
+    A deleted canonical hazard, kept so /hazards/sync can tell clients to
+    drop it from their local store
+
+    Kept for SYNC_TOMBSTONE_DAYS; a cursor older than that is rejected and
+    the client syncs again from scratch.
+    """
+    __tablename__ = "hazard_tombstones"
+
+    hazard_id = Column(UUID(as_uuid=True), primary_key=True)
+    latitude = Column(Float, nullable=False)  # Where it was, for the region filter
+    longitude = Column(Float, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index('ix_hazard_tombstones_deleted_at_hazard_id', 'deleted_at', 'hazard_id'),
+    )
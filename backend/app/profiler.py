@@ -0,0 +1,135 @@
+"""
+Sampling profiler for slow requests (opt-in)
+
+With PROFILE_SAMPLE_RATE > 0 that fraction of HTTP requests is profiled.
+While a profiled request is in flight, a background thread samples the
+Python stack of every thread in the process each PROFILE_INTERVAL_MS
+(sys._current_frames: no tracing hooks, the profiled code runs at full
+speed). If the request took at least PROFILE_SLOW_MS, the stacks sampled
+during it are written to PROFILE_DIR as folded stacks (one "frame;frame;...
+count" line per stack, readable by flamegraph.pl and speedscope) and its
+hottest functions are logged; otherwise they are dropped.
+
+Samples cover the whole process (the event loop thread and the thread pools
+doing the request's blocking work), so concurrent requests show up too.
+Stacks of idle threads, waiting on a lock, queue or selector, are left out.
+With the sampler off a request pays one random() call.
+"""
+
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter as StackCounts
+from typing import Optional
+
+from app.config import settings
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+profiled_requests = Counter(
+    "safar_profiled_requests_total",
+    "Requests run under the sampling profiler by result (kept: slow, profile written; dropped)",
+    ("result",),
+)
+
+# Innermost frames of a thread with nothing to do
+_IDLE_FRAMES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("selectors", "select"),
+    ("concurrent.futures.thread", "_worker"),
+}
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _stack(frame) -> Optional[str]:
+    """Folded stack of a thread (outermost frame first), None if the thread is idle"""
+    names = []
+    while frame is not None:
+        names.append((frame.f_globals.get("__name__", "?"), frame.f_code.co_name))
+        frame = frame.f_back
+    if not names or names[0] in _IDLE_FRAMES:
+        return None
+    return ";".join(f"{module}:{function}" for module, function in reversed(names))
+
+
+class Profile:
+    """Stacks sampled while one request ran"""
+
+    def __init__(self):
+        self.samples = StackCounts()
+        self.started = time.perf_counter()
+
+
+class SlowRequestProfiler:
+    def __init__(self, sample_rate: float, slow_ms: float, interval_ms: float, directory: str):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000.0
+        self.directory = directory
+        self._active = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._kept = itertools.count(1)
+
+    def start(self) -> Optional[Profile]:
+        """Profile for a new request, or None if it is not sampled"""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        profile = Profile()
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                # Runs while any profiled request is in flight
+                self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def finish(self, profile: Profile, request: str) -> bool:
+        """Stop sampling for a request; keep its profile if it was slow. Returns whether it was kept."""
+        with self._lock:
+            self._active.discard(profile)
+        ms = (time.perf_counter() - profile.started) * 1000
+        if ms < self.slow_ms or not profile.samples:
+            profiled_requests.inc(result="dropped")
+            return False
+        profiled_requests.inc(result="kept")
+        os.makedirs(self.directory, exist_ok=True)
+        name = _UNSAFE_NAME.sub("_", request).strip("_")[:80]
+        path = os.path.join(
+            self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{next(self._kept)}-{name}-{ms:.0f}ms.folded"
+        )
+        with open(path, "w") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        leaves = StackCounts()
+        for stack, count in profile.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        hottest = ", ".join(f"{leaf} ({count})" for leaf, count in leaves.most_common(5))
+        logger.warning("Slow request %s took %.0f ms (%d samples; hottest: %s), profile in %s",
+                       request, ms, sum(profile.samples.values()), hottest, path)
+        return True
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            stacks = [stack for ident, frame in sys._current_frames().items()
+                      if ident != me and (stack := _stack(frame)) is not None]
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for profile in self._active:
+                    profile.samples.update(stacks)
+
+
+slow_request_profiler = SlowRequestProfiler(
+    settings.PROFILE_SAMPLE_RATE, settings.PROFILE_SLOW_MS, settings.PROFILE_INTERVAL_MS, settings.PROFILE_DIR,
+)
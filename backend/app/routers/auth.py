@@ -1,32 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.auth import RegisterRequest, LoginRequest, AuthResponse
 from app.models.user import User
-from app.services.auth_service import hash_password, verify_password, create_access_token
-from app.database import get_db
+from app.services.auth_cache import get_token_cache
+from app.services.auth_service import (
+    PasswordHasherSaturated, create_user_token, password_hash_rejected, password_hasher
+)
+from app.database import get_async_db
+from app.dependencies import get_current_user
 
 router = APIRouter()
 
 
+def _hasher_busy():
+    password_hash_rejected.inc()
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in requests, retry later",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def _hasher_call(operation):
+    """Await a password_hasher operation, turning a full pool into 503"""
+    try:
+        return await operation
+    except PasswordHasherSaturated:
+        raise _hasher_busy()
+
+
 @router.post("/register", response_model=AuthResponse)
-async def register(request: RegisterRequest, db: Session = Depends(get_db)):
+async def register(request: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     """Create new user account"""
+    # Shed load before touching the database while bcrypt is saturated
+    if password_hasher.saturated:
+        raise _hasher_busy()
+
     # Check if email exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    existing_user = (await db.execute(select(User).where(User.email == request.email))).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    # Hand the pooled connection back while bcrypt runs
+    await db.commit()
 
-    # Hash password
-    password_hash = hash_password(request.password)
+    # Hash password (off the event loop)
+    password_hash = await _hasher_call(password_hasher.hash(request.password))
 
     # Create user
     user = User(email=request.email, password_hash=password_hash, name=request.name)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
 
     # Generate JWT token
-    token = create_access_token({"sub": str(user.user_id)})
+    token = create_user_token(user)
 
     return {
         "user_id": str(user.user_id),
@@ -37,19 +64,30 @@ async def register(request: RegisterRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=AuthResponse)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
     """Login existing user"""
+    # Shed load before touching the database while bcrypt is saturated
+    if password_hasher.saturated:
+        raise _hasher_busy()
+
     # Find user by email
-    user = db.query(User).filter(User.email == request.email).first()
+    user = (await db.execute(select(User).where(User.email == request.email))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    # Hand the pooled connection back while bcrypt runs (user stays loaded)
+    await db.commit()
 
     # Verify password
-    if not verify_password(request.password, user.password_hash):
+    valid, new_hash = await _hasher_call(password_hasher.verify_and_update(request.password, user.password_hash))
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash is not None:
+        # Stored hash predates the current BCRYPT_ROUNDS: upgrade it
+        user.password_hash = new_hash
+        await db.commit()
 
     # Generate JWT token
-    token = create_access_token({"sub": str(user.user_id)})
+    token = create_user_token(user)
 
     return {
         "user_id": str(user.user_id),
@@ -57,3 +95,23 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         "name": user.name,
         "token": token
     }
+
+
+@router.post("/logout-all", status_code=204)
+async def logout_all(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Revoke every token issued to the current user (all devices)"""
+    result = await db.execute(
+        update(User)
+        .where(User.user_id == current_user.user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+    version = result.scalar_one()
+    await db.commit()
+
+    # Other workers pick this up within AUTH_REVOCATION_SYNC_SECONDS
+    get_token_cache().revocations.revoke(current_user.user_id, version)
+    return Response(status_code=204)
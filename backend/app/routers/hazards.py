@@ -1,31 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
-from sqlalchemy.orm import Session
-from geoalchemy2.elements import WKTElement
-from geoalchemy2.functions import ST_DWithin, ST_MakePoint, ST_Distance
-from sqlalchemy import cast, Float
-from app.models.hazard import Hazard
+from typing import List, Optional
+from fastapi import (
+    APIRouter, Depends, HTTPException, File, UploadFile, Form, Header, Response, WebSocket,
+    WebSocketDisconnect, status
+)
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from app.config import settings
+from app.models.hazard import Hazard, STATUS_PENDING
 from app.models.user import User
-from app.services.image_service import blur_sensitive_data
-from app.services.storage_service import upload_image
-from app.dependencies import get_current_user
-from app.database import get_db
+from app.schemas.hazard import HazardBatchItem, HazardRouteQuery, HazardStreamSubscribe
+from app.services.hazard_stream import (
+    EVENT_SNAPSHOT, Subscription, entered, get_hazard_stream, hazard_item, hazard_message
+)
+from app.services.hazard_writer import get_hazard_writer, publish_hazards, store_hazards
+from app.services.hazard_encoding import NEARBY_PACKED_CONTENT_TYPE, encode_nearby_json, encode_nearby_packed
+from app.services.ingestion_service import (
+    UploadRejected, discard_spool, ingestion_pool, ingestion_stage_seconds, spool_upload
+)
+from app.services.nearby_cache import get_nearby_cache, nearby_request_seconds, nearby_stage_seconds
+from app.services.spatial_engine import get_spatial_engine, route_segments
+from app.services.sync_service import CursorExpired, changes, decode_cursor
+from app.services.tile_service import PACKED_CONTENT_TYPE, encode_json, encode_packed, get_tile
+from app.dependencies import get_current_user, get_websocket_user
+from app.database import AsyncSessionLocal, get_async_db
+from app.utils import decode_polyline
+import asyncio
+import json
+import logging
+import time
 import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-@router.post("")
+async def _store_failed(hazard_ids) -> HTTPException:
+    """Drop the spooled uploads of hazards that could not be stored; the client retries"""
+    logger.exception("Storing %d new hazards failed", len(hazard_ids))
+    await asyncio.gather(*[run_in_threadpool(discard_spool, hazard_id) for hazard_id in hazard_ids])
+    return HTTPException(
+        status_code=503,
+        detail="Could not store the report, retry later",
+        headers={"Retry-After": "5"}
+    )
+
+
+@router.post("", status_code=202)
 async def create_hazard(
     image: UploadFile = File(...),
     latitude: float = Form(...),
     longitude: float = Form(...),
     confidence: float = Form(...),
-    timestamp: str = Form(...),
-    device_id: str = Form(...),
-    db: Session = Depends(get_db),
+    timestamp: datetime = Form(...),
+    device_id: uuid.UUID = Form(...),
     current_user: User = Depends(get_current_user)
 ):
-    """Upload detected hazard with image"""
+    """
+    Upload detected hazard with image
+
+    The raw image is spooled locally and the hazard is stored as "pending";
+    privacy blurring and the storage upload run in the ingestion worker pool.
+    Poll GET /{hazard_id}/status until the status is "ready".
+    """
     # Validate confidence
     if not (0.0 <= confidence <= 1.0):
         raise HTTPException(status_code=400, detail="Confidence must be between 0 and 1")
@@ -36,92 +77,420 @@ async def create_hazard(
     if not (-180 <= longitude <= 180):
         raise HTTPException(status_code=400, detail="Invalid longitude")
 
-    # Read image
-    image_bytes = await image.read()
-    if len(image_bytes) > 5 * 1024 * 1024:  # 5MB limit
-        raise HTTPException(status_code=413, detail="Image too large")
+    # Shed load while the ingestion/blur pipeline is saturated
+    if ingestion_pool.saturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Image processing is at capacity, retry later",
+            headers={"Retry-After": "5"}
+        )
 
-    # Apply privacy blurring
-    blurred_image_bytes = blur_sensitive_data(image_bytes)
-
-    # Upload to configured storage (Cloudinary FREE or Google Cloud Storage)
-    image_url = upload_image(blurred_image_bytes, f"{uuid.uuid4()}.jpg")
-
-    # Create hazard record with PostGIS point
-    point = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
+    # Stream the image into the spool in chunks (format, size and hash checked
+    # on the way); the request body was already size-capped by middleware
+    hazard_id = uuid.uuid4()
+    try:
+        with ingestion_stage_seconds.time(stage="spool"):
+            upload = await run_in_threadpool(spool_upload, hazard_id, image.file)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    raw_hash = upload.content_hash
+    # EWKT: geography point on PostGIS, plain text elsewhere
+    point = f'SRID=4326;POINT({longitude} {latitude})'
     hazard = Hazard(
+        hazard_id=hazard_id,
         user_id=current_user.user_id,
         device_id=device_id,
         location=point,
         latitude=latitude,
         longitude=longitude,
         confidence=confidence,
-        image_url=image_url,
-        detected_at=timestamp
+        detected_at=timestamp,
+        content_hash=raw_hash,
+        status=STATUS_PENDING
     )
-    db.add(hazard)
-    db.commit()
-    db.refresh(hazard)
+
+    # Stored with concurrent reports in one transaction (group commit):
+    # clustered, deduplicated against stored images, inserted and published
+    try:
+        with ingestion_stage_seconds.time(stage="store"):
+            canonical = await get_hazard_writer().submit(hazard)
+    except Exception:
+        raise await _store_failed([hazard_id])
 
     return {
         "hazard_id": str(hazard.hazard_id),
-        "status": "success",
-        "blurred_image_url": image_url,
+        "status": hazard.status,
+        "blurred_image_url": hazard.image_url,
+        "canonical_hazard_id": str(canonical.hazard_id),
         "created_at": hazard.created_at.isoformat()
     }
 
 
+@router.post("/batch")
+async def create_hazards_batch(
+    metadata: str = Form(...),
+    images: List[UploadFile] = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Upload many hazards in one request (offline sync)
+
+    `metadata` is a JSON array of {latitude, longitude, confidence,
+    timestamp, device_id, client_ref?}; the i-th `images` part is the image
+    of the i-th entry. Items are validated individually: invalid ones are
+    reported as rejected and the rest are stored with one multi-row insert
+    and a single commit. Each accepted hazard then goes through the same
+    pipeline as POST "" (pending -> ready).
+    """
+    try:
+        entries = json.loads(metadata)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="metadata must be a JSON array")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(status_code=400, detail="metadata must be a non-empty JSON array")
+    if len(entries) > settings.HAZARD_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.HAZARD_BATCH_MAX_ITEMS} hazards per batch"
+        )
+    if len(entries) != len(images):
+        raise HTTPException(status_code=400, detail="Expected one image per metadata entry")
+
+    results: List[Optional[dict]] = [None] * len(entries)
+    valid = []
+    for index, entry in enumerate(entries):
+        try:
+            valid.append((index, HazardBatchItem.model_validate(entry)))
+        except ValidationError as e:
+            client_ref = entry.get("client_ref") if isinstance(entry, dict) else None
+            results[index] = _batch_rejected(index, client_ref, _validation_message(e))
+
+    if valid and not ingestion_pool.has_room(len(valid)):
+        raise HTTPException(
+            status_code=503,
+            detail="Image processing is at capacity, retry later",
+            headers={"Retry-After": "5"}
+        )
+
+    # Each image streams into its own spool file (checked and hashed on the way)
+    hazard_ids = [uuid.uuid4() for _ in valid]
+    uploads = await asyncio.gather(*[
+        run_in_threadpool(spool_upload, hazard_id, images[index].file)
+        for hazard_id, (index, _) in zip(hazard_ids, valid)
+    ], return_exceptions=True)
+    accepted = []
+    for hazard_id, (index, item), upload in zip(hazard_ids, valid, uploads):
+        if isinstance(upload, UploadRejected):
+            results[index] = _batch_rejected(index, item.client_ref, upload.detail)
+        elif isinstance(upload, BaseException):
+            await asyncio.gather(*[run_in_threadpool(discard_spool, h) for h in hazard_ids])
+            raise upload
+        else:
+            accepted.append((index, item, hazard_id, upload.content_hash))
+
+    hazards = [
+        Hazard(
+            hazard_id=hazard_id,
+            user_id=current_user.user_id,
+            device_id=item.device_id,
+            location=f'SRID=4326;POINT({item.longitude} {item.latitude})',
+            latitude=item.latitude,
+            longitude=item.longitude,
+            confidence=item.confidence,
+            detected_at=item.timestamp,
+            content_hash=raw_hash,
+            status=STATUS_PENDING
+        )
+        for _, item, hazard_id, raw_hash in accepted
+    ]
+
+    # One transaction for the batch (one candidate query, reports within it
+    # merge too, one multi-row insert), then the same notifications as POST ""
+    try:
+        canonicals = await store_hazards(db, hazards)
+    except Exception:
+        await db.rollback()
+        raise await _store_failed([hazard.hazard_id for hazard in hazards])
+    await publish_hazards(db, hazards, canonicals)
+
+    for (index, item, _, _), hazard, canonical in zip(accepted, hazards, canonicals):
+        results[index] = {
+            "index": index,
+            "client_ref": item.client_ref,
+            "result": "created",
+            "hazard_id": str(hazard.hazard_id),
+            "status": hazard.status,
+            "blurred_image_url": hazard.image_url,
+            "canonical_hazard_id": str(canonical.hazard_id),
+            "created_at": hazard.created_at.isoformat()
+        }
+    return {"created": len(hazards), "rejected": len(entries) - len(hazards), "results": results}
+
+
+def _batch_rejected(index: int, client_ref, error: str) -> dict:
+    return {"index": index, "client_ref": client_ref, "result": "rejected", "error": error}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'entry'}: {e['msg']}" for e in error.errors()
+    )
+
+
 @router.get("/nearby")
 async def get_nearby_hazards(
     latitude: float,
     longitude: float,
     radius_km: float = 5.0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get hazards within radius of location"""
+    """
+    Get hazards within radius of location
+
+    format=json (default) or packed (columnar binary, see
+    hazard_encoding); without `format`, an Accept header naming the packed
+    content type selects it.
+    """
     # Validate parameters
     if radius_km > 50:
         raise HTTPException(status_code=400, detail="Radius cannot exceed 50km")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
     if limit > 500:
         limit = 500
+    if format is None:
+        format = "packed" if accept and NEARBY_PACKED_CONTENT_TYPE in accept else "json"
+    if format not in ("json", "packed"):
+        raise HTTPException(status_code=400, detail="format must be json or packed")
 
-    # Query with PostGIS spatial filter
-    point = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
+    start = time.perf_counter()
     radius_meters = radius_km * 1000
 
-    hazards = db.query(
-        Hazard,
-        cast(ST_Distance(Hazard.location, point), Float).label("distance")
-    ).filter(
-        ST_DWithin(Hazard.location, point, radius_meters)
-    ).order_by("distance").limit(limit).all()
-
-    # Format response
-    result = []
-    for hazard, distance in hazards:
-        result.append({
-            "hazard_id": str(hazard.hazard_id),
-            "latitude": hazard.latitude,
-            "longitude": hazard.longitude,
-            "confidence": hazard.confidence,
-            "timestamp": hazard.detected_at.isoformat(),
-            "distance_km": round(distance / 1000, 2),
-            "image_url": hazard.image_url
-        })
+    async def load(lat, lon, radius_m, max_results):
+        # PostGIS query, or the in-process spatial index on other databases
+        with nearby_stage_seconds.time(stage="query"):
+            hazards = await db.run_sync(get_spatial_engine().nearby, lat, lon, radius_m, max_results)
+            return [(hazard_item(hazard), distance) for hazard, distance in hazards]
+
+    cache = get_nearby_cache()
+    if cache is not None:
+        rows, outcome = await cache.lookup(latitude, longitude, radius_meters, limit, load)
+    else:
+        rows, outcome = await load(latitude, longitude, radius_meters, limit), "disabled"
+
+    headers = {"Vary": "Accept"}
+    with nearby_stage_seconds.time(stage="encode"):
+        if format == "packed":
+            response = Response(content=encode_nearby_packed(rows), media_type=NEARBY_PACKED_CONTENT_TYPE,
+                                headers=headers)
+        else:
+            response = ORJSONResponse(content=encode_nearby_json(rows), headers=headers)
+    nearby_request_seconds.observe(
+        time.perf_counter() - start,
+        cache="hit" if outcome.startswith("hit") else "miss"
+    )
+    return response
+
+
+@router.post("/route")
+async def get_route_hazards(
+    query: HazardRouteQuery,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Hazards within buffer_m of a route, in the order they are reached
+
+    One spatial query for the whole route instead of overlapping /nearby
+    calls. Each entry carries route_distance_km (from the route start to
+    the closest point of the route) and offset_m (distance from the route).
+    """
+    if query.buffer_m > settings.ROUTE_MAX_BUFFER_M:
+        raise HTTPException(status_code=400, detail=f"buffer_m cannot exceed {settings.ROUTE_MAX_BUFFER_M:g}")
+    try:
+        route = decode_polyline(query.polyline, query.precision)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid polyline: {e}")
+    if not (2 <= len(route) <= settings.ROUTE_MAX_POINTS):
+        raise HTTPException(
+            status_code=400, detail=f"Route must have 2 to {settings.ROUTE_MAX_POINTS} points"
+        )
+    if any(not (-90 <= lat <= 90 and -180 <= lon <= 180) for lat, lon in route):
+        raise HTTPException(status_code=400, detail="Route coordinates out of range (wrong precision?)")
+    route_m = float(route_segments(route)[4].sum())
+    if route_m > settings.ROUTE_MAX_KM * 1000:
+        raise HTTPException(status_code=400, detail=f"Route cannot exceed {settings.ROUTE_MAX_KM:g}km")
+    limit = min(query.limit, settings.ROUTE_MAX_RESULTS)
+
+    hazards = await db.run_sync(get_spatial_engine().along_route, route, query.buffer_m, limit)
+    return ORJSONResponse({
+        "route_km": round(route_m / 1000, 3),
+        "hazards": [
+            dict(hazard_item(hazard), route_distance_km=round(along / 1000, 3), offset_m=round(offset, 1))
+            for hazard, along, offset in hazards
+        ],
+    })
+
+
+@router.get("/sync")
+async def sync_hazards(
+    min_latitude: float,
+    min_longitude: float,
+    max_latitude: float,
+    max_longitude: float,
+    since: Optional[str] = None,
+    limit: int = settings.SYNC_PAGE_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Hazards inserted, updated or deleted in a bounding box since a cursor
+
+    Omit `since` for a full sync, then pass back the returned cursor (with
+    the same box); repeat at once while has_more is true. Apply "hazards"
+    as upserts by hazard_id and "deleted" as removals. 410 means the cursor
+    is too old: drop the local store and sync without `since`.
+    """
+    if not (-90 <= min_latitude <= max_latitude <= 90 and -180 <= min_longitude <= max_longitude <= 180):
+        raise HTTPException(
+            status_code=400,
+            detail="Bounding box must have min <= max within latitude -90..90 and longitude -180..180"
+        )
+    limit = max(1, min(limit, settings.SYNC_PAGE_LIMIT))
+    try:
+        cursor = decode_cursor(since) if since is not None else None
+        return ORJSONResponse(await db.run_sync(
+            changes, (min_latitude, min_longitude, max_latitude, max_longitude), cursor, limit
+        ))
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
-    return {"hazards": result}
+@router.websocket("/stream")
+async def stream_hazards(websocket: WebSocket):
+    """
+    Live hazard deltas for a moving area (instead of polling /nearby)
+
+    Authenticate with an `Authorization: Bearer` header or a `token` query
+    parameter. The client sends {"type": "subscribe", "latitude",
+    "longitude", "radius_km", "snapshot"?} and sends it again whenever the
+    area moves. The server replies "subscribed", then streams
+    {"type": "hazard", "event": "snapshot" | "created" | "updated",
+    "hazard": {...}} messages (entries as in /nearby). {"type": "resync"}
+    means the client fell behind and should refetch /nearby.
+    """
+    user = await get_websocket_user(websocket)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    stream = get_hazard_stream()
+    subscription = stream.subscribe()
+    sender = asyncio.create_task(_send_stream(websocket, subscription))
+    try:
+        while True:
+            try:
+                request = HazardStreamSubscribe.model_validate(await websocket.receive_json())
+            except ValidationError as e:
+                await subscription.queue.put({"type": "error", "detail": _validation_message(e)})
+                continue
+            except ValueError:
+                await subscription.queue.put({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            previous = subscription.area
+            # Index first, snapshot second: an insert in between arrives twice, never zero times
+            stream.move(subscription, request.latitude, request.longitude, request.radius_km * 1000)
+            await subscription.queue.put({
+                "type": "subscribed", "latitude": request.latitude,
+                "longitude": request.longitude, "radius_km": request.radius_km,
+            })
+            if request.snapshot:
+                await _send_snapshot(subscription, previous)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stream.unsubscribe(subscription)
+        sender.cancel()
+
+
+async def _send_stream(websocket: WebSocket, subscription: Subscription):
+    try:
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # Closed; the receive loop unsubscribes
+
+
+async def _send_snapshot(subscription: Subscription, previous):
+    """Queue the hazards in the subscribed area that were not inside the previous one"""
+    async with AsyncSessionLocal() as db:
+        hazards = await db.run_sync(
+            get_spatial_engine().nearby, subscription.latitude, subscription.longitude,
+            subscription.radius_m, settings.STREAM_SNAPSHOT_LIMIT
+        )
+    for hazard, distance in entered(hazards, previous):
+        await subscription.queue.put(hazard_message(hazard_item(hazard), EVENT_SNAPSHOT, distance))
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_hazard_tile(
+    z: int,
+    x: int,
+    y: int,
+    format: str = "json",
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Hazard clusters (centroid + count per 1/8 x 1/8 of the tile) for a
+    web-mercator map tile, from pre-aggregated counts
+
+    format=json (default) or packed (binary, see tile_service.encode_packed).
+    Send the returned ETag as If-None-Match to get 304 when unchanged.
+    """
+    if not (0 <= z <= settings.TILE_MAX_ZOOM):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Zoom must be between 0 and {settings.TILE_MAX_ZOOM}; use /nearby for closer views"
+        )
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range")
+    if format not in ("json", "packed"):
+        raise HTTPException(status_code=400, detail="format must be json or packed")
+
+    clusters, total, digest = await db.run_sync(get_tile, z, x, y)
+    etag = f'"{digest}-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if format == "packed":
+        return Response(
+            content=encode_packed(z, x, y, clusters, total),
+            media_type=PACKED_CONTENT_TYPE,
+            headers=headers
+        )
+    return JSONResponse(content=encode_json(z, x, y, clusters, total), headers=headers)
 
 
 @router.get("/{hazard_id}")
 async def get_hazard_detail(
-    hazard_id: str,
-    db: Session = Depends(get_db),
+    hazard_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get details for specific hazard"""
-    hazard = db.query(Hazard).filter(Hazard.hazard_id == hazard_id).first()
+    result = await db.execute(select(Hazard).where(Hazard.hazard_id == hazard_id))
+    hazard = result.scalar_one_or_none()
     if not hazard:
         raise HTTPException(status_code=404, detail="Hazard not found")
 
@@ -132,6 +501,34 @@ async def get_hazard_detail(
         "confidence": hazard.confidence,
         "timestamp": hazard.detected_at.isoformat(),
         "image_url": hazard.image_url,
+        "thumbnail_url": hazard.thumbnail_url,
+        "medium_url": hazard.medium_url,
+        "status": hazard.status,
+        "canonical_hazard_id": str(hazard.canonical_id) if hazard.canonical_id else None,
+        "report_count": hazard.report_count,
+        "aggregate_confidence": hazard.aggregate_confidence,
+        "last_reported_at": hazard.last_reported_at.isoformat() if hazard.last_reported_at else None,
         "user_id": str(hazard.user_id),
         "device_id": str(hazard.device_id)
     }
+
+
+@router.get("/{hazard_id}/status")
+async def get_hazard_status(
+    hazard_id: uuid.UUID,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get image processing status for a hazard (pending, ready or failed)"""
+    result = await db.execute(select(Hazard).where(Hazard.hazard_id == hazard_id))
+    hazard = result.scalar_one_or_none()
+    if not hazard:
+        raise HTTPException(status_code=404, detail="Hazard not found")
+
+    return {
+        "hazard_id": str(hazard.hazard_id),
+        "status": hazard.status,
+        "image_url": hazard.image_url,
+        "attempts": hazard.processing_attempts,
+        "error": hazard.processing_error
+    }
@@ -1,11 +1,15 @@
 from app.schemas.auth import RegisterRequest, LoginRequest, AuthResponse
-from app.schemas.hazard import HazardResponse, HazardDetail, NearbyHazardsResponse
+from app.schemas.hazard import HazardBatchItem, HazardStreamSubscribe, HazardRouteQuery, HazardResponse, HazardDetail, HazardStatus, NearbyHazardsResponse
 
 __all__ = [
     "RegisterRequest",
     "LoginRequest",
     "AuthResponse",
+    "HazardBatchItem",
+    "HazardStreamSubscribe",
+    "HazardRouteQuery",
     "HazardResponse",
     "HazardDetail",
+    "HazardStatus",
     "NearbyHazardsResponse"
 ]
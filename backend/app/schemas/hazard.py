@@ -1,12 +1,41 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
+import uuid
+
+
+class HazardBatchItem(BaseModel):
+    """Metadata of one hazard in POST /hazards/batch (its image is the matching file part)"""
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    confidence: float = Field(ge=0, le=1)
+    timestamp: datetime
+    device_id: uuid.UUID
+    client_ref: Optional[str] = Field(None, max_length=100)  # Echoed back to match results to the offline queue
+
+
+class HazardStreamSubscribe(BaseModel):
+    """Client message on /hazards/stream: set or move the area of interest"""
+    type: Literal["subscribe"] = "subscribe"
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    radius_km: float = Field(gt=0, le=50)
+    snapshot: bool = True  # Also send hazards already inside the part of the area that is new
+
+
+class HazardRouteQuery(BaseModel):
+    """Body of POST /hazards/route: hazards along an encoded polyline"""
+    polyline: str = Field(min_length=2)  # Google encoded polyline of the route, start first
+    precision: Literal[5, 6] = 5  # 5 for Google, 6 for OSRM/Valhalla polyline6
+    buffer_m: float = Field(50.0, gt=0)  # Corridor half-width
+    limit: int = Field(1000, ge=1)
 
 
 class HazardResponse(BaseModel):
     hazard_id: str
     status: str
-    blurred_image_url: str
+    blurred_image_url: Optional[str] = None
+    canonical_hazard_id: Optional[str] = None
     created_at: str
 
     class Config:
@@ -20,12 +49,26 @@ class HazardDetail(BaseModel):
     confidence: float
     timestamp: str
     distance_km: Optional[float] = None
-    image_url: str
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
+    status: str
+    canonical_hazard_id: Optional[str] = None
+    report_count: int = 1
+    aggregate_confidence: Optional[float] = None
 
     class Config:
         from_attributes = True
 
 
+class HazardStatus(BaseModel):
+    hazard_id: str
+    status: str
+    image_url: Optional[str] = None
+    attempts: int
+    error: Optional[str] = None
+
+
 class NearbyHazardsResponse(BaseModel):
     hazards: List[HazardDetail]
 
@@ -1,4 +1,4 @@
-from app.services.auth_service import hash_password, verify_password, create_access_token
+from app.services.auth_service import hash_password, verify_password, create_access_token, create_user_token
 from app.services.image_service import blur_sensitive_data
 from app.services.storage_service import upload_to_gcs
 
@@ -6,6 +6,7 @@ __all__ = [
     "hash_password",
     "verify_password",
     "create_access_token",
+    "create_user_token",
     "blur_sensitive_data",
     "upload_to_gcs"
 ]
@@ -0,0 +1,166 @@
+"""
+Auth Cache - Authenticate requests without a per-request user lookup
+
+Tokens are HS256-signed and carry the user's id, email, name and token
+version, so in AUTH_MODE=stateless the user is rebuilt from the claims
+(AUTH_MODE=database loads it instead). Either way the result is kept in a
+bounded LRU keyed by the token (TTL capped at the token's expiry), so a
+client polling /nearby skips both the signature check and the database.
+
+Revocation: users.token_version is bumped by logout-all. Each process
+mirrors the versions of users who ever revoked (a small map) and refreshes
+it every AUTH_REVOCATION_SYNC_SECONDS with one query for rows updated since
+the last refresh; tokens below their user's version are rejected.
+updated_at is stamped before commit, so a logout-all that commits late can
+carry a timestamp older than rows already seen: each refresh re-reads the
+last AUTH_REVOCATION_SETTLE_SECONDS before the watermark (revoke is
+idempotent).
+"""
+
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.metrics import Counter
+from app.models.user import User
+from app.services.nearby_cache import LocalLRU
+
+logger = logging.getLogger(__name__)
+
+auth_cache_requests = Counter(
+    "safar_auth_cache_requests_total",
+    "Token verifications by result (hit, miss, invalid, revoked)",
+    ("result",),
+)
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class RevocationList:
+    """user_id -> lowest valid token version, for users who have revoked tokens"""
+
+    def __init__(self, sync_seconds: float, settle_seconds: float = 0.0):
+        self.sync_seconds = sync_seconds
+        self.settle = timedelta(seconds=settle_seconds)
+        self._versions: Dict[uuid.UUID, int] = {}
+        self._watermark = None  # updated_at of the newest row seen
+        self._loaded = False
+        self._syncing = False
+        self._next_sync = 0.0
+
+    def is_revoked(self, user_id: uuid.UUID, version: int) -> bool:
+        return version < self._versions.get(user_id, 0)
+
+    def revoke(self, user_id: uuid.UUID, version: int):
+        """Apply a revocation made by this process without waiting for a sync"""
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    async def refresh(self, db: AsyncSession):
+        """Pick up other processes' revocations (no-op until the sync interval passes)"""
+        if self._loaded and (self._syncing or time.monotonic() < self._next_sync):
+            return
+        self._syncing = True
+        try:
+            query = select(User.user_id, User.token_version, User.updated_at).where(User.token_version > 0)
+            if self._watermark is not None:
+                # Overlap with the last refresh: rows committed since with an older timestamp
+                query = query.where(User.updated_at >= self._watermark - self.settle)
+            for user_id, version, updated_at in (await db.execute(query)).all():
+                self.revoke(user_id, version)
+                if updated_at is not None and (self._watermark is None or updated_at > self._watermark):
+                    self._watermark = updated_at
+            self._loaded = True
+            self._next_sync = time.monotonic() + self.sync_seconds
+        finally:
+            self._syncing = False
+
+    def clear(self):
+        self._versions.clear()
+        self._watermark = None
+        self._loaded = False
+
+
+class TokenCache:
+    def __init__(self, max_entries: int, ttl_seconds: int, mode: str, revocations: RevocationList):
+        if mode not in ("stateless", "database"):
+            raise ValueError(f"Unknown AUTH_MODE: {mode}")
+        self.mode = mode
+        self.entries = LocalLRU(max_entries, ttl_seconds)
+        self.revocations = revocations
+
+    async def _verify(self, token: str, db: AsyncSession) -> Tuple[User, int, float]:
+        """Decode a token into (user, token version, seconds until expiry)"""
+        try:
+            claims = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
+            user_id = uuid.UUID(claims["sub"])
+            version = int(claims.get("ver", 0))
+        except (JWTError, KeyError, TypeError, ValueError):
+            raise InvalidToken("Invalid token")
+        expires_in = claims["exp"] - datetime.now(timezone.utc).timestamp() if "exp" in claims else None
+
+        if self.mode == "stateless" and "email" in claims:
+            # Detached record built from signed claims; never added to a session
+            user = User(user_id=user_id, email=claims["email"], name=claims.get("name"), token_version=version)
+        else:
+            # Database mode, or a token issued before claims carried the user
+            user = (await db.execute(select(User).where(User.user_id == user_id))).scalar_one_or_none()
+            if user is None:
+                raise InvalidToken("User not found")
+            db.expunge(user)
+        return user, version, expires_in
+
+    async def authenticate(self, token: str, db: AsyncSession) -> User:
+        """User for a bearer token; raises InvalidToken"""
+        await self.revocations.refresh(db)
+        entry = self.entries.get(token)
+        if entry is None:
+            try:
+                user, version, expires_in = await self._verify(token, db)
+            except InvalidToken:
+                auth_cache_requests.inc(result="invalid")
+                raise
+            entry = (user, version)
+            self.entries.put(token, entry, ttl_seconds=expires_in)
+            result = "miss"
+        else:
+            result = "hit"
+
+        user, version = entry
+        if self.revocations.is_revoked(user.user_id, version):
+            auth_cache_requests.inc(result="revoked")
+            raise InvalidToken("Token revoked")
+        auth_cache_requests.inc(result=result)
+        return user
+
+    def clear(self):
+        self.entries.clear()
+
+
+_cache: Optional[TokenCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """Process-wide token cache, created lazily on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TokenCache(
+                    settings.AUTH_CACHE_ENTRIES,
+                    settings.AUTH_CACHE_TTL_SECONDS,
+                    settings.AUTH_MODE,
+                    RevocationList(settings.AUTH_REVOCATION_SYNC_SECONDS, settings.AUTH_REVOCATION_SETTLE_SECONDS),
+                )
+    return _cache
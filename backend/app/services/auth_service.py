@@ -1,9 +1,26 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 from app.config import settings
+from app.metrics import Counter, Histogram
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+password_hash_seconds = Histogram(
+    "safar_password_hash_seconds",
+    "bcrypt time per operation (hash, verify), excluding queueing",
+    ("operation",),
+)
+password_hash_rejected = Counter(
+    "safar_password_hash_rejected_total",
+    "Register/login requests rejected because the password hashing pool was full",
+)
 
 
 def hash_password(password: str) -> str:
@@ -16,6 +33,79 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def _lower_priority():
+    """
+    Thread initializer: yield the CPU to the event loop thread when cores are
+    oversubscribed (Linux schedules threads individually; no-op elsewhere)
+    """
+    if settings.PASSWORD_HASH_NICE <= 0:
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), settings.PASSWORD_HASH_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+class PasswordHasherSaturated(Exception):
+    """Raised when every hashing worker is busy and the queue is full"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small thread pool instead of on the event loop
+
+    bcrypt releases the GIL, so hashing threads don't stall request handling.
+    At most num_workers + queue_size operations are admitted at once; beyond
+    that callers get PasswordHasherSaturated (a 503) rather than an
+    ever-growing queue of logins.
+    """
+
+    def __init__(self, num_workers: int, queue_size: int):
+        self.num_workers = max(1, num_workers)
+        self.capacity = self.num_workers + queue_size
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.num_workers, thread_name_prefix="password-hash", initializer=_lower_priority
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """True when new operations would be rejected (cheap pre-check for routes)"""
+        return self._inflight >= self.capacity
+
+    def _timed(self, operation, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            password_hash_seconds.observe(time.perf_counter() - start, operation=operation)
+
+    def _release(self, _future):
+        with self._lock:
+            self._inflight -= 1
+
+    async def _run(self, operation, fn, *args):
+        with self._lock:
+            if self._inflight >= self.capacity:
+                raise PasswordHasherSaturated("Password hashing is at capacity")
+            self._inflight += 1
+        future = self._executor.submit(self._timed, operation, fn, *args)
+        # Freed when the work finishes, even if the request was cancelled meanwhile
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash if the stored one uses outdated settings such as BCRYPT_ROUNDS)"""
+        return await self._run("verify", pwd_context.verify_and_update, password, hashed)
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE)
+
+
 def create_access_token(data: dict) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -23,3 +113,13 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     token = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm="HS256")
     return token
+
+
+def create_user_token(user) -> str:
+    """Access token whose claims are enough to authenticate without a user lookup"""
+    return create_access_token({
+        "sub": str(user.user_id),
+        "ver": user.token_version or 0,
+        "email": user.email,
+        "name": user.name,
+    })
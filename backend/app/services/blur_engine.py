@@ -0,0 +1,318 @@
+"""
+Blur Engine - Multi-process privacy blurring
+
+Runs the privacy pipeline (image_service.process_image) in a pool of worker
+processes so face detection uses every core instead of competing with
+request handling for the GIL of the API process. Each worker process loads
+the Haar cascade once (via the image_service import in its initializer).
+
+Images enter through a bounded queue. A dispatcher thread drains it into
+batches of up to BLUR_BATCH_SIZE images (waiting at most BLUR_BATCH_WAIT_MS
+to fill a batch) so each round trip to a worker process carries several
+images. When the queue is full, submit() raises BlurEngineSaturated so
+callers can shed load instead of piling up unbounded work. The engine
+reports itself saturated (and ingestion sheds uploads) once
+saturation_depth images are waiting for a worker process.
+
+An image can be queued as bytes or as the path of a spooled file; a path
+is memory-mapped by the worker process, so the raw bytes are neither
+copied into the API process nor pickled across to the worker.
+
+A worker process that dies (OOM killer, a crash in native code) breaks the
+whole pool: the engine then replaces the pool and resubmits the batches
+that were in flight, once. An engine restarting its pool over and over
+reports itself unhealthy (/health).
+"""
+
+import logging
+import mmap
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Union
+
+from app.config import settings
+from app.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+blur_pool_restarts = Counter(
+    "safar_blur_pool_restarts_total",
+    "Blur worker pools replaced after a worker process died",
+)
+
+# This many pool restarts within the window: the engine is crash-looping (unhealthy)
+_CRASH_LOOP_RESTARTS = 3
+_CRASH_LOOP_WINDOW_SECONDS = 60.0
+
+
+class BlurEngineSaturated(Exception):
+    """Raised when the blur queue is full"""
+
+
+def _init_worker():
+    """Process initializer: one OpenCV thread per process, cascade loaded once"""
+    import cv2
+    cv2.setNumThreads(1)
+    import app.services.image_service  # noqa: F401  (loads the face cascade)
+
+
+@contextmanager
+def mapped_file(path: str):
+    """Read-only memory map of a file, usable wherever image bytes are"""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # A NumPy view is still alive; the map is released with it
+
+
+def _process(image, derivatives):
+    from app.services.image_service import process_image
+
+    if isinstance(image, str):
+        with mapped_file(image) as data:
+            return process_image(data, derivatives=derivatives)
+    return process_image(image, derivatives=derivatives)
+
+
+def _blur_batch(images):
+    """
+    Blur a batch of images (bytes or spool file paths) inside a worker process
+
+    Returns one (ok, payload) tuple per image so a single undecodable image
+    does not fail the rest of its batch. payload is a PrivacyResult (with
+    IMAGE_DERIVATIVES renditions) or an error message.
+    """
+    from app.services.image_service import parse_derivatives
+
+    derivatives = parse_derivatives(settings.IMAGE_DERIVATIVES)
+    results = []
+    for image in images:
+        try:
+            results.append((True, _process(image, derivatives)))
+        except Exception as e:  # Any error an image raises (e.g. cv2.error) is its own
+            results.append((False, str(e) or type(e).__name__))
+    return results
+
+
+class BlurEngine:
+    """Bounded, batching front end to a pool of blur worker processes"""
+
+    def __init__(self, num_workers: int, queue_size: int, batch_size: int, batch_wait_ms: int,
+                 saturation_depth: int = 0):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000.0
+        # Images waiting before the engine reports itself saturated (0 = a full queue)
+        self.saturation_depth = min(saturation_depth or queue_size, queue_size)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._held = 0  # Images of the batch the dispatcher holds while waiting for an in-flight slot
+        # At most two batches per worker in flight, so excess work stays in
+        # the bounded queue (and triggers backpressure) instead of the pool
+        self._inflight = threading.BoundedSemaphore(self.num_workers * 2)
+        self._executor = None
+        self._dispatcher = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()  # Swapping self._executor
+        self._restarts = deque(maxlen=_CRASH_LOOP_RESTARTS)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of images waiting to be dispatched"""
+        return self._queue.qsize() + self._held
+
+    @property
+    def saturated(self) -> bool:
+        return self.queue_depth >= self.saturation_depth or self._queue.full()
+
+    @property
+    def healthy(self) -> bool:
+        """Running, and not stuck replacing crashing worker pools"""
+        crash_loop = (
+            len(self._restarts) == self._restarts.maxlen
+            and time.monotonic() - self._restarts[0] < _CRASH_LOOP_WINDOW_SECONDS
+        )
+        return self._running and self._dispatcher.is_alive() and not crash_loop
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Replace a pool a dead worker process broke (once, however many batches saw it)"""
+        with self._pool_lock:
+            if self._executor is not broken:
+                return  # Already replaced, or the engine stopped
+            broken.shutdown(wait=False)  # May run on the broken pool's own thread
+            self._executor = self._new_executor()
+            self._restarts.append(time.monotonic())
+        blur_pool_restarts.inc()
+        logger.error("A blur worker process died; replaced the worker pool")
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._executor = self._new_executor()
+            self._running = True
+            self._dispatcher = threading.Thread(
+                target=self._dispatch_loop, name="blur-dispatcher", daemon=True
+            )
+            self._dispatcher.start()
+
+    def stop(self):
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._dispatcher.join()
+            with self._pool_lock:
+                executor, self._executor = self._executor, None
+            executor.shutdown(wait=True)
+            self._dispatcher = None
+
+    def submit(self, image: Union[bytes, str], timeout: float = 0) -> Future:
+        """
+        Queue an image for blurring
+
+        Args:
+            image: Raw image data, or the path of a file holding it
+            timeout: Seconds to wait for queue space (0 = fail immediately)
+
+        Returns:
+            Future resolving to an image_service.PrivacyResult
+
+        Raises:
+            BlurEngineSaturated: Queue stayed full for the whole timeout
+        """
+        if not self._running:
+            raise RuntimeError("Blur engine is not running")
+        future = Future()
+        try:
+            if timeout:
+                self._queue.put((image, future), timeout=timeout)
+            else:
+                self._queue.put_nowait((image, future))
+        except queue.Full:
+            raise BlurEngineSaturated("Blur queue is full")
+        return future
+
+    def process(self, image: Union[bytes, str], timeout: float = None):
+        """
+        Blocking helper: queue an image (waiting up to timeout seconds for
+        space, default 30) and return its PrivacyResult
+
+        Raises TimeoutError if the result takes longer than
+        BLUR_RESULT_TIMEOUT_SECONDS (a wedged worker must not hold the
+        caller's thread forever).
+        """
+        future = self.submit(image, timeout=timeout or 30)
+        try:
+            return future.result(settings.BLUR_RESULT_TIMEOUT_SECONDS)
+        except TimeoutError:
+            raise TimeoutError(f"Image not blurred within {settings.BLUR_RESULT_TIMEOUT_SECONDS:g}s") from None
+
+    def blur(self, image: Union[bytes, str], timeout: float = None) -> bytes:
+        """Blocking helper returning only the blurred image bytes"""
+        return self.process(image, timeout).data
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while self._running or not self._queue.empty():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            self._held = len(batch)
+            self._inflight.acquire()
+            self._held = 0
+            self._send(batch, attempt=0)
+
+    def _send(self, batch, attempt: int):
+        """Hand a batch to the worker pool; its in-flight slot is held until it resolves"""
+        executor = self._executor
+        try:
+            if executor is None:
+                raise RuntimeError("Blur engine is not running")
+            pool_future = executor.submit(_blur_batch, [image for image, _ in batch])
+        except BrokenProcessPool as e:
+            self._retry(executor, batch, attempt, e)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        pool_future.add_done_callback(
+            lambda done: self._resolve(done, executor, batch, attempt)
+        )
+
+    def _retry(self, executor, batch, attempt: int, error: Exception):
+        """A worker process died: every batch in flight on that pool is resubmitted once"""
+        self._replace_pool(executor)
+        if attempt == 0:
+            self._send(batch, attempt + 1)
+        else:
+            self._fail(batch, error)  # Broke a second pool: likely the batch itself crashes workers
+
+    def _fail(self, batch, error: Exception):
+        self._inflight.release()
+        for _, future in batch:
+            future.set_exception(error)
+
+    def _resolve(self, pool_future, executor, batch, attempt: int):
+        try:
+            results = pool_future.result()
+        except BrokenProcessPool as e:
+            self._retry(executor, batch, attempt, e)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        self._inflight.release()
+        for (_, future), (ok, payload) in zip(batch, results):
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(ValueError(payload))
+
+
+blur_engine = BlurEngine(
+    num_workers=settings.BLUR_WORKERS,
+    queue_size=settings.BLUR_QUEUE_SIZE,
+    batch_size=settings.BLUR_BATCH_SIZE,
+    batch_wait_ms=settings.BLUR_BATCH_WAIT_MS,
+    # The ingestion workers are the only producers and each waits for its
+    # image, so at most INGEST_WORKERS images ever wait here: saturated once
+    # they all do (a larger queue alone would never fill)
+    saturation_depth=min(settings.BLUR_QUEUE_SIZE, settings.INGEST_WORKERS),
+)
+
+Gauge("safar_blur_queue_depth", "Images waiting for a blur worker process", lambda: blur_engine.queue_depth)
@@ -9,17 +9,25 @@ import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 from app.config import settings
+import os
 import uuid
 
 
+_initialized = False
+
+
 def initialize_cloudinary():
-    """Initialize Cloudinary with credentials"""
+    """Initialize Cloudinary with credentials (once per process)"""
+    global _initialized
+    if _initialized:
+        return
     cloudinary.config(
         cloud_name=settings.CLOUDINARY_CLOUD_NAME,
         api_key=settings.CLOUDINARY_API_KEY,
         api_secret=settings.CLOUDINARY_API_SECRET,
         secure=True
     )
+    _initialized = True
 
 
 def upload_to_cloudinary(image_bytes: bytes, filename: str = None) -> str:
@@ -46,7 +54,7 @@ def upload_to_cloudinary(image_bytes: bytes, filename: str = None) -> str:
     result = cloudinary.uploader.upload(
         image_bytes,
         folder="safar-nexus-hazards",
-        public_id=filename.replace('.jpg', ''),
+        public_id=os.path.splitext(filename)[0],
         resource_type="image",
         overwrite=False
     )
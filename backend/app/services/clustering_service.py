@@ -0,0 +1,167 @@
+"""
+Clustering Service - Merge duplicate hazard reports into canonical hazards
+
+Every incoming hazard is matched against canonical hazards (rows with no
+canonical_id) of the same type within CLUSTER_RADIUS_M meters that were
+last reported less than CLUSTER_WINDOW_HOURS ago. Candidates come from an
+indexed lookup on the geohash cell of the report and its 8 neighbours
+(CLUSTER_GEOHASH_PRECISION is chosen so a cell is larger than the radius):
+the nearest CLUSTER_MAX_CANDIDATES of the report's type, so assignment
+costs a constant number of rows per insert.
+
+A matched report points at its canonical hazard, whose report_count,
+aggregate_confidence (noisy-OR of the report confidences) and
+last_reported_at are updated atomically in SQL. /nearby then only scans
+canonical hazards.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import case, select, union, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import settings
+from app.models.hazard import Hazard
+from app.utils import geohash_encode, geohash_neighbors, haversine_m
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def _nearest(hazard: Hazard, candidates):
+    """Closest candidate within CLUSTER_RADIUS_M, or None"""
+    best, best_distance = None, settings.CLUSTER_RADIUS_M
+    for candidate in candidates:
+        distance = haversine_m(hazard.latitude, hazard.longitude, candidate.latitude, candidate.longitude)
+        if distance <= best_distance:
+            best, best_distance = candidate, distance
+    return best
+
+
+def _planar_distance(latitude: float, longitude: float):
+    """SQL equirectangular distance (squared, in degrees) from a point: orders by nearness"""
+    cos_lat = math.cos(math.radians(latitude))
+    return (
+        (Hazard.latitude - latitude) * (Hazard.latitude - latitude)
+        + (Hazard.longitude - longitude) * (Hazard.longitude - longitude) * (cos_lat * cos_lat)
+    )
+
+
+def _candidate_ids(hazard: Hazard, window: timedelta):
+    """Nearest CLUSTER_MAX_CANDIDATES canonicals of the report's type around it"""
+    return select(Hazard.hazard_id).where(
+        Hazard.geohash.in_(geohash_neighbors(hazard.geohash)),
+        Hazard.canonical_id.is_(None),
+        Hazard.hazard_type == (hazard.hazard_type or "pothole"),
+        Hazard.last_reported_at >= hazard.last_reported_at - window,
+    ).order_by(
+        _planar_distance(hazard.latitude, hazard.longitude), Hazard.hazard_id,
+    ).limit(settings.CLUSTER_MAX_CANDIDATES).subquery()
+
+
+def _prepare(hazard: Hazard):
+    """Clustering fields of a report that starts out as its own canonical hazard"""
+    hazard.canonical_id = None
+    hazard.geohash = geohash_encode(hazard.latitude, hazard.longitude, settings.CLUSTER_GEOHASH_PRECISION)
+    hazard.last_reported_at = _as_datetime(hazard.detected_at)
+    hazard.report_count = 1
+    hazard.aggregate_confidence = hazard.confidence
+
+
+def _merge_into(db: Session, canonical: Hazard, reports: int, survival: float, last_reported_at: datetime):
+    """
+    Fold reports into an existing canonical hazard. SQL-side updates so
+    concurrent reports don't lose increments; survival is the product of
+    (1 - confidence) over the new reports (noisy-OR). The row's new
+    aggregates come back with RETURNING and are set on the loaded canonical,
+    so publishing it needs no refresh.
+    """
+    aggregates = (Hazard.report_count, Hazard.aggregate_confidence, Hazard.last_reported_at, Hazard.updated_at)
+    row = db.execute(
+        update(Hazard).where(Hazard.hazard_id == canonical.hazard_id).values({
+            Hazard.report_count: Hazard.report_count + reports,
+            Hazard.aggregate_confidence: 1 - (1 - Hazard.aggregate_confidence) * survival,
+            Hazard.last_reported_at: case(
+                (Hazard.last_reported_at < last_reported_at, last_reported_at),
+                else_=Hazard.last_reported_at,
+            ),
+        }).returning(*aggregates).execution_options(synchronize_session=False)
+    ).one_or_none()
+    if row is not None:  # None: deleted (e.g. archived) since it was loaded
+        for column, value in zip(aggregates, row):
+            set_committed_value(canonical, column.key, value)
+
+
+def assign_batch_to_clusters(db: Session, hazards: List[Hazard]) -> List[Hazard]:
+    """
+    Attach new (not yet inserted) hazards to their canonical hazards, or
+    make them canonical themselves. The caller commits.
+
+    One round trip fetches every report's nearest candidates, and reports
+    in the batch also merge with each other (an offline trip passing the
+    same pothole twice). Returns the canonical Hazard of each input, in
+    order (the hazard itself when it starts a cluster).
+    """
+    for hazard in hazards:
+        _prepare(hazard)
+    if not settings.CLUSTERING_ENABLED or not hazards:
+        return list(hazards)
+
+    window = timedelta(hours=settings.CLUSTER_WINDOW_HOURS)
+    # Each report's own nearest candidates: a shared cut across the batch
+    # would let busy neighbouring cells crowd out a report's match
+    nearest = [select(ids.c.hazard_id) for ids in (_candidate_ids(hazard, window) for hazard in hazards)]
+    candidate_ids = {hazard_id for (hazard_id,) in db.execute(union(*nearest))}
+    existing = db.query(Hazard).filter(Hazard.hazard_id.in_(candidate_ids)).all() if candidate_ids else []
+
+    by_cell: Dict[str, list] = {}
+    # Latest report per candidate, including reports merged from this batch
+    latest = {}
+    for candidate in existing:
+        by_cell.setdefault(candidate.geohash, []).append(candidate)
+        latest[candidate.hazard_id] = _as_datetime(candidate.last_reported_at)
+
+    new_ids = {hazard.hazard_id for hazard in hazards}
+    merges: Dict[Hazard, list] = {}  # existing canonical -> [reports, survival, latest]
+    canonical_of = {}
+    for hazard in sorted(hazards, key=lambda h: h.last_reported_at):
+        hazard_type = hazard.hazard_type or "pothole"
+        window_start = hazard.last_reported_at - window
+        candidates = [
+            candidate
+            for cell in geohash_neighbors(hazard.geohash)
+            for candidate in by_cell.get(cell, ())
+            if (candidate.hazard_type or "pothole") == hazard_type and latest[candidate.hazard_id] >= window_start
+        ]
+        canonical = _nearest(hazard, candidates)
+        if canonical is None:
+            # Starts a cluster later reports in the batch can join
+            by_cell.setdefault(hazard.geohash, []).append(hazard)
+            latest[hazard.hazard_id] = hazard.last_reported_at
+            canonical_of[hazard.hazard_id] = hazard
+            continue
+
+        hazard.canonical_id = canonical.hazard_id
+        canonical_of[hazard.hazard_id] = canonical
+        latest[canonical.hazard_id] = max(latest[canonical.hazard_id], hazard.last_reported_at)
+        if canonical.hazard_id in new_ids:
+            # Not inserted yet: aggregate on the object itself
+            canonical.report_count += 1
+            canonical.aggregate_confidence = 1 - (1 - canonical.aggregate_confidence) * (1 - hazard.confidence)
+            canonical.last_reported_at = latest[canonical.hazard_id]
+        else:
+            merge = merges.setdefault(canonical, [0, 1.0, hazard.last_reported_at])
+            merge[0] += 1
+            merge[1] *= 1 - hazard.confidence
+            merge[2] = max(merge[2], hazard.last_reported_at)
+
+    # Sorted so concurrent batches lock shared canonical rows in the same order
+    for canonical in sorted(merges, key=lambda c: str(c.hazard_id)):
+        _merge_into(db, canonical, *merges[canonical])
+    return [canonical_of[hazard.hazard_id] for hazard in hazards]
@@ -0,0 +1,215 @@
+"""
+Dedup Service - Content-addressed deduplication of hazard images
+
+Uploads are fingerprinted with the SHA-256 of their raw bytes and a 64-bit
+difference hash (dHash) of a small grayscale thumbnail. Before an image is
+blurred and uploaded, the image_objects index is checked for:
+
+1. the same raw bytes (client retries)               -> "exact"
+2. a dHash within DEDUP_DHASH_MAX_DISTANCE bits      -> "near"
+   (several vehicles photographing the same pothole)
+3. after blurring, the same output bytes             -> "blurred"
+
+On a hit the hazard references the existing stored object, skipping the
+blur and/or the upload. ref_count counts the hazards using an object; an
+alias row (another raw upload found to blur to an object's bytes) holds
+none, so lookups resolve aliases to the object itself and near-duplicate
+candidates are ranked most-used first. Lookups are counted in the
+safar_dedup_lookups_total metric (label result=exact|near|blurred|miss).
+"""
+
+import hashlib
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.metrics import Counter
+from app.models.image_object import ImageObject
+
+dedup_lookups = Counter(
+    "safar_dedup_lookups_total",
+    "Image dedup lookups by result (exact, near, blurred, miss)",
+    ("result",),
+)
+
+_BANDS = 4
+_BAND_BITS = 16
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest of raw bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(image_bytes: bytes) -> Optional[int]:
+    """
+    64-bit difference hash, as a signed int (fits a BIGINT column)
+
+    Decodes at 1/8 scale (JPEG DCT scaling makes this cheap), shrinks to 9x8
+    and records whether each pixel is brighter than its right neighbour.
+    """
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _bands(value: int):
+    unsigned = value & ((1 << 64) - 1)
+    mask = (1 << _BAND_BITS) - 1
+    return [(unsigned >> (i * _BAND_BITS)) & mask for i in range(_BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def _resolve(db: Session, rows: List[ImageObject]) -> Dict[str, ImageObject]:
+    """
+    {content hash: object holding the references} for index rows: an alias
+    (ref_count 0) maps to the most-used object with its blurred bytes, one
+    query for all of them
+    """
+    blurred = {row.blurred_hash for row in rows if row.ref_count == 0 and row.blurred_hash is not None}
+    owners = {}
+    if blurred:
+        for obj in db.query(ImageObject).filter(
+            ImageObject.blurred_hash.in_(blurred), ImageObject.ref_count > 0,
+        ).order_by(ImageObject.ref_count.desc(), ImageObject.content_hash):
+            owners.setdefault(obj.blurred_hash, obj)
+    return {row.content_hash: owners.get(row.blurred_hash, row) if row.ref_count == 0 else row for row in rows}
+
+
+def find_exact(db: Session, raw_hash: str) -> Optional[ImageObject]:
+    """Stored object for byte-identical raw content (counts an 'exact' hit only)"""
+    return find_exact_many(db, [raw_hash]).get(raw_hash)
+
+
+def find_exact_many(db: Session, raw_hashes) -> Dict[str, ImageObject]:
+    """find_exact for a batch: {raw hash: stored object}"""
+    raw_hashes = set(raw_hashes)
+    if not raw_hashes:
+        return {}
+    rows = db.query(ImageObject).filter(ImageObject.content_hash.in_(raw_hashes)).all()
+    dedup_lookups.inc(len(rows), result="exact")
+    return _resolve(db, rows)
+
+
+def find_near(db: Session, value: Optional[int]) -> Optional[ImageObject]:
+    """Closest stored object whose dHash is within DEDUP_DHASH_MAX_DISTANCE bits"""
+    if value is None or settings.DEDUP_DHASH_MAX_DISTANCE < 0:
+        return None
+    bands = _bands(value)
+    candidates = db.query(ImageObject).filter(or_(
+        ImageObject.dhash_band0 == bands[0],
+        ImageObject.dhash_band1 == bands[1],
+        ImageObject.dhash_band2 == bands[2],
+        ImageObject.dhash_band3 == bands[3],
+    )).order_by(
+        # The cut keeps the most-used objects (a popular image collides the most)
+        ImageObject.ref_count.desc(), ImageObject.content_hash,
+    ).limit(settings.DEDUP_MAX_CANDIDATES).all()
+
+    best, best_distance = None, settings.DEDUP_DHASH_MAX_DISTANCE + 1
+    for candidate in candidates:
+        distance = hamming(candidate.dhash, value)
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+    if best is None:
+        return None
+    dedup_lookups.inc(result="near")
+    return _resolve(db, [best])[best.content_hash]
+
+
+def find_blurred(db: Session, blurred_hash: str) -> Optional[ImageObject]:
+    """Stored object with byte-identical blurred output (the most-used, not an alias)"""
+    obj = db.query(ImageObject).filter(ImageObject.blurred_hash == blurred_hash).order_by(
+        ImageObject.ref_count.desc(), ImageObject.content_hash,
+    ).first()
+    if obj is not None:
+        dedup_lookups.inc(result="blurred")
+    return obj
+
+
+def record_miss():
+    dedup_lookups.inc(result="miss")
+
+
+def _fields(raw_hash: str, blurred_hash: Optional[str], dhash_value: Optional[int],
+            image_url: str, thumbnail_url: Optional[str], medium_url: Optional[str], ref_count: int) -> dict:
+    bands = _bands(dhash_value) if dhash_value is not None else [None] * _BANDS
+    return {
+        "content_hash": raw_hash,
+        "blurred_hash": blurred_hash,
+        "dhash": dhash_value,
+        "dhash_band0": bands[0],
+        "dhash_band1": bands[1],
+        "dhash_band2": bands[2],
+        "dhash_band3": bands[3],
+        "image_url": image_url,
+        "thumbnail_url": thumbnail_url,
+        "medium_url": medium_url,
+        "ref_count": ref_count,
+    }
+
+
+def register(db: Session, raw_hash: str, blurred_hash: Optional[str], dhash_value: Optional[int],
+             image_url: str, thumbnail_url: str = None, medium_url: str = None) -> ImageObject:
+    """
+    Add a stored object to the index (or bump ref_count if a concurrent
+    worker registered the same content first). Commits.
+    """
+    obj = ImageObject(**_fields(raw_hash, blurred_hash, dhash_value, image_url,
+                                thumbnail_url, medium_url, ref_count=1))
+    db.add(obj)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        obj = db.get(ImageObject, raw_hash)
+        add_reference(db, obj)
+        db.commit()
+    return obj
+
+
+def add_alias(db: Session, raw_hash: str, dhash_value: Optional[int], obj: ImageObject):
+    """
+    Index another raw upload whose blurred output is obj's stored bytes, so
+    a repeat of it is an exact hit. The alias holds no references of its own
+    (count the one at hand on obj); a raw hash already indexed is left as
+    is. Caller commits.
+    """
+    fields = _fields(raw_hash, obj.blurred_hash, dhash_value, obj.image_url,
+                     obj.thumbnail_url, obj.medium_url, ref_count=0)
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # Portable insert-or-ignore: a savepoint, so a duplicate rolls back only the alias
+        from sqlalchemy import insert
+        try:
+            with db.begin_nested():
+                db.connection().execute(insert(ImageObject).values(**fields))
+        except IntegrityError:
+            pass
+        return
+
+    stmt = insert(ImageObject).values(**fields).on_conflict_do_nothing(index_elements=[ImageObject.content_hash])
+    db.connection().execute(stmt)
+
+
+def add_reference(db: Session, obj: ImageObject, count: int = 1):
+    """Increment ref_count of a reused object (caller commits)"""
+    obj.ref_count = ImageObject.ref_count + count
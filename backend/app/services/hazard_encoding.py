@@ -0,0 +1,191 @@
+"""
+Hazard Encoding - /nearby response bodies
+
+JSON goes through orjson (FastAPI's default path runs every row through
+jsonable_encoder first, which costs more than the query on a cache hit).
+
+The packed format (NEARBY_PACKED_CONTENT_TYPE, chosen with format=packed
+or the Accept header) is columnar and little-endian, so a client can map
+each numeric column straight onto a typed array:
+
+    header    magic "SNH1", count n u32, base_time i64 (unix seconds),
+              URL prefix length u32
+    n x 16    hazard_id (UUID bytes)
+    n x f32   latitude, longitude, distance_m, confidence,
+              aggregate_confidence (NaN = null)
+    n x u32   report_count, time offset (detected_at - base_time, seconds)
+    n x u16   per URL column (image_url, thumbnail_url, medium_url): bytes
+              shared with the reference, then suffix length (0xFFFF = null)
+    n x u8    status (index into STATUSES)
+    ...       the URL prefix, then the URL suffixes (UTF-8) column by column
+
+URLs are prefix-coded: image_url against the prefix common to every URL in
+the body (sent once), the derivatives against the row's image_url, so the
+storage host and path are not repeated per row.
+
+Coordinates are float32 (~1m), timestamps whole seconds.
+"""
+
+import os
+import struct
+import uuid
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import numpy as np
+
+from app.models.hazard import STATUS_FAILED, STATUS_PENDING, STATUS_READY
+
+NEARBY_PACKED_MAGIC = b"SNH1"
+NEARBY_PACKED_CONTENT_TYPE = "application/vnd.safar-nexus.hazards"
+STATUSES = (STATUS_PENDING, STATUS_READY, STATUS_FAILED)
+
+_HEADER = struct.Struct("<4sIqI")
+_NULL = 0xFFFF
+_FLOAT_COLUMNS = ("latitude", "longitude", "distance_m", "confidence", "aggregate_confidence")
+_URL_COLUMNS = ("image_url", "thumbnail_url", "medium_url")
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def _epoch_seconds(timestamp: str) -> float:
+    value = datetime.fromisoformat(timestamp)
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _shared_length(reference: bytes, url: bytes) -> int:
+    """
+    Bytes of `reference` that `url` starts with: any common prefix decodes
+    correctly, longer ones just save bytes
+    """
+    if url.startswith(reference):
+        return len(reference)
+    stem = reference.rpartition(b".")[0]  # Derivatives are "<image stem>_<name>.<ext>"
+    if stem and url.startswith(stem):
+        return len(stem)
+    low, high = 0, min(len(reference), len(url))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if url.startswith(reference[:middle]):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def encode_nearby_json(rows: List[Tuple[dict, float]]) -> dict:
+    """/nearby JSON body from (item, distance_m) rows"""
+    return {"hazards": [dict(item, distance_km=round(distance / 1000, 2)) for item, distance in rows]}
+
+
+def encode_nearby_packed(rows: List[Tuple[dict, float]]) -> bytes:
+    """Columnar binary body from (item, distance_m) rows (see module docstring)"""
+    n = len(rows)
+    items = [item for item, _ in rows]
+    seconds = np.fromiter((_epoch_seconds(item["timestamp"]) for item in items), dtype=np.float64, count=n)
+    seconds = np.floor(seconds).astype(np.int64)
+    base_time = int(seconds.min()) if n else 0
+
+    floats = np.empty((len(_FLOAT_COLUMNS), n), dtype="<f4")
+    floats[0] = np.fromiter((item["latitude"] for item in items), dtype=np.float64, count=n)
+    floats[1] = np.fromiter((item["longitude"] for item in items), dtype=np.float64, count=n)
+    floats[2] = np.fromiter((distance for _, distance in rows), dtype=np.float64, count=n)
+    floats[3] = np.fromiter((item["confidence"] for item in items), dtype=np.float64, count=n)
+    floats[4] = np.fromiter(
+        (np.nan if item["aggregate_confidence"] is None else item["aggregate_confidence"] for item in items),
+        dtype=np.float64, count=n
+    )
+    counts = np.empty((2, n), dtype="<u4")
+    counts[0] = np.fromiter((item["report_count"] for item in items), dtype=np.int64, count=n)
+    counts[1] = seconds - base_time
+
+    image_urls = [item["image_url"].encode() for item in items if item["image_url"]]
+    prefix = os.path.commonprefix(image_urls)[:_NULL - 1] if image_urls else b""
+    lengths = [[] for _ in range(2 * len(_URL_COLUMNS))]
+    suffixes = [[] for _ in _URL_COLUMNS]
+    for item in items:
+        reference = prefix
+        for column, name in enumerate(_URL_COLUMNS):
+            if not item[name]:
+                lengths[2 * column].append(0)
+                lengths[2 * column + 1].append(_NULL)
+                continue
+            url = item[name].encode()
+            shared = _shared_length(reference, url)
+            lengths[2 * column].append(shared)
+            lengths[2 * column + 1].append(len(url) - shared)
+            suffixes[column].append(url[shared:])
+            if column == 0:
+                reference = url
+    lengths = np.array(lengths, dtype="<u2").reshape(2 * len(_URL_COLUMNS), n)
+    statuses = np.fromiter((_STATUS_CODES.get(item["status"], 0) for item in items), dtype=np.uint8, count=n)
+
+    return b"".join([
+        _HEADER.pack(NEARBY_PACKED_MAGIC, n, base_time, len(prefix)),
+        b"".join(uuid.UUID(item["hazard_id"]).bytes for item in items),
+        floats.tobytes(),
+        counts.tobytes(),
+        lengths.tobytes(),
+        statuses.tobytes(),
+        prefix,
+        *(b"".join(column) for column in suffixes),
+    ])
+
+
+def decode_nearby_packed(data: bytes) -> List[dict]:
+    """Reference decoder: packed body -> /nearby-style dicts (distance_km unrounded)"""
+    magic, n, base_time, prefix_length = _HEADER.unpack_from(data)
+    if magic != NEARBY_PACKED_MAGIC:
+        raise ValueError("Not a packed hazard body")
+    offset = _HEADER.size
+    ids = [str(uuid.UUID(bytes=bytes(data[offset + 16 * i:offset + 16 * (i + 1)]))) for i in range(n)]
+    offset += 16 * n
+    floats = np.frombuffer(data, dtype="<f4", count=len(_FLOAT_COLUMNS) * n, offset=offset)
+    floats = floats.reshape(len(_FLOAT_COLUMNS), n)
+    offset += floats.nbytes
+    counts = np.frombuffer(data, dtype="<u4", count=2 * n, offset=offset).reshape(2, n)
+    offset += counts.nbytes
+    lengths = np.frombuffer(data, dtype="<u2", count=2 * len(_URL_COLUMNS) * n, offset=offset)
+    lengths = lengths.reshape(2 * len(_URL_COLUMNS), n)
+    offset += lengths.nbytes
+    statuses = np.frombuffer(data, dtype=np.uint8, count=n, offset=offset)
+    offset += n
+    prefix = bytes(data[offset:offset + prefix_length])
+    offset += prefix_length
+
+    suffixes = []
+    for column in range(len(_URL_COLUMNS)):
+        values = []
+        for length in lengths[2 * column + 1].tolist():
+            values.append(None if length == _NULL else bytes(data[offset:offset + length]))
+            offset += 0 if length == _NULL else length
+        suffixes.append(values)
+    urls = [[None] * n for _ in _URL_COLUMNS]
+    for i in range(n):
+        reference = prefix
+        for column in range(len(_URL_COLUMNS)):
+            suffix = suffixes[column][i]
+            if suffix is None:
+                continue
+            url = reference[:lengths[2 * column, i]] + suffix
+            urls[column][i] = url.decode()
+            if column == 0:
+                reference = url
+
+    hazards = []
+    for i in range(n):
+        aggregate = float(floats[4, i])
+        hazards.append({
+            "hazard_id": ids[i],
+            "latitude": float(floats[0, i]),
+            "longitude": float(floats[1, i]),
+            "distance_km": float(floats[2, i]) / 1000,
+            "confidence": float(floats[3, i]),
+            "aggregate_confidence": None if aggregate != aggregate else aggregate,
+            "report_count": int(counts[0, i]),
+            "timestamp": base_time + int(counts[1, i]),  # Unix seconds
+            "status": STATUSES[statuses[i]],
+            "image_url": urls[0][i],
+            "thumbnail_url": urls[1][i],
+            "medium_url": urls[2][i],
+        })
+    return hazards
@@ -0,0 +1,214 @@
+"""
+Hazard Stream - Push new and changed hazards to subscribed clients
+
+Instead of polling /nearby, a navigation client opens the WebSocket at
+/api/v1/hazards/stream and registers a circle (moving it as it drives).
+Subscriptions are indexed by grid cell (STREAM_CELL_DEGREES): a published
+hazard is looked up in its one cell and distance-checked against the few
+subscribers registered there, so fan-out costs O(interested clients) per
+event rather than a query per client per poll.
+
+Events are published by create_hazard and the batch upload (new canonical
+hazards, report_count changes) and by the ingestion workers (status and
+image URLs once processing finishes). Each client has a bounded queue
+(STREAM_QUEUE_SIZE); a client that falls behind has its backlog dropped and
+gets a "resync" message, telling it to refetch /nearby.
+
+The index is per process: each process streams the events it produces, so
+run the API as a single process (the default) when clients rely on it.
+"""
+
+import asyncio
+import math
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from app.config import settings
+from app.metrics import Counter, Gauge
+from app.models.hazard import Hazard
+from app.utils import EARTH_RADIUS_M, haversine_m
+
+EVENT_CREATED = "created"
+EVENT_UPDATED = "updated"
+EVENT_SNAPSHOT = "snapshot"
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+stream_events = Counter(
+    "safar_hazard_stream_events_total",
+    "Hazard stream messages by result (delivered, resync)",
+    ("result",),
+)
+
+
+def hazard_item(hazard: Hazard) -> dict:
+    """/nearby and stream entry without distance_km (cached and shared across nearby locations)"""
+    return {
+        "hazard_id": str(hazard.hazard_id),
+        "latitude": hazard.latitude,
+        "longitude": hazard.longitude,
+        "confidence": hazard.confidence,
+        "timestamp": hazard.detected_at.isoformat(),
+        "image_url": hazard.image_url,
+        "thumbnail_url": hazard.thumbnail_url,
+        "medium_url": hazard.medium_url,
+        "status": hazard.status,
+        "report_count": hazard.report_count,
+        "aggregate_confidence": hazard.aggregate_confidence
+    }
+
+
+def hazard_message(item: dict, event: str, distance_m: float) -> dict:
+    return {"type": "hazard", "event": event, "hazard": dict(item, distance_km=round(distance_m / 1000, 2))}
+
+
+def entered(hazards, previous):
+    """
+    (hazard, distance) pairs from a query of the new area that were not
+    inside the previous (latitude, longitude, radius_m) area, i.e. what a
+    client that moved has not been sent yet
+    """
+    previous_lat, previous_lon, previous_radius = previous
+    for hazard, distance in hazards:
+        if previous_lat is None or haversine_m(
+                previous_lat, previous_lon, hazard.latitude, hazard.longitude) > previous_radius:
+            yield hazard, distance
+
+
+class Subscription:
+    """One client's area of interest and its outgoing message queue"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.latitude: Optional[float] = None
+        self.longitude: Optional[float] = None
+        self.radius_m = 0.0
+        self.cells: Set[Tuple[int, int]] = set()
+
+    @property
+    def area(self) -> Tuple[Optional[float], Optional[float], float]:
+        return self.latitude, self.longitude, self.radius_m
+
+    def covers(self, latitude: float, longitude: float) -> Optional[float]:
+        """Distance in meters if the point is inside the area, else None"""
+        if self.latitude is None:
+            return None
+        distance = haversine_m(self.latitude, self.longitude, latitude, longitude)
+        return distance if distance <= self.radius_m else None
+
+    def deliver(self, message: dict):
+        """Queue a message (call on self.loop); a full queue becomes a single resync"""
+        try:
+            self.queue.put_nowait(message)
+            stream_events.inc(result="delivered")
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+            stream_events.inc(result="resync")
+
+
+class HazardStream:
+    """Grid-cell index of subscriptions, fed with hazard inserts and updates"""
+
+    def __init__(self, cell_deg: float, queue_size: int):
+        self.cell_deg = cell_deg
+        self.queue_size = queue_size
+        self._lon_cells = int(math.ceil(360.0 / cell_deg))
+        self._cells: Dict[Tuple[int, int], Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)),
+                int(math.floor((lon + 180) / self.cell_deg)) % self._lon_cells)
+
+    def _covering_cells(self, lat: float, lon: float, radius_m: float) -> Set[Tuple[int, int]]:
+        dlat = radius_m / _METERS_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = 180.0 if cos_lat < 1e-6 else min(dlat / cos_lat, 180.0)
+        i_lo = int(math.floor((lat - dlat) / self.cell_deg))
+        i_hi = int(math.floor((lat + dlat) / self.cell_deg))
+        j_lo = int(math.floor((lon - dlon + 180) / self.cell_deg))
+        j_hi = min(int(math.floor((lon + dlon + 180) / self.cell_deg)), j_lo + self._lon_cells - 1)
+        return {(i, j % self._lon_cells) for i in range(i_lo, i_hi + 1) for j in range(j_lo, j_hi + 1)}
+
+    def watching(self, latitude: float, longitude: float) -> bool:
+        """True if any subscription covers the cell of this point (cheap pre-check)"""
+        return self._cell(latitude, longitude) in self._cells
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({sub for subs in self._cells.values() for sub in subs})
+
+    def subscribe(self) -> Subscription:
+        """New subscription on the running event loop (no area until move())"""
+        return Subscription(asyncio.get_running_loop(), self.queue_size)
+
+    def move(self, sub: Subscription, latitude: float, longitude: float, radius_m: float):
+        """Set or move a subscription's area; only cells entered or left are touched"""
+        cells = self._covering_cells(latitude, longitude, radius_m)
+        with self._lock:
+            for cell in sub.cells - cells:
+                subs = self._cells.get(cell)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._cells[cell]
+            for cell in cells - sub.cells:
+                self._cells.setdefault(cell, set()).add(sub)
+            sub.cells = cells
+            sub.latitude, sub.longitude, sub.radius_m = latitude, longitude, radius_m
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for cell in sub.cells:
+                subs = self._cells.get(cell)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._cells[cell]
+            sub.cells = set()
+
+    def publish(self, hazard: Hazard, event: str):
+        """
+        Send a hazard to every subscriber whose area contains it
+
+        Safe to call from any thread; messages are handed to each
+        subscriber's event loop.
+        """
+        if not self._cells:
+            return
+        with self._lock:
+            subs = list(self._cells.get(self._cell(hazard.latitude, hazard.longitude), ()))
+        item = None
+        for sub in subs:
+            distance = sub.covers(hazard.latitude, hazard.longitude)
+            if distance is None:
+                continue
+            item = item or hazard_item(hazard)
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, hazard_message(item, event, distance))
+            except RuntimeError:
+                pass  # Loop closed; the connection is going away
+
+
+_stream: Optional[HazardStream] = None
+_stream_lock = threading.Lock()
+
+
+def get_hazard_stream() -> HazardStream:
+    """Process-wide stream, created lazily on first use"""
+    global _stream
+    if _stream is None:
+        with _stream_lock:
+            if _stream is None:
+                _stream = HazardStream(settings.STREAM_CELL_DEGREES, settings.STREAM_QUEUE_SIZE)
+    return _stream
+
+
+Gauge(
+    "safar_hazard_stream_subscribers", "WebSocket subscriptions with an area",
+    lambda: _stream.subscriber_count if _stream is not None else 0,
+)
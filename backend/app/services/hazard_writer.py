@@ -0,0 +1,277 @@
+"""
+Hazard Writer - Group commit for hazard inserts
+
+A report stored on its own costs a transaction (and a WAL flush) for one
+row, so at ingestion peaks commit latency, not the work, bounds POST
+/hazards. create_hazard therefore hands its new Hazard to the process-wide
+writer: a flusher task on the event loop takes the reports that queued up
+while it was storing the previous group (optionally waiting
+HAZARD_WRITE_BATCH_WAIT_MS for more, at most HAZARD_WRITE_BATCH_SIZE per
+group) and stores them with store_hazards, the same path as POST
+/hazards/batch:
+
+- one clustering candidate query for the group (reports in the group merge
+  with each other, as in a batch)
+- one multi-row INSERT ... RETURNING (SQLAlchemy insertmanyvalues), which
+  also fills in created_at, so no refresh SELECT per report
+- one map tile upsert and one commit
+
+An idle server stores a lone report right away; the busier the database,
+the larger the groups. Each caller awaits a future resolved with its
+canonical Hazard once the group has committed and been published (spatial
+index, /nearby cache, stream, ingestion queue). If a group fails, its
+reports are retried one by one so a bad report only fails its own request.
+Group sizes are recorded in safar_hazard_write_batch_size.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.metrics import Gauge, Histogram
+from app.models.hazard import Hazard, STATUS_PENDING, STATUS_READY
+from app.services.clustering_service import assign_batch_to_clusters
+from app.services.dedup_service import add_reference, find_exact_many
+from app.services.hazard_stream import EVENT_CREATED, EVENT_UPDATED, get_hazard_stream
+from app.services.ingestion_service import discard_spool, ingestion_pool, ingestion_stage_seconds
+from app.services.nearby_cache import get_nearby_cache
+from app.services.spatial_engine import get_spatial_engine
+from app.services.tile_service import record_hazards
+
+logger = logging.getLogger(__name__)
+
+hazard_write_batch_size = Histogram(
+    "safar_hazard_write_batch_size",
+    "Hazards stored per insert transaction (group commit and batch uploads)",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+async def store_hazards(db: AsyncSession, hazards: List[Hazard]) -> List[Hazard]:
+    """
+    Insert new hazards in one transaction and commit
+
+    Clusters them, points byte-identical uploads at the stored image
+    (discarding their spooled raws after the commit) and counts new
+    canonical hazards into the map tiles. Returns the canonical Hazard of
+    each input, in order.
+    """
+    if not hazards:
+        return []
+    # The service helpers are written against a sync Session; run_sync hands
+    # them this session's, still on the async connection
+    canonicals = await db.run_sync(assign_batch_to_clusters, hazards)
+
+    hashes = [hazard.content_hash for hazard in hazards]
+    existing = await db.run_sync(find_exact_many, hashes) if settings.DEDUP_ENABLED else {}
+    references = {}  # Stored object -> hazards now using it (aliases resolve to the same object)
+    reused = []
+    for hazard in hazards:
+        obj = existing.get(hazard.content_hash)
+        if obj is not None:
+            references[obj] = references.get(obj, 0) + 1
+            hazard.image_url = obj.image_url
+            hazard.thumbnail_url = obj.thumbnail_url
+            hazard.medium_url = obj.medium_url
+            hazard.status = STATUS_READY
+            reused.append(hazard.hazard_id)
+    for obj, count in references.items():
+        add_reference(db, obj, count)
+
+    # add_all + one flush is a single multi-row INSERT ... RETURNING
+    # (SQLAlchemy insertmanyvalues), which also fetches created_at
+    db.add_all(hazards)
+    with ingestion_stage_seconds.time(stage="db_insert"):
+        # Last before commit: the map tile rows are shared by every insert in the area
+        await db.run_sync(record_hazards, hazards)
+        await db.commit()
+    hazard_write_batch_size.observe(len(hazards))
+
+    await asyncio.gather(*[run_in_threadpool(discard_spool, hazard_id) for hazard_id in reused])
+    return canonicals
+
+
+async def _index_hazards(db: AsyncSession, hazards: List[Hazard], canonicals: List[Hazard]):
+    spatial = get_spatial_engine()
+    for hazard in hazards:
+        spatial.on_insert(hazard)
+
+
+async def _invalidate_nearby_cache(db: AsyncSession, hazards: List[Hazard], canonicals: List[Hazard]):
+    cache = get_nearby_cache()
+    if cache is not None:
+        await cache.invalidate_many(
+            [(h.latitude, h.longitude) for h in hazards]
+            + [(c.latitude, c.longitude) for h, c in zip(hazards, canonicals) if c is not h]  # report_count changed
+        )
+
+
+async def _stream_hazards(db: AsyncSession, hazards: List[Hazard], canonicals: List[Hazard]):
+    stream = get_hazard_stream()
+    new_ids = {hazard.hazard_id for hazard in hazards}
+    merged = {}
+    for hazard, canonical in zip(hazards, canonicals):
+        if canonical is hazard:
+            stream.publish(hazard, EVENT_CREATED)  # Aggregates of canonicals stored with it are current
+        elif canonical.hazard_id not in new_ids:
+            merged[canonical.hazard_id] = canonical
+    for canonical in merged.values():
+        if stream.watching(canonical.latitude, canonical.longitude):
+            stream.publish(canonical, EVENT_UPDATED)  # Aggregates as returned by the merge UPDATE
+
+
+_NOTIFIERS = (
+    ("spatial index", _index_hazards),
+    ("/nearby cache", _invalidate_nearby_cache),
+    ("hazard stream", _stream_hazards),
+)
+
+
+async def publish_hazards(db: AsyncSession, hazards: List[Hazard], canonicals: List[Hazard]):
+    """
+    Tell the ingestion workers, spatial index, /nearby cache and stream
+    about stored (committed) hazards
+
+    Pending hazards are queued for processing first, and each notifier
+    runs on its own: one failing (e.g. Redis down) is logged and does not
+    keep the others from running.
+    """
+    for hazard in hazards:
+        if hazard.status == STATUS_PENDING:
+            ingestion_pool.submit(hazard.hazard_id)
+    for name, notify in _NOTIFIERS:
+        try:
+            await notify(db, hazards, canonicals)
+        except Exception:
+            logger.exception("Publishing %d stored hazards to the %s failed", len(hazards), name)
+
+
+def _reset(hazard: Hazard):
+    """Undo what a failed store_hazards set on a new hazard (clustering, image dedup)"""
+    hazard.canonical_id = None
+    hazard.geohash = None
+    hazard.last_reported_at = None
+    hazard.report_count = 1
+    hazard.aggregate_confidence = None
+    hazard.status = STATUS_PENDING
+    hazard.image_url = hazard.thumbnail_url = hazard.medium_url = None
+
+
+class HazardWriter:
+    """Group commit: concurrent create_hazard calls share one insert transaction"""
+
+    def __init__(self, batch_size: int, batch_wait_ms: int, session_factory=AsyncSessionLocal):
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000.0
+        self._session_factory = session_factory
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Hazards waiting for the next group"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, hazard: Hazard) -> Hazard:
+        """
+        Store a new hazard with the next group commit
+
+        Returns its canonical Hazard once the group has committed (created_at
+        and the other server defaults are loaded by then). Raises what
+        storing the hazard on its own raised if that failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self.batch_size == 1:
+            await self._flush([(hazard, future)])  # Grouping off: own transaction, no queue
+        else:
+            self._ensure_running()
+            self._queue.put_nowait((hazard, future))
+        return await future
+
+    async def stop(self):
+        """Store what is queued and stop the flusher task"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._loop = self._queue = self._task = None
+
+    def _ensure_running(self):
+        # Started lazily on the running loop (a new loop, e.g. a benchmark's asyncio.run, gets its own)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(), name="hazard-writer")
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if batch[0] is not None and self.batch_wait and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.batch_wait)  # Let concurrent reports join the group
+            while len(batch) < self.batch_size and not self._queue.empty() and batch[-1] is not None:
+                batch.append(self._queue.get_nowait())
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch):
+        hazards = [hazard for hazard, _ in batch]
+        async with self._session_factory() as db:
+            try:
+                canonicals = await store_hazards(db, hazards)
+            except Exception as e:
+                await db.rollback()
+                failure = e
+            else:
+                failure = None
+                try:
+                    await publish_hazards(db, hazards, canonicals)
+                except Exception:
+                    logger.exception("Publishing %d stored hazards failed", len(hazards))
+        if failure is None:
+            for (_, future), canonical in zip(batch, canonicals):
+                if not future.done():  # A cancelled request's hazard is stored all the same
+                    future.set_result(canonical)
+        elif len(batch) == 1:
+            if not batch[0][1].done():
+                batch[0][1].set_exception(failure)
+        else:
+            logger.warning(
+                "Storing %d hazards together failed (%s), storing them one by one",
+                len(batch), type(failure).__name__
+            )
+            for hazard, future in batch:
+                _reset(hazard)
+                await self._flush([(hazard, future)])
+
+
+_writer: Optional[HazardWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_hazard_writer() -> HazardWriter:
+    """Process-wide writer, created lazily on first use"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = HazardWriter(settings.HAZARD_WRITE_BATCH_SIZE, settings.HAZARD_WRITE_BATCH_WAIT_MS)
+    return _writer
+
+
+Gauge(
+    "safar_hazard_write_queue_depth", "New hazards waiting for the next group commit",
+    lambda: _writer.queue_depth if _writer is not None else 0,
+)
@@ -0,0 +1,184 @@
+"""
+Image Metadata - Lossless metadata stripping and format sniffing
+
+Removes EXIF (including GPS), XMP, IPTC and comments from JPEG and PNG
+files by dropping the corresponding segments/chunks. The compressed image
+data is copied byte for byte, so there is no re-encode and no generation
+loss.
+
+Functions here accept any bytes-like buffer (bytes, memoryview, mmap), so
+a spooled upload can be inspected without reading it into memory.
+"""
+
+import struct
+from typing import Optional, Tuple
+
+JPEG_SOI = b"\xff\xd8"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# APP1 (EXIF/XMP), APP13 (IPTC/Photoshop), COM. APP0 (JFIF), APP2 (ICC
+# profile) and APP14 (Adobe colour transform) are kept: they affect rendering.
+_JPEG_STRIP_MARKERS = {0xE1, 0xED, 0xFE}
+_PNG_STRIP_CHUNKS = {b"eXIf", b"tEXt", b"iTXt", b"zTXt", b"tIME"}
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Return "jpeg", "png" or "webp" from the magic bytes, else None"""
+    if data[:2] == JPEG_SOI:
+        return "jpeg"
+    if data[:8] == PNG_SIGNATURE:
+        return "png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+# Start-of-frame markers (baseline, progressive, lossless, arithmetic coded)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) read from the image header, without decoding pixels
+
+    Returns None for unsupported formats or when the header is not within
+    `data` (e.g. only the first chunk of a JPEG with a large EXIF block).
+    """
+    fmt = sniff_format(data)
+    try:
+        if fmt == "png":
+            width, height = struct.unpack_from(">II", data, 16)
+            return width, height
+        if fmt == "webp":
+            chunk = data[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack_from("<HH", data, 26)
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                (bits,) = struct.unpack_from("<I", data, 21)
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                size = data[24:30]
+                return (int.from_bytes(size[:3], "little") + 1,
+                        int.from_bytes(size[3:], "little") + 1)
+            return None
+        if fmt == "jpeg":
+            pos = 2
+            while pos + 9 <= len(data):
+                if data[pos] != 0xFF:
+                    return None
+                marker = data[pos + 1]
+                if marker == 0xFF:
+                    pos += 1
+                    continue
+                if 0xD0 <= marker <= 0xD9 or marker == 0x01:
+                    pos += 2
+                    continue
+                if marker in _JPEG_SOF_MARKERS:
+                    height, width = struct.unpack_from(">HH", data, pos + 5)
+                    return width, height
+                (seg_len,) = struct.unpack_from(">H", data, pos + 2)
+                pos += 2 + seg_len
+    except struct.error:
+        pass
+    return None
+
+
+FORMAT_EXTENSIONS = {"jpeg": "jpg", "png": "png", "webp": "webp"}
+FORMAT_CONTENT_TYPES = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+
+def _exif_orientation(app1: bytes) -> int:
+    """Orientation tag from an APP1 Exif payload (1 = normal / absent)"""
+    if not app1.startswith(b"Exif\x00\x00"):
+        return 1
+    tiff = app1[6:]
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return 1
+    try:
+        (ifd_offset,) = struct.unpack_from(endian + "I", tiff, 4)
+        (count,) = struct.unpack_from(endian + "H", tiff, ifd_offset)
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(endian + "HHIH", tiff, ifd_offset + 2 + i * 12)
+            if tag == _EXIF_ORIENTATION_TAG:
+                return value
+    except struct.error:
+        pass
+    return 1
+
+
+def strip_jpeg_metadata(data: bytes) -> Optional[bytes]:
+    """
+    Drop metadata segments from a JPEG without touching the image data
+
+    Returns None when the file is malformed or carries an EXIF orientation
+    other than "normal" (stripping it would rotate the displayed image), in
+    which case the caller should fall back to a re-encode.
+    """
+    if data[:2] != JPEG_SOI:
+        return None
+    out = [JPEG_SOI]
+    pos = 2
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # Fill byte
+            pos += 1
+            continue
+        if marker == 0xDA:  # Start of scan: the rest is entropy-coded data
+            out.append(data[pos:])
+            return b"".join(out)
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:  # Standalone markers
+            out.append(data[pos:pos + 2])
+            pos += 2
+            continue
+        (seg_len,) = struct.unpack_from(">H", data, pos + 2)
+        end = pos + 2 + seg_len
+        if seg_len < 2 or end > length:
+            return None
+        if marker in _JPEG_STRIP_MARKERS:
+            if marker == 0xE1 and _exif_orientation(data[pos + 4:end]) != 1:
+                return None
+        else:
+            out.append(data[pos:end])
+        pos = end
+    return None
+
+
+def strip_png_metadata(data: bytes) -> Optional[bytes]:
+    """Drop text/EXIF/time chunks from a PNG (None if malformed)"""
+    if data[:8] != PNG_SIGNATURE:
+        return None
+    out = [PNG_SIGNATURE]
+    pos = 8
+    length = len(data)
+    while pos + 12 <= length:
+        (chunk_len,) = struct.unpack_from(">I", data, pos)
+        chunk_type = data[pos + 4:pos + 8]
+        end = pos + 12 + chunk_len
+        if end > length:
+            return None
+        if chunk_type not in _PNG_STRIP_CHUNKS:
+            out.append(data[pos:end])
+        pos = end
+        if chunk_type == b"IEND":
+            return b"".join(out)
+    return None
+
+
+def strip_metadata(data: bytes) -> Optional[bytes]:
+    """Lossless metadata strip for supported formats; None if not possible"""
+    fmt = sniff_format(data)
+    if fmt == "jpeg":
+        return strip_jpeg_metadata(data)
+    if fmt == "png":
+        return strip_png_metadata(data)
+    return None
@@ -1,40 +1,384 @@
+"""
+Image Service - Privacy blurring pipeline
+
+An image is decoded once into a Frame (grayscale and the downscaled
+detection copy are computed lazily and shared), then every configured
+detection stage (PRIVACY_STAGES, e.g. "face,plate") proposes regions, the
+regions are blurred and the result is encoded. Each step is timed so the
+per-stage cost shows up in PrivacyResult.timings.
+
+When no stage finds anything, the original bytes are passed through with
+only their metadata (EXIF/GPS, XMP, IPTC) stripped losslessly, avoiding the
+encode CPU and JPEG generation loss. Otherwise the output format and
+quality follow IMAGE_OUTPUT_FORMAT / IMAGE_JPEG_QUALITY / IMAGE_WEBP_QUALITY.
+
+Stages are pluggable: register_stage_factory("name", factory) makes a new
+detector available to PRIVACY_STAGES.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
 import cv2
 import numpy as np
-from PIL import Image
-import io
+from app.config import settings
+from app.services.image_metadata import image_dimensions, sniff_format, strip_metadata
+
+BLUR_MODE_ACCURATE = "accurate"
+BLUR_MODE_FAST = "fast"
+
+Box = Tuple[int, int, int, int]
+
+
+class Frame:
+    """Decoded image shared by all detection stages"""
+
+    def __init__(self, img: np.ndarray, gray: np.ndarray = None):
+        self.img = img
+        self._gray = gray
+        self._detection = {}
 
-# Load face detection model (on service initialization)
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.img, cv2.COLOR_BGR2GRAY)
+        return self._gray
 
+    def detection_gray(self, max_dim: int):
+        """
+        Grayscale copy halved with pyrDown until its longest side is <= max_dim
 
-def blur_sensitive_data(image_bytes: bytes) -> bytes:
+        Returns (small_image, scale) where scale maps small coordinates back to
+        the full-resolution image. Cached, so stages share one pyramid.
+        """
+        if max_dim not in self._detection:
+            gray = self.gray
+            scale = 1.0
+            while max(gray.shape[:2]) > max_dim:
+                gray = cv2.pyrDown(gray)
+                scale *= 2.0
+            self._detection[max_dim] = (gray, scale)
+        return self._detection[max_dim]
+
+    def upscale_boxes(self, boxes, scale: float, padding: float) -> List[Box]:
+        """Map boxes found on a detection copy back to full resolution (padded, clipped)"""
+        height, width = self.img.shape[:2]
+        result = []
+        for (x, y, w, h) in boxes:
+            pad_w = w * padding
+            pad_h = h * padding
+            x0 = max(0, int((x - pad_w) * scale))
+            y0 = max(0, int((y - pad_h) * scale))
+            x1 = min(width, int((x + w + pad_w) * scale))
+            y1 = min(height, int((y + h + pad_h) * scale))
+            result.append((x0, y0, x1 - x0, y1 - y0))
+        return result
+
+
+class CascadeStage:
+    """Haar cascade detector running on the shared grayscale frame"""
+
+    def __init__(self, name: str, cascade_file: str, scale_factor: float = 1.1,
+                 min_neighbors: int = 4, min_size: Tuple[int, int] = (0, 0),
+                 detect_max_dim: int = None):
+        self.name = name
+        self.cascade = cv2.CascadeClassifier(cv2.data.haarcascades + cascade_file)
+        if self.cascade.empty():
+            raise ValueError(f"Failed to load cascade {cascade_file}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        # Always detect on a reduced copy, even in accurate mode (None = full resolution)
+        self.detect_max_dim = detect_max_dim
+
+    def detect(self, frame: Frame, mode: str) -> List[Box]:
+        max_dim = self.detect_max_dim
+        if mode == BLUR_MODE_FAST:
+            max_dim = min(settings.BLUR_DETECT_MAX_DIM, max_dim or settings.BLUR_DETECT_MAX_DIM)
+
+        if max_dim is None:
+            found = self.cascade.detectMultiScale(
+                frame.gray, self.scale_factor, self.min_neighbors, minSize=self.min_size
+            )
+            return [tuple(int(v) for v in box) for box in found]
+
+        small, scale = frame.detection_gray(max_dim)
+        min_size = (int(self.min_size[0] / scale), int(self.min_size[1] / scale))
+        found = self.cascade.detectMultiScale(
+            small, self.scale_factor, self.min_neighbors, minSize=min_size
+        )
+        return frame.upscale_boxes(found, scale, settings.BLUR_FAST_PADDING)
+
+
+class OnnxDetectorStage:
     """
-    Detect and blur faces and license plates in image
-    Returns blurred image as JPEG bytes
+    Small single-class ONNX detector (e.g. a plate model) run through OpenCV DNN
+
+    Expects a YOLO-style output of (1, N, 5) rows [cx, cy, w, h, score] in
+    input-pixel coordinates; the transposed (1, 5, N) layout is also accepted.
+    """
+
+    def __init__(self, name: str, model_path: str, input_size: int,
+                 score_threshold: float, nms_threshold: float = 0.45):
+        self.name = name
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.input_size = input_size
+        self.score_threshold = score_threshold
+        self.nms_threshold = nms_threshold
+
+    def detect(self, frame: Frame, mode: str) -> List[Box]:
+        height, width = frame.img.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            frame.img, 1 / 255.0, (self.input_size, self.input_size), swapRB=True, crop=False
+        )
+        self.net.setInput(blob)
+        out = np.squeeze(self.net.forward())
+        if out.ndim != 2:
+            return []
+        if out.shape[0] < out.shape[1]:
+            out = out.T
+
+        out = out[out[:, 4] >= self.score_threshold]
+        sx = width / self.input_size
+        sy = height / self.input_size
+        boxes = [
+            [int((cx - w / 2) * sx), int((cy - h / 2) * sy), int(w * sx), int(h * sy)]
+            for cx, cy, w, h in out[:, :4]
+        ]
+        keep = cv2.dnn.NMSBoxes(boxes, out[:, 4].tolist(), self.score_threshold, self.nms_threshold)
+        result = []
+        for i in np.array(keep).flatten():
+            x, y, w, h = boxes[i]
+            x0, y0 = max(0, x), max(0, y)
+            result.append((x0, y0, min(width, x + w) - x0, min(height, y + h) - y0))
+        return result
+
+
+def _face_stage():
+    return CascadeStage("face", "haarcascade_frontalface_default.xml", 1.1, 4)
+
+
+def _plate_stage():
+    if settings.PLATE_ONNX_MODEL_PATH:
+        return OnnxDetectorStage(
+            "plate",
+            settings.PLATE_ONNX_MODEL_PATH,
+            settings.PLATE_ONNX_INPUT_SIZE,
+            settings.PLATE_ONNX_SCORE_THRESHOLD,
+        )
+    # Plates are large, high-contrast targets: detecting them on the shared
+    # reduced copy keeps the stage cheap without hurting recall much
+    return CascadeStage(
+        "plate", "haarcascade_russian_plate_number.xml", 1.1, 4,
+        min_size=(40, 12), detect_max_dim=settings.PLATE_DETECT_MAX_DIM,
+    )
+
+
+_stage_factories: Dict[str, Callable] = {
+    "face": _face_stage,
+    "plate": _plate_stage,
+}
+
+
+def register_stage_factory(name: str, factory: Callable):
+    """Make a detector available to PRIVACY_STAGES (factory returns an object with .name and .detect)"""
+    _stage_factories[name] = factory
+
+
+def build_stages(names: str):
+    """Instantiate the comma-separated list of stages (e.g. "face,plate")"""
+    stages = []
+    for name in (n.strip() for n in names.split(",")):
+        if not name:
+            continue
+        if name not in _stage_factories:
+            raise ValueError(f"Unknown privacy stage: {name}")
+        stages.append(_stage_factories[name]())
+    return stages
+
+
+# Load detection models once (on service initialization / worker process start)
+stages = build_stages(settings.PRIVACY_STAGES)
+
+
+@dataclass
+class PrivacyResult:
+    data: bytes
+    format: str = "jpeg"  # "jpeg", "png" or "webp"
+    passthrough: bool = False  # True when the original bytes were kept (metadata stripped)
+    regions: Dict[str, List[Box]] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)  # milliseconds per step
+    derivatives: Dict[str, bytes] = field(default_factory=dict)  # rendition name -> encoded bytes
+
+
+def parse_derivatives(spec: str) -> Dict[str, int]:
+    """Parse "thumbnail:160,medium:640" into {"thumbnail": 160, "medium": 640}"""
+    sizes = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, size = item.partition(":")
+        sizes[name.strip()] = int(size)
+    return sizes
+
+
+def render_derivatives(img: np.ndarray, sizes: Dict[str, int]) -> Dict[str, bytes]:
+    """
+    Encode downscaled renditions of img (longest side = size, never upscaled)
+
+    Largest first, each one resized from the previous rendition, so the
+    full-resolution frame is only read once.
+    """
+    result = {}
+    source = img
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        height, width = source.shape[:2]
+        scale = size / max(height, width)
+        if scale < 1:
+            source = cv2.resize(
+                source, (max(1, round(width * scale)), max(1, round(height * scale))),
+                interpolation=cv2.INTER_AREA,
+            )
+        result[name], _ = encode_image(source)
+    return result
+
+
+def encode_image(img: np.ndarray, output_format: str = None):
+    """
+    Encode a BGR image with the configured format and quality
+
+    Returns (bytes, format)
     """
-    # Convert bytes to cv2 image
+    output_format = output_format or settings.IMAGE_OUTPUT_FORMAT
+    if output_format == "webp":
+        ext, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, settings.IMAGE_WEBP_QUALITY]
+    else:
+        output_format = "jpeg"
+        ext, params = ".jpg", [
+            cv2.IMWRITE_JPEG_QUALITY, settings.IMAGE_JPEG_QUALITY,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(settings.IMAGE_JPEG_PROGRESSIVE),
+            cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+        ]
+    success, encoded_img = cv2.imencode(ext, img, params)
+    if not success:
+        raise ValueError("Failed to encode image")
+    return encoded_img.tobytes(), output_format
+
+
+def _blur_region(img: np.ndarray, box, method: str):
+    """Obscure one region in place with a filter sized to the region"""
+    x, y, w, h = box
+    if w <= 0 or h <= 0:
+        return
+    region = img[y:y+h, x:x+w]
+
+    if method == "pixelate":
+        # ~8 blocks across the shorter side is unrecognisable and very cheap
+        block = max(1, min(w, h) // 8)
+        small = cv2.resize(region, (max(1, w // block), max(1, h // block)), interpolation=cv2.INTER_AREA)
+        img[y:y+h, x:x+w] = cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST)
+    elif method == "box":
+        k = max(3, min(w, h) // 3)
+        img[y:y+h, x:x+w] = cv2.blur(region, (k, k))
+    else:
+        k = max(3, (min(w, h) // 3) | 1)  # Gaussian kernel must be odd
+        img[y:y+h, x:x+w] = cv2.GaussianBlur(region, (k, k), 0)
+
+
+def detect_faces(gray: np.ndarray, mode: str = BLUR_MODE_ACCURATE) -> List[Box]:
+    """Detect faces in a grayscale image (full-resolution box coordinates)"""
+    return _face_stage_instance().detect(Frame(gray, gray=gray), mode)
+
+
+def _face_stage_instance():
+    for stage in stages:
+        if stage.name == "face":
+            return stage
+    return _face_stage()
+
+
+def process_image(image_bytes: bytes, mode: str = None, derivatives: Dict[str, int] = None) -> PrivacyResult:
+    """
+    Run the privacy pipeline: decode once, run every stage, blur, encode
+
+    Args:
+        image_bytes: Raw image data (any buffer, e.g. an mmap; it is not copied)
+        mode: "accurate" or "fast" (defaults to settings.BLUR_MODE)
+        derivatives: Rendition name -> longest side in pixels (None = no renditions)
+
+    Returns:
+        PrivacyResult with image bytes, detected regions per stage and timings
+    """
+    mode = mode or settings.BLUR_MODE
+    timings = {}
+
+    # Refuse decompression bombs from the header, before allocating the frame
+    dimensions = image_dimensions(image_bytes)
+    if dimensions is not None and dimensions[0] * dimensions[1] > settings.UPLOAD_MAX_PIXELS:
+        raise ValueError("Image dimensions too large")
+
+    start = time.perf_counter()
     nparr = np.frombuffer(image_bytes, np.uint8)
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
     if img is None:
         raise ValueError("Invalid image data")
+    timings["decode"] = (time.perf_counter() - start) * 1000
 
-    # Detect faces
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    # Grayscale conversion is done once and shared by all stages
+    start = time.perf_counter()
+    frame = Frame(img, gray=cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    timings["grayscale"] = (time.perf_counter() - start) * 1000
 
-    # Blur each detected face
-    for (x, y, w, h) in faces:
-        face_region = img[y:y+h, x:x+w]
-        blurred_face = cv2.GaussianBlur(face_region, (99, 99), 30)
-        img[y:y+h, x:x+w] = blurred_face
+    regions = {}
+    for stage in stages:
+        start = time.perf_counter()
+        regions[stage.name] = stage.detect(frame, mode)
+        timings[stage.name] = (time.perf_counter() - start) * 1000
 
-    # TODO: Add license plate detection (can use YOLO or ALPR library)
-    # For MVP, face detection is primary focus
+    # Nothing to blur: keep the original pixels, drop only the metadata
+    if settings.IMAGE_PASSTHROUGH and not any(regions.values()):
+        start = time.perf_counter()
+        stripped = strip_metadata(image_bytes)
+        if stripped is not None:
+            timings["strip"] = (time.perf_counter() - start) * 1000
+            result = PrivacyResult(
+                data=stripped, format=sniff_format(stripped), passthrough=True,
+                regions=regions, timings=timings,
+            )
+            _add_derivatives(result, img, derivatives)
+            return result
 
-    # Convert back to JPEG bytes
-    success, encoded_img = cv2.imencode('.jpg', img)
-    if not success:
-        raise ValueError("Failed to encode image")
+    start = time.perf_counter()
+    for boxes in regions.values():
+        for box in boxes:
+            if mode == BLUR_MODE_FAST:
+                _blur_region(img, box, settings.BLUR_FAST_FILTER)
+            else:
+                x, y, w, h = box
+                img[y:y+h, x:x+w] = cv2.GaussianBlur(img[y:y+h, x:x+w], (99, 99), 30)
+    timings["blur"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    data, output_format = encode_image(img)
+    timings["encode"] = (time.perf_counter() - start) * 1000
+
+    result = PrivacyResult(data=data, format=output_format, regions=regions, timings=timings)
+    _add_derivatives(result, img, derivatives)
+    return result
+
+
+def _add_derivatives(result: PrivacyResult, img: np.ndarray, derivatives: Dict[str, int]):
+    if not derivatives:
+        return
+    start = time.perf_counter()
+    result.derivatives = render_derivatives(img, derivatives)
+    result.timings["derivatives"] = (time.perf_counter() - start) * 1000
 
-    return encoded_img.tobytes()
+
+def blur_sensitive_data(image_bytes: bytes, mode: str = None) -> bytes:
+    """
+    Detect and blur faces and license plates in image
+    Returns blurred image bytes (use image_metadata.sniff_format for the format)
+    """
+    return process_image(image_bytes, mode).data
@@ -0,0 +1,458 @@
+"""
+Ingestion Service - Background privacy blurring and storage upload
+
+POST /api/v1/hazards only spools the raw image to local disk and inserts the
+hazard row in the "pending" state. A pool of worker threads then blurs the
+spooled image, uploads it and its thumbnail/medium renditions to the
+configured storage backend and marks the hazard "ready" (or "failed" once
+INGEST_MAX_RETRIES attempts are used up).
+
+The CPU-heavy blur itself runs in the blur engine's worker processes; these
+threads only wait on it and on storage I/O. Once INGEST_MAX_BACKLOG hazards
+are queued (or the blur engine is saturated) new uploads are shed with 503.
+
+A worker claims a hazard (claimed_by / claimed_until, renewed on every
+attempt, expiring after INGEST_CLAIM_SECONDS) with a conditional UPDATE
+before touching it, so processes sharing a spool directory never blur and
+upload the same image twice. At startup a process re-queues only the
+pending hazards whose raw image is in its own spool.
+
+Images already stored (same bytes or a near-duplicate, see dedup_service)
+skip the blur and the upload and simply reference the existing object.
+
+Uploads are streamed into the spool in UPLOAD_CHUNK_BYTES chunks (hashed
+and size-checked on the way), and the spooled file is memory-mapped rather
+than read, so a raw image is never held in the API process's heap.
+
+Where an upload spends its time is recorded in safar_ingestion_stage_seconds
+by stage: spool and store (the POST /hazards request: streaming the image to
+disk, then waiting for the group commit), db_insert (one group's insert
+transaction), queue_wait (until a worker picks the hazard up), hash, dedup,
+blur_engine (wall time in the blur engine, its queue included) with the
+privacy pipeline's own stages inside it (decode, grayscale, face, plate,
+strip, blur, encode, derivatives), upload and finish (marking it ready).
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO
+
+from sqlalchemy import and_, or_
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import Counter, Gauge, Histogram
+from app.models.hazard import Hazard, STATUS_PENDING, STATUS_READY, STATUS_FAILED
+from app.services import dedup_service
+from app.services.blur_engine import blur_engine, mapped_file
+from app.services.hazard_stream import EVENT_UPDATED, get_hazard_stream
+from app.services.image_metadata import FORMAT_EXTENSIONS, image_dimensions, sniff_format
+from app.services.nearby_cache import get_nearby_cache
+from app.services.storage_service import upload_images
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Owner of this process's claims on pending hazards (unique per process start)
+PROCESS_ID = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+upload_rejected = Counter(
+    "safar_upload_rejected_total",
+    "Uploads rejected before processing, by reason (body_size, image_size, format, dimensions, empty)",
+    ("reason",),
+)
+ingestion_stage_seconds = Histogram(
+    "safar_ingestion_stage_seconds",
+    "Hazard ingestion time per stage (see ingestion_service)",
+    ("stage",),
+)
+
+
+class UploadRejected(ValueError):
+    """An upload failed a size or format check (status_code is the HTTP status to return)"""
+
+    def __init__(self, status_code: int, detail: str, reason: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.reason = reason
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    content_hash: str
+    size: int
+    format: str
+
+
+def spool_path(hazard_id) -> str:
+    """Local path of the raw (not yet blurred) image for a hazard"""
+    return os.path.join(settings.SPOOL_DIR, f"{hazard_id}.raw")
+
+
+def spool_upload(hazard_id, source: BinaryIO, max_bytes: int = None) -> SpooledUpload:
+    """
+    Stream an uploaded image into the spool directory
+
+    Reads `source` in UPLOAD_CHUNK_BYTES chunks, hashing and counting as it
+    goes. The format (and, when the header is in the first chunk, the
+    dimensions) is checked before the rest is read, and the upload is
+    abandoned as soon as it passes `max_bytes`. Blocking; run in a thread.
+
+    Raises:
+        UploadRejected: Empty, too large, not JPEG/PNG/WebP, or too many pixels
+    """
+    max_bytes = max_bytes or settings.UPLOAD_MAX_IMAGE_BYTES
+    os.makedirs(settings.SPOOL_DIR, exist_ok=True)
+    path = spool_path(hazard_id)
+    tmp_path = f"{path}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    image_format = None
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = source.read(settings.UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                if image_format is None:
+                    image_format = sniff_format(chunk)
+                    if image_format is None:
+                        raise UploadRejected(415, "Unsupported image format (JPEG, PNG or WebP)", "format")
+                    _check_dimensions(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(413, "Image too large", "image_size")
+                digest.update(chunk)
+                f.write(chunk)
+        if size == 0:
+            raise UploadRejected(400, "Empty image", "empty")
+        os.replace(tmp_path, path)
+    except BaseException as e:
+        if isinstance(e, UploadRejected):
+            upload_rejected.inc(reason=e.reason)
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return SpooledUpload(path=path, content_hash=digest.hexdigest(), size=size, format=image_format)
+
+
+def _check_dimensions(header: bytes):
+    dimensions = image_dimensions(header)
+    if dimensions is not None and dimensions[0] * dimensions[1] > settings.UPLOAD_MAX_PIXELS:
+        raise UploadRejected(413, "Image dimensions too large", "dimensions")
+
+
+def discard_spool(hazard_id):
+    try:
+        os.remove(spool_path(hazard_id))
+    except FileNotFoundError:
+        pass
+
+
+def _claimable():
+    """Pending and not claimed by another live process"""
+    return and_(
+        Hazard.status == STATUS_PENDING,
+        or_(
+            Hazard.claimed_by.is_(None),
+            Hazard.claimed_by == PROCESS_ID,
+            Hazard.claimed_until < datetime.now(timezone.utc),
+        ),
+    )
+
+
+def _claim(db, hazard_id) -> bool:
+    """
+    Claim a pending hazard for this process (or renew the claim) and count
+    the processing attempt. False if it is finished, deleted or claimed by
+    another process. Commits.
+    """
+    claimed = db.query(Hazard).filter(Hazard.hazard_id == hazard_id, _claimable()).update({
+        Hazard.claimed_by: PROCESS_ID,
+        Hazard.claimed_until: datetime.now(timezone.utc) + timedelta(seconds=settings.INGEST_CLAIM_SECONDS),
+        Hazard.processing_attempts: Hazard.processing_attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+    return claimed > 0
+
+
+class IngestionPool:
+    """Thread pool that turns spooled raw images into uploaded, blurred images"""
+
+    def __init__(self, num_workers: int, max_retries: int, retry_backoff: float, max_backlog: int):
+        self.num_workers = num_workers
+        self.max_retries = max_retries
+        self.max_backlog = max_backlog
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+        self._errors = {}  # hazard_id -> unexpected errors in a row (under _inflight_lock)
+
+    @property
+    def backlog(self) -> int:
+        """Number of hazards waiting for a worker"""
+        return self._queue.qsize()
+
+    @property
+    def saturated(self) -> bool:
+        """True when new uploads should be rejected instead of queued"""
+        return self.backlog >= self.max_backlog or blur_engine.saturated
+
+    def has_room(self, count: int) -> bool:
+        """True if `count` more hazards can be queued (batch uploads)"""
+        return self.backlog + count <= self.max_backlog and not blur_engine.saturated
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"ingest-worker-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(_STOP)
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def submit(self, hazard_id):
+        """Queue a pending hazard for processing (no-op if already queued)"""
+        with self._inflight_lock:
+            if hazard_id in self._inflight:
+                return
+            self._inflight.add(hazard_id)
+        self._queue.put((hazard_id, time.perf_counter()))
+
+    def _retry_later(self, hazard_id, attempt: int):
+        delay = self.retry_backoff * (2 ** (attempt - 1))
+        timer = threading.Timer(delay, self.submit, args=(hazard_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            hazard_id = None
+            try:
+                if item is _STOP:
+                    return
+                hazard_id, queued_at = item
+                ingestion_stage_seconds.observe(time.perf_counter() - queued_at, stage="queue_wait")
+                self._process(hazard_id)
+                with self._inflight_lock:
+                    self._errors.pop(hazard_id, None)
+            except Exception:
+                logger.exception("Unexpected error processing hazard %s", hazard_id)
+                if hazard_id is not None:
+                    self._unexpected_error(hazard_id)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.discard(hazard_id)
+                self._queue.task_done()
+
+    def _unexpected_error(self, hazard_id):
+        """
+        An error outside the per-attempt handling (e.g. the database failed
+        loading the hazard or committing its result): retry with backoff,
+        then mark the hazard failed instead of leaving it pending
+        """
+        with self._inflight_lock:
+            errors = self._errors.get(hazard_id, 0) + 1
+            self._errors[hazard_id] = errors
+        if errors < self.max_retries:
+            self._retry_later(hazard_id, errors)
+            return
+        with self._inflight_lock:
+            self._errors.pop(hazard_id, None)
+        db = SessionLocal()
+        try:
+            failed = db.query(Hazard).filter(Hazard.hazard_id == hazard_id, _claimable()).update({
+                Hazard.status: STATUS_FAILED,
+                Hazard.processing_error: "Processing failed repeatedly",
+            }, synchronize_session=False)
+            db.commit()
+            if failed:
+                discard_spool(hazard_id)
+                logger.error("Giving up on hazard %s after %d unexpected errors", hazard_id, errors)
+        except Exception:
+            # Still pending: recover_pending_hazards picks it up on the next start
+            logger.exception("Could not mark hazard %s failed", hazard_id)
+        finally:
+            db.close()
+
+    def _process(self, hazard_id):
+        db = SessionLocal()
+        try:
+            claimed = _claim(db, hazard_id)
+            hazard = db.query(Hazard).filter(Hazard.hazard_id == hazard_id).first()
+            if not claimed:
+                if hazard is None or hazard.status != STATUS_PENDING:
+                    discard_spool(hazard_id)  # Finished (here or by another process) or deleted
+                return  # Otherwise another process holds it; its spool file stays
+            attempt = hazard.processing_attempts
+
+            try:
+                # Mapped, not read: hashing and the dHash decode work on the page cache
+                path = spool_path(hazard_id)
+                with ingestion_stage_seconds.time(stage="hash"), mapped_file(path) as image:
+                    raw_hash = hazard.content_hash or dedup_service.content_hash(image)
+                    dhash_value = dedup_service.dhash(image) if settings.DEDUP_ENABLED else None
+
+                # Same or near-identical image already stored: reuse it
+                if settings.DEDUP_ENABLED:
+                    with ingestion_stage_seconds.time(stage="dedup"):
+                        existing = (dedup_service.find_exact(db, raw_hash)
+                                    or dedup_service.find_near(db, dhash_value))
+                    if existing is not None:
+                        dedup_service.add_reference(db, existing)
+                        self._mark_ready(db, hazard, existing.image_url, existing.thumbnail_url,
+                                         existing.medium_url, raw_hash)
+                        return
+
+                # The blur worker process maps the spool file itself
+                with ingestion_stage_seconds.time(stage="blur_engine"):
+                    result = blur_engine.process(path)
+                for stage, ms in result.timings.items():
+                    ingestion_stage_seconds.observe(ms / 1000, stage=stage)
+                blurred_hash = dedup_service.content_hash(result.data)
+                existing = dedup_service.find_blurred(db, blurred_hash) if settings.DEDUP_ENABLED else None
+                if existing is not None:
+                    # Counted on the stored object, committed with the hazard (an existing alias is kept)
+                    dedup_service.add_reference(db, existing)
+                    if existing.content_hash != raw_hash:
+                        dedup_service.add_alias(db, raw_hash, dhash_value, existing)
+                    self._mark_ready(db, hazard, existing.image_url, existing.thumbnail_url,
+                                     existing.medium_url, raw_hash)
+                    return
+
+                # Full image and renditions are uploaded concurrently
+                object_name = uuid.uuid4()
+                names = list(result.derivatives)
+                uploads = [(result.data, f"{object_name}.{FORMAT_EXTENSIONS.get(result.format, 'jpg')}")]
+                for name in names:
+                    data = result.derivatives[name]
+                    extension = FORMAT_EXTENSIONS.get(sniff_format(data), "jpg")
+                    uploads.append((data, f"{object_name}_{name}.{extension}"))
+                with ingestion_stage_seconds.time(stage="upload"):
+                    urls = upload_images(uploads)
+                image_url = urls[0]
+                derivative_urls = dict(zip(names, urls[1:]))
+            except (FileNotFoundError, ValueError) as e:
+                # Missing spool file or undecodable image: retrying cannot help
+                hazard.status = STATUS_FAILED
+                hazard.processing_error = str(e)
+                db.commit()
+                discard_spool(hazard_id)
+                return
+            except Exception as e:
+                hazard.processing_error = str(e)
+                if attempt >= self.max_retries:
+                    hazard.status = STATUS_FAILED
+                    db.commit()
+                    discard_spool(hazard_id)
+                    logger.error("Giving up on hazard %s after %d attempts: %s", hazard_id, attempt, e)
+                else:
+                    db.commit()
+                    self._retry_later(hazard_id, attempt)
+                return
+
+            if settings.DEDUP_ENABLED:
+                dedup_service.record_miss()
+                dedup_service.register(db, raw_hash, blurred_hash, dhash_value, image_url,
+                                       derivative_urls.get("thumbnail"), derivative_urls.get("medium"))
+            self._mark_ready(db, hazard, image_url, derivative_urls.get("thumbnail"),
+                             derivative_urls.get("medium"), raw_hash)
+        finally:
+            db.close()
+
+    def _mark_ready(self, db, hazard, image_url, thumbnail_url, medium_url, raw_hash):
+        hazard.image_url = image_url
+        hazard.thumbnail_url = thumbnail_url
+        hazard.medium_url = medium_url
+        hazard.content_hash = raw_hash
+        hazard.status = STATUS_READY
+        hazard.processing_error = None
+        with ingestion_stage_seconds.time(stage="finish"):
+            db.commit()
+        discard_spool(hazard.hazard_id)
+        if hazard.canonical_id is None:
+            # /nearby and the stream show status and image URLs
+            cache = get_nearby_cache()
+            if cache is not None:
+                cache.invalidate_blocking(hazard.latitude, hazard.longitude)
+            get_hazard_stream().publish(hazard, EVENT_UPDATED)
+
+
+ingestion_pool = IngestionPool(
+    num_workers=settings.INGEST_WORKERS,
+    max_retries=settings.INGEST_MAX_RETRIES,
+    retry_backoff=settings.INGEST_RETRY_BACKOFF_SECONDS,
+    max_backlog=settings.INGEST_MAX_BACKLOG,
+)
+
+Gauge("safar_ingestion_backlog", "Hazards waiting for an ingestion worker", lambda: ingestion_pool.backlog)
+
+
+def _spooled_hazard_ids():
+    try:
+        names = os.listdir(settings.SPOOL_DIR)
+    except FileNotFoundError:
+        return []
+    hazard_ids = []
+    for name in names:
+        stem, extension = os.path.splitext(name)
+        if extension == ".raw":
+            try:
+                hazard_ids.append(uuid.UUID(stem))
+            except ValueError:
+                pass
+    return hazard_ids
+
+
+def recover_pending_hazards() -> int:
+    """
+    Re-queue pending hazards left by a previous process (crash or restart)
+
+    Only hazards whose raw image is in this host's spool: those spooled on
+    another host are that host's to recover. Processes sharing the spool
+    may queue the same hazard; the worker's claim lets only one process it.
+
+    Returns number of hazards queued
+    """
+    spooled = _spooled_hazard_ids()
+    pending = []
+    db = SessionLocal()
+    try:
+        for start in range(0, len(spooled), 500):
+            pending += db.query(Hazard.hazard_id).filter(
+                Hazard.hazard_id.in_(spooled[start:start + 500]),
+                Hazard.status == STATUS_PENDING,
+            ).all()
+    finally:
+        db.close()
+
+    for (hazard_id,) in pending:
+        ingestion_pool.submit(hazard_id)
+    return len(pending)
@@ -0,0 +1,398 @@
+"""
+Nearby Cache - Read-through cache for /nearby polls
+
+Vehicles on the same road segment poll /nearby with almost identical
+parameters, so queries are quantized before caching:
+
+- location -> geohash cell (NEARBY_CACHE_PRECISION); the database query runs
+  once around the cell centre with the radius widened by the cell's
+  half-diagonal, so it covers every point in the cell
+- radius -> next RADIUS_BUCKETS_M step, limit -> next LIMIT_BUCKETS step,
+  over-fetched by OVERFETCH
+
+Each request re-ranks the cached hazards by exact distance from its own
+location. If the cached set can't guarantee the exact answer (it was
+truncated closer than the request needs), the next finer cell is tried,
+then the database.
+
+Tiers: an in-process LRU in front of Redis (REDIS_URL, redis.asyncio from the
+request path). Without REDIS_URL an in-memory FakeRedis stands in, which
+keeps tests and single-process dev servers self-contained.
+
+Invalidation: keys embed version counters of the coarse "version cells"
+the search circle overlaps (geohash level picked per radius so a circle
+touches only a few). create_hazard bumps the counters of the cells containing
+the hazard, which retires exactly the cached queries that could include it.
+Counters read from Redis are kept locally for NEARBY_CACHE_VERSION_TTL_MS,
+so a local hit costs no Redis round trip; this process's own invalidations
+update them at once, other processes' show up within that TTL.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import Counter, Histogram
+from app.services.spatial_engine import haversine_m_vec
+from app.utils import geohash_bounds, geohash_encode, haversine_m
+
+logger = logging.getLogger(__name__)
+
+RADIUS_BUCKETS_M = (500, 1000, 2000, 5000, 10000, 20000, 50000)
+LIMIT_BUCKETS = (10, 25, 50, 100, 200, 500)
+OVERFETCH = 2
+# (max query radius, geohash precision of its version cells): ~4.9km, ~39km, ~156km
+# cells, so a search circle overlaps at most a 4x4 block of them
+VERSION_LEVELS = ((5000, 5), (20000, 4), (float("inf"), 3))
+
+nearby_cache_requests = Counter(
+    "safar_nearby_cache_requests_total",
+    "/nearby cache lookups by result (hit_local, hit_redis, miss, inexact, error)",
+    ("result",),
+)
+nearby_request_seconds = Histogram(
+    "safar_nearby_request_seconds",
+    "/nearby handler latency by cache outcome (hit or miss)",
+    ("cache",),
+)
+nearby_stage_seconds = Histogram(
+    "safar_nearby_stage_seconds",
+    "/nearby time per stage: query (spatial query on a cache miss) and encode (response body)",
+    ("stage",),
+)
+
+
+class FakeRedis:
+    """The subset of the redis-py client used here, in process memory"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._live(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+
+class AsyncFakeRedis:
+    """Awaitable view of a FakeRedis (shares its data)"""
+
+    def __init__(self, fake: FakeRedis):
+        self.sync = fake
+
+    async def get(self, key):
+        return self.sync.get(key)
+
+    async def mget(self, keys):
+        return self.sync.mget(keys)
+
+    async def set(self, key, value, ex=None):
+        return self.sync.set(key, value, ex=ex)
+
+    async def incr(self, key):
+        return self.sync.incr(key)
+
+    async def flushall(self):
+        self.sync.flushall()
+
+
+class LocalLRU:
+    """Bounded, thread-safe LRU of decoded entries with a TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl_seconds: Optional[float] = None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl_seconds is None else min(ttl_seconds, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _with_coordinates(entry: dict) -> dict:
+    """Add NumPy coordinate arrays for vectorized re-ranking (local tier only)"""
+    items = entry["items"]
+    entry["coordinates"] = (
+        np.fromiter((item["latitude"] for item in items), dtype=np.float64, count=len(items)),
+        np.fromiter((item["longitude"] for item in items), dtype=np.float64, count=len(items)),
+    )
+    return entry
+
+
+def _bucket(value: float, buckets) -> float:
+    for bucket in buckets:
+        if value <= bucket:
+            return bucket
+    return buckets[-1]
+
+
+def _version_precision(radius_m: float) -> int:
+    for max_radius, precision in VERSION_LEVELS:
+        if radius_m <= max_radius:
+            return precision
+    return VERSION_LEVELS[-1][1]
+
+
+def _covering_cells(lat: float, lon: float, radius_m: float, precision: int) -> List[str]:
+    """Geohash cells of `precision` overlapping the bounding box of a circle"""
+    dlat = math.degrees(radius_m / 6371008.8)
+    cos_lat = max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+    dlon = min(dlat / cos_lat, 180.0)
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash_encode(lat, lon, precision))
+    step_lat, step_lon = max_lat - min_lat, max_lon - min_lon
+    cells = set()
+    la = max(lat - dlat, -90.0)
+    while True:
+        lo = lon - dlon
+        while True:
+            cells.add(geohash_encode(la, (lo + 180) % 360 - 180, precision))
+            if lo >= lon + dlon:
+                break
+            lo = min(lo + step_lon, lon + dlon)
+        if la >= min(lat + dlat, 90.0):
+            break
+        la = min(la + step_lat, lat + dlat, 90.0)
+    return sorted(cells)
+
+
+class CacheUnavailable(Exception):
+    """The cache tier (Redis or the local LRU) failed; the database still answers"""
+
+
+class NearbyCache:
+    """
+    `redis_client` is an asyncio client used by lookups and invalidate();
+    `blocking_client` (same server) serves invalidate_blocking() from
+    worker threads
+    """
+
+    def __init__(self, redis_client, blocking_client, local_entries: int, ttl_seconds: int,
+                 precision: int, version_ttl_seconds: float = 0):
+        self.redis = redis_client
+        self.blocking_redis = blocking_client
+        self.local = LocalLRU(local_entries, ttl_seconds)
+        # Version counters last read from (or written to) Redis: {key: int}
+        self.local_versions = LocalLRU(local_entries if version_ttl_seconds > 0 else 0, version_ttl_seconds)
+        self.ttl = ttl_seconds
+        self.precision = precision
+
+    async def _versions(self, cells: List[str]) -> str:
+        keys = [f"nearby:v:{cell}" for cell in cells]
+        versions = {key: self.local_versions.get(key) for key in keys}
+        missing = [key for key, version in versions.items() if version is None]
+        if missing:
+            for key, value in zip(missing, await self.redis.mget(missing)):
+                versions[key] = int(value or 0)
+                self.local_versions.put(key, versions[key])
+        raw = ",".join(f"{cell}={versions[key]}" for cell, key in zip(cells, keys))
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    async def _lookup_cell(self, precision, latitude, longitude, radius_m, limit, load):
+        """(results, outcome) from the cell of `precision`; results is None if inexact"""
+        cell = geohash_encode(latitude, longitude, precision)
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(cell)
+        center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+        half_diagonal = haversine_m(min_lat, min_lon, max_lat, max_lon) / 2
+        radius_bucket = _bucket(radius_m, RADIUS_BUCKETS_M)
+        fetch_limit = _bucket(limit, LIMIT_BUCKETS) * OVERFETCH
+        search_radius = radius_bucket + half_diagonal
+
+        version_cells = _covering_cells(
+            center_lat, center_lon, search_radius, _version_precision(radius_bucket)
+        )
+        try:
+            key = f"nearby:{cell}:{radius_bucket}:{fetch_limit}:{await self._versions(version_cells)}"
+            entry, outcome = self.local.get(key), "hit_local"
+            if entry is None:
+                raw = await self.redis.get(key)
+                if raw is not None:
+                    entry, outcome = _with_coordinates(json.loads(raw)), "hit_redis"
+                    self.local.put(key, entry)
+        except Exception as e:
+            raise CacheUnavailable("Nearby cache read failed") from e
+
+        if entry is None:
+            outcome = "miss"
+            rows = await load(center_lat, center_lon, search_radius, fetch_limit)
+            entry = {
+                "complete": len(rows) < fetch_limit,
+                "max_distance": rows[-1][1] if rows else 0.0,
+                "items": [item for item, _ in rows],
+            }
+            try:
+                await self.redis.set(key, json.dumps(entry, separators=(",", ":")), ex=self.ttl)
+            except Exception:
+                logger.warning("Nearby cache write failed", exc_info=True)
+            entry = _with_coordinates(entry)
+            self.local.put(key, entry)
+
+        lats, lons = entry["coordinates"]
+        distances = haversine_m_vec(latitude, longitude, lats, lons)
+        order = np.argsort(distances, kind="stable")
+        order = order[distances[order] <= radius_m][:limit]
+        items = entry["items"]
+        results = [(items[i], float(distances[i])) for i in order]
+
+        # Everything nearer than `needed` to the request point lies within
+        # needed + half_diagonal of the centre, so it is cached if that is
+        # inside the truncated set's reach
+        needed = results[-1][1] if results and len(results) == limit else radius_m
+        if not entry["complete"] and needed + half_diagonal > entry["max_distance"]:
+            return None, outcome
+        return results, outcome
+
+    async def lookup(self, latitude: float, longitude: float, radius_m: float, limit: int,
+                     load: Callable[[float, float, float, int], Awaitable[List[Tuple[dict, float]]]]):
+        """
+        Nearest `limit` items within radius_m as (item, distance_m)
+
+        `await load(lat, lon, radius_m, limit)` runs the real query; items must carry
+        "latitude" and "longitude" and be JSON-serializable. Dense areas, where
+        the NEARBY_CACHE_PRECISION cell entry is truncated too close, retry on
+        the next finer cell before querying directly. Errors of `load` itself
+        propagate. Returns (results, cache outcome).
+        """
+        try:
+            for precision in (self.precision, self.precision + 1):
+                results, outcome = await self._lookup_cell(precision, latitude, longitude, radius_m, limit, load)
+                if results is not None:
+                    nearby_cache_requests.inc(result=outcome)
+                    return results, outcome
+        except CacheUnavailable:
+            logger.warning("Nearby cache unavailable, querying the database", exc_info=True)
+            nearby_cache_requests.inc(result="error")
+            return await load(latitude, longitude, radius_m, limit), "error"
+
+        nearby_cache_requests.inc(result="inexact")
+        return await load(latitude, longitude, radius_m, limit), "inexact"
+
+    async def invalidate(self, latitude: float, longitude: float):
+        """Retire cached queries whose search circle could contain this point"""
+        await self.invalidate_many([(latitude, longitude)])
+
+    async def invalidate_many(self, points):
+        """invalidate() for several (latitude, longitude) points, bumping each version cell once"""
+        keys = sorted({key for latitude, longitude in points for key in _version_keys(latitude, longitude)})
+        try:
+            for key in keys:
+                self.local_versions.put(key, int(await self.redis.incr(key)))
+        except Exception:
+            logger.warning("Nearby cache invalidation failed", exc_info=True)
+
+    def invalidate_blocking(self, latitude: float, longitude: float):
+        """invalidate() for threads without an event loop (ingestion workers)"""
+        self.invalidate_many_blocking([(latitude, longitude)])
+
+    def invalidate_many_blocking(self, points):
+        """invalidate_many() for threads without an event loop (retention passes)"""
+        keys = sorted({key for latitude, longitude in points for key in _version_keys(latitude, longitude)})
+        try:
+            for key in keys:
+                self.local_versions.put(key, int(self.blocking_redis.incr(key)))
+        except Exception:
+            logger.warning("Nearby cache invalidation failed", exc_info=True)
+
+
+def _version_keys(latitude: float, longitude: float) -> List[str]:
+    return [f"nearby:v:{geohash_encode(latitude, longitude, precision)}" for _, precision in VERSION_LEVELS]
+
+
+def create_redis_clients():
+    """(asyncio client, blocking client) for REDIS_URL, or a shared FakeRedis when unset"""
+    if not settings.REDIS_URL:
+        fake = FakeRedis()
+        return AsyncFakeRedis(fake), fake
+    import redis
+    import redis.asyncio
+    options = {
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        "socket_connect_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    }
+    return (
+        redis.asyncio.Redis.from_url(settings.REDIS_URL, **options),
+        redis.Redis.from_url(settings.REDIS_URL, **options),
+    )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_nearby_cache() -> Optional[NearbyCache]:
+    """Process-wide cache (None when NEARBY_CACHE_ENABLED is off)"""
+    global _cache
+    if not settings.NEARBY_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NearbyCache(
+                    *create_redis_clients(),
+                    settings.NEARBY_CACHE_LOCAL_ENTRIES,
+                    settings.NEARBY_CACHE_TTL_SECONDS,
+                    settings.NEARBY_CACHE_PRECISION,
+                    settings.NEARBY_CACHE_VERSION_TTL_MS / 1000.0,
+                )
+    return _cache
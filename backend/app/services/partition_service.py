@@ -0,0 +1,228 @@
+"""
+Partition Service - Monthly range partitioning of the hazards table
+
+Optional and PostgreSQL only. `python -m app.maintenance partition-hazards`
+turns hazards into a table partitioned by RANGE (detected_at): one partition
+per calendar month (hazards_y2026m01, ...) plus hazards_default for
+timestamps outside them (bad device clocks). Retention then works on a few
+old months instead of the whole table, and a month it empties is dropped
+rather than vacuumed. Every model index exists on each partition
+(ix_hazards_location_canonical included), so /nearby stays an index scan
+per partition.
+
+PostgreSQL requires the partition key in every unique constraint, so the
+primary key becomes (hazard_id, detected_at) and the canonical_id
+self-reference is no longer a foreign key (the retention job moves a
+canonical hazard together with its reports, which ON DELETE SET NULL used
+to cover).
+
+The conversion copies the table in batches while the API keeps serving,
+then blocks writes briefly to copy the rows changed meanwhile (every write
+bumps updated_at) and swap the tables. The old table is kept as
+hazards_unpartitioned until it is dropped by hand. Coming months are
+created by the retention job (HAZARD_PARTITION_MONTHS_AHEAD).
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Index, MetaData, text
+from sqlalchemy.orm import Session
+
+from app.models.hazard import Hazard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "hazards_default"
+MAX_BACKFILL_MONTHS = 120  # Older rows go to the default partition
+# Swap: rows written this long before the copy started are copied again
+# (updated_at is taken before commit)
+_CATCH_UP_MARGIN = timedelta(minutes=5)
+_MONTH_NAME = re.compile(r"^hazards_y(\d{4})m(\d{2})$")
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"hazards_y{month.year:04d}m{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[datetime]:
+    match = _MONTH_NAME.match(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('hazards'))"
+    )).scalar())
+
+
+def _partitions(db: Session, parent: str = "hazards") -> List[str]:
+    return [name for (name,) in db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent)"
+    ), {"parent": parent})]
+
+
+def _bounds(month: datetime) -> str:
+    # DDL takes no bind parameters; both values are generated here
+    return f"FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+
+
+def _create_month(db: Session, parent: str, month: datetime, default: Optional[str]):
+    """
+    Add the partition for `month`. Rows of that month already in the
+    default partition are moved into it first (attaching would fail otherwise).
+    """
+    name = partition_name(month)
+    if default is None:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {parent} FOR VALUES {_bounds(month)}"))
+        return
+    db.execute(text(f"LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE"))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE detected_at >= :start AND detected_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"start": month, "end": _add_months(month, 1)})
+    db.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+
+
+def ensure_partitions(db: Session, months_ahead: int, now: datetime = None) -> List[str]:
+    """Create the partitions of this month and the next `months_ahead` (no-op unless partitioned)"""
+    if not is_partitioned(db):
+        return []
+    existing = set(_partitions(db))
+    default = DEFAULT_PARTITION if DEFAULT_PARTITION in existing else None
+    current = _month_start(now or datetime.now(timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(current, offset)
+        if partition_name(month) not in existing:
+            _create_month(db, "hazards", month, default)
+            db.commit()
+            created.append(partition_name(month))
+    return created
+
+
+def drop_empty_partitions(db: Session, before: datetime) -> List[str]:
+    """Detach and drop month partitions that end before `before` and hold no rows"""
+    if not is_partitioned(db):
+        return []
+    dropped = []
+    for name in sorted(_partitions(db)):
+        month = _partition_month(name)
+        if month is None or _add_months(month, 1) > before:
+            continue
+        if db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            continue
+        db.execute(text(f"ALTER TABLE hazards DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        dropped.append(name)
+    return dropped
+
+
+def partition_hazards(db: Session, batch_size: int, months_ahead: int, log=logger.info):
+    """
+    Convert hazards into a monthly partitioned table (see module docstring).
+    Run with the retention job paused (app.maintenance holds its lock), so
+    no rows are deleted behind the copy.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        raise RuntimeError("Partitioning needs PostgreSQL")
+    if is_partitioned(db):
+        log("hazards is already partitioned")
+        return
+    if db.execute(text("SELECT to_regclass('hazards_unpartitioned')")).scalar() is not None:
+        raise RuntimeError("hazards_unpartitioned exists (an earlier conversion); drop it first")
+
+    # A copy left by an interrupted run starts over
+    db.execute(text("DROP TABLE IF EXISTS hazards_partitioned CASCADE"))
+    started = db.execute(text("SELECT now()")).scalar()
+    db.execute(text(
+        "CREATE TABLE hazards_partitioned (LIKE hazards INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (detected_at)"
+    ))
+    db.execute(text("ALTER TABLE hazards_partitioned ADD PRIMARY KEY (hazard_id, detected_at)"))
+    db.execute(text(
+        "ALTER TABLE hazards_partitioned ADD CONSTRAINT hazards_partitioned_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (user_id) ON DELETE CASCADE"
+    ))
+    db.execute(text("CREATE TABLE hazards_partitioned_default PARTITION OF hazards_partitioned DEFAULT"))
+    current = _month_start(started)
+    oldest = db.execute(text("SELECT min(detected_at) FROM hazards")).scalar()
+    month = _add_months(current, -MAX_BACKFILL_MONTHS)
+    if oldest is not None:
+        month = min(max(_month_start(oldest), month), current)
+    while month <= _add_months(current, months_ahead):
+        _create_month(db, "hazards_partitioned", month, None)
+        month = _add_months(month, 1)
+    db.commit()
+
+    copied, last = 0, None
+    while True:
+        after = "WHERE hazard_id > :last" if last is not None else ""
+        count, last_in_batch = db.execute(text(
+            f"WITH batch AS (SELECT * FROM hazards {after} ORDER BY hazard_id LIMIT :limit), "
+            "copied AS (INSERT INTO hazards_partitioned SELECT * FROM batch) "
+            "SELECT (SELECT count(*) FROM batch), (SELECT hazard_id FROM batch ORDER BY hazard_id DESC LIMIT 1)"
+        ), {"last": last, "limit": batch_size}).one()
+        db.commit()
+        if not count:
+            break
+        copied += count
+        last = last_in_batch
+        log(f"copied {copied} hazards")
+
+    # The model's indexes, built on every partition under temporary names
+    shadow = Hazard.__table__.to_metadata(MetaData(), name="hazards_partitioned")
+    renames = []
+    for original in sorted(Hazard.__table__.indexes, key=lambda index: index.name):
+        index = Index(
+            f"{original.name}_p", *[shadow.c[column.name] for column in original.columns], **original.dialect_kwargs
+        )
+        index.create(bind=db.connection())
+        db.commit()
+        renames.append((index.name, original.name))
+        log(f"built {original.name}")
+
+    # Swap: block writes (reads continue), copy what changed since the copy started
+    db.execute(text("LOCK TABLE hazards IN SHARE ROW EXCLUSIVE MODE"))
+    since = started - _CATCH_UP_MARGIN
+    db.execute(text(
+        "DELETE FROM hazards_partitioned p USING hazards h "
+        "WHERE h.hazard_id = p.hazard_id AND h.updated_at >= :since"
+    ), {"since": since})
+    changed = db.execute(text(
+        "INSERT INTO hazards_partitioned SELECT * FROM hazards WHERE updated_at >= :since"
+    ), {"since": since}).rowcount
+    old_indexes = [name for (name,) in db.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'hazards'"
+    ))]
+    db.execute(text("ALTER TABLE hazards RENAME TO hazards_unpartitioned"))
+    for name in old_indexes:
+        db.execute(text(f"ALTER INDEX {name} RENAME TO {name[:49]}_unpartitioned"))
+    db.execute(text("ALTER TABLE hazards_partitioned RENAME TO hazards"))
+    db.execute(text(f"ALTER TABLE hazards_partitioned_default RENAME TO {DEFAULT_PARTITION}"))
+    db.execute(text("ALTER INDEX hazards_partitioned_pkey RENAME TO hazards_pkey"))
+    db.execute(text("ALTER TABLE hazards RENAME CONSTRAINT hazards_partitioned_user_id_fkey TO hazards_user_id_fkey"))
+    for temporary, final in renames:
+        db.execute(text(f"ALTER INDEX {temporary} RENAME TO {final}"))
+    db.commit()
+    log(f"hazards is partitioned ({copied} copied, {changed} caught up); "
+        "drop hazards_unpartitioned once the API is verified")
@@ -0,0 +1,194 @@
+"""
+Retention Service - Archival of stale hazards and table maintenance
+
+With RETENTION_DAYS set, a canonical hazard detected and last reported more
+than RETENTION_DAYS ago leaves the hazards table together with its
+duplicate reports: copied to hazards_archive (RETENTION_ARCHIVE) and
+deleted, RETENTION_BATCH_SIZE canonicals per transaction, oldest first.
+Each batch takes the hazards out of the map tiles and leaves sync
+tombstones in the same transaction, then drops them from the spatial index
+and the /nearby cache; rows locked by a concurrent write are skipped until
+the next pass. Stored images are kept (archived rows still point at them).
+
+A maintenance pass also prunes sync tombstones older than
+SYNC_TOMBSTONE_DAYS and, on a partitioned hazards table, creates the
+coming months' partitions and drops emptied old ones (partition_service).
+The API runs a pass every RETENTION_INTERVAL_MINUTES in a background
+thread; `python -m app.maintenance retention` runs one by hand. On
+PostgreSQL passes are serialized across processes by an advisory lock, so
+only one API worker does the work.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import Counter
+from app.models.hazard import Hazard, hazards_archive
+from app.models.tombstone import HazardTombstone
+from app.services.nearby_cache import get_nearby_cache
+from app.services.partition_service import drop_empty_partitions, ensure_partitions
+from app.services.spatial_engine import get_spatial_engine
+from app.services.sync_service import record_deletions
+from app.services.tile_service import remove_hazards
+
+logger = logging.getLogger(__name__)
+
+_MAINTENANCE_LOCK_KEY = 0x5AFA2002  # pg_advisory_lock key of a maintenance pass
+
+hazards_retired = Counter(
+    "safar_hazards_retired_total",
+    "Hazards removed from the hazards table by retention",
+    labelnames=("action",),
+)
+
+
+@contextmanager
+def maintenance_lock(bind, wait: bool = False):
+    """
+    Yield whether this process holds the maintenance lock. Always True off
+    PostgreSQL (one host); with wait=False a held lock yields False at once.
+    """
+    if bind.dialect.name != "postgresql":
+        yield True
+        return
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+            held = True
+        else:
+            held = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}).scalar()
+        try:
+            yield held
+        finally:
+            if held:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MAINTENANCE_LOCK_KEY})
+
+
+def archive_stale_hazards(db: Session, cutoff: datetime, batch_size: int, archive: bool = True) -> int:
+    """
+    Move up to batch_size stale canonical hazards and their reports out of
+    the hazards table and commit. Returns the number of rows removed (0 when
+    nothing is left).
+    """
+    canonicals = db.query(Hazard).filter(
+        Hazard.canonical_id.is_(None),
+        Hazard.detected_at < cutoff,
+        func.coalesce(Hazard.last_reported_at, Hazard.detected_at) < cutoff,
+    ).order_by(Hazard.detected_at).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not canonicals:
+        return 0
+    ids = [hazard.hazard_id for hazard in canonicals]
+    points = [(hazard.latitude, hazard.longitude) for hazard in canonicals]
+    moved = or_(Hazard.hazard_id.in_(ids), Hazard.canonical_id.in_(ids))
+
+    if archive:
+        columns = list(Hazard.__table__.columns)
+        db.execute(hazards_archive.insert().from_select(
+            [column.name for column in columns], select(*columns).where(moved)
+        ))
+    remove_hazards(db, canonicals)
+    record_deletions(db, canonicals)
+    removed = db.query(Hazard).filter(moved).delete(synchronize_session=False)
+    db.commit()
+    hazards_retired.inc(removed, action="archived" if archive else "deleted")
+
+    spatial = get_spatial_engine()
+    for hazard_id in ids:
+        spatial.on_delete(hazard_id)
+    cache = get_nearby_cache()
+    if cache is not None:
+        cache.invalidate_many_blocking(points)
+    return removed
+
+
+def prune_tombstones(db: Session, before: datetime, batch_size: int) -> int:
+    """Delete sync tombstones older than `before`, batch_size per transaction"""
+    pruned = 0
+    while True:
+        ids = [hazard_id for (hazard_id,) in db.query(HazardTombstone.hazard_id).filter(
+            HazardTombstone.deleted_at < before
+        ).order_by(HazardTombstone.deleted_at).limit(batch_size)]
+        if not ids:
+            return pruned
+        pruned += db.query(HazardTombstone).filter(
+            HazardTombstone.hazard_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def run_maintenance(session_factory=SessionLocal, now: datetime = None,
+                    stop: threading.Event = None, wait: bool = False) -> Optional[dict]:
+    """
+    One maintenance pass (see module docstring). Returns what it did, or
+    None if another process holds the maintenance lock.
+    """
+    now = now or datetime.now(timezone.utc)
+    db = session_factory()
+    try:
+        with maintenance_lock(db.get_bind(), wait=wait) as held:
+            if not held:
+                return None
+            report = {"archived": 0, "deleted": 0, "tombstones_pruned": 0}
+            report["partitions_created"] = ensure_partitions(db, settings.HAZARD_PARTITION_MONTHS_AHEAD, now)
+            if settings.RETENTION_DAYS > 0:
+                cutoff = now - timedelta(days=settings.RETENTION_DAYS)
+                action = "archived" if settings.RETENTION_ARCHIVE else "deleted"
+                while stop is None or not stop.is_set():
+                    removed = archive_stale_hazards(db, cutoff, settings.RETENTION_BATCH_SIZE, settings.RETENTION_ARCHIVE)
+                    if not removed:
+                        break
+                    report[action] += removed
+                report["partitions_dropped"] = drop_empty_partitions(db, cutoff)
+            report["tombstones_pruned"] = prune_tombstones(
+                db, now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS), settings.RETENTION_BATCH_SIZE
+            )
+            return report
+    finally:
+        db.close()
+
+
+class RetentionJob:
+    """Background thread running a maintenance pass every interval (the first right away)"""
+
+    def __init__(self, interval_minutes: float):
+        self.interval = interval_minutes * 60
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None or self.interval <= 0:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hazard-retention", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                report = run_maintenance(stop=self._stop)
+                if report and any(report.values()):
+                    logger.info("Hazard maintenance: %s", report)
+            except Exception:
+                logger.exception("Hazard maintenance failed")
+            self._stop.wait(self.interval)
+
+
+retention_job = RetentionJob(settings.RETENTION_INTERVAL_MINUTES)
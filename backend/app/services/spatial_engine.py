@@ -0,0 +1,469 @@
+"""
+Spatial Engine - Pluggable backends for /nearby and route-corridor queries
+
+- "postgis": ST_DWithin filter + ST_Distance sort in the database (production)
+- "memory":  in-process grid index over canonical hazard coordinates with
+             NumPy-vectorized haversine ranking, for databases without
+             PostGIS (the SQLite dev database, tests, offline benchmarks)
+
+SPATIAL_ENGINE=auto picks "postgis" on PostgreSQL and "memory" otherwise.
+
+The memory engine loads (hazard_id, latitude, longitude) of every canonical
+hazard on first use, is updated by create_hazard through on_insert, and
+picks up rows inserted by other workers every SPATIAL_INDEX_SYNC_SECONDS
+(re-reading the last SPATIAL_INDEX_SETTLE_SECONDS, for rows whose
+transaction committed after newer ones).
+A query only ranks points in the grid cells overlapping the search circle,
+then loads the matching rows by primary key.
+
+along_route answers route-corridor queries (hazards within buffer_m of a
+polyline, ordered by distance along it): PostGIS splits the route into
+short pieces so the index is probed per piece rather than with the whole
+route's bounding box; the memory engine ranks each grid cell's points
+against only the route segments passing near that cell.
+"""
+
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select, true
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.hazard import Hazard
+from app.utils import EARTH_RADIUS_M
+
+_METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+ROUTE_PIECE_VERTICES = 16  # ST_Subdivide size for route-corridor index probes
+
+
+def haversine_m_vec(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance in meters from one point to arrays of points"""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lons - lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def route_segments(route: List[Tuple[float, float]]):
+    """
+    Segment arrays of a [(lat, lon), ...] route: start and end coordinates,
+    geodesic length and distance of the start along the route (meters).
+    End longitudes are unwrapped so no segment goes the long way round.
+    """
+    points = np.asarray(route, dtype=np.float64).reshape(-1, 2)
+    a_lat, a_lon = points[:-1, 0], points[:-1, 1]
+    b_lat = points[1:, 0]
+    b_lon = a_lon + (points[1:, 1] - a_lon + 180.0) % 360.0 - 180.0
+    phi1, phi2 = np.radians(a_lat), np.radians(b_lat)
+    h = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(b_lon - a_lon) / 2) ** 2
+    lengths = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    starts = np.cumsum(lengths) - lengths
+    return a_lat, a_lon, b_lat, b_lon, lengths, starts
+
+
+class GridIndex:
+    """
+    Points bucketed in a uniform latitude/longitude grid (cell_deg degrees)
+
+    Coordinates live in growable NumPy arrays; each cell keeps the row
+    numbers of its points (plus a cached array of them for queries).
+    Thread-safe: writers and readers share one lock.
+    """
+
+    def __init__(self, cell_deg: float = 0.05, capacity: int = 1024):
+        self.cell_deg = cell_deg
+        self._lon_cells = max(1, int(math.ceil(360 / cell_deg)))
+        self._lat = np.empty(capacity, dtype=np.float64)
+        self._lon = np.empty(capacity, dtype=np.float64)
+        self._keys: List[object] = [None] * capacity
+        self._size = 0
+        self._free: List[int] = []
+        self._rows: Dict[object, int] = {}
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._cell_arrays: Dict[Tuple[int, int], np.ndarray] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key) -> bool:
+        return key in self._rows
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)),
+                int(math.floor((lon + 180) / self.cell_deg)) % self._lon_cells)
+
+    def _grow(self):
+        capacity = len(self._lat) * 2
+        self._lat = np.resize(self._lat, capacity)
+        self._lon = np.resize(self._lon, capacity)
+        self._keys.extend([None] * (capacity - len(self._keys)))
+
+    def add(self, key, lat: float, lon: float):
+        """Insert a point, or move it if the key is already indexed"""
+        with self._lock:
+            if key in self._rows:
+                self.remove(key)
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == len(self._lat):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self._lat[row] = lat
+            self._lon[row] = lon
+            self._keys[row] = key
+            self._rows[key] = row
+            cell = self._cell(lat, lon)
+            self._cells.setdefault(cell, []).append(row)
+            self._cell_arrays.pop(cell, None)
+
+    def remove(self, key) -> bool:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return False
+            cell = self._cell(self._lat[row], self._lon[row])
+            rows = self._cells[cell]
+            rows.remove(row)
+            if not rows:
+                del self._cells[cell]
+            self._cell_arrays.pop(cell, None)
+            self._keys[row] = None
+            self._free.append(row)
+            return True
+
+    def _candidate_rows(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        dlat = radius_m / _METERS_PER_DEGREE
+        lat_lo, lat_hi = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        # Longitude span widens with latitude; near the poles scan every column
+        cos_lat = math.cos(math.radians(max(abs(lat_lo), abs(lat_hi))))
+        dlon = 180.0 if cos_lat < 1e-6 else min(dlat / cos_lat, 180.0)
+
+        i_lo = int(math.floor(lat_lo / self.cell_deg))
+        i_hi = int(math.floor(lat_hi / self.cell_deg))
+        if dlon >= 180.0:
+            columns = range(self._lon_cells)
+        else:
+            j_lo = int(math.floor((lon - dlon + 180) / self.cell_deg))
+            j_hi = int(math.floor((lon + dlon + 180) / self.cell_deg))
+            columns = range(j_lo, min(j_hi, j_lo + self._lon_cells - 1) + 1)
+
+        arrays = []
+        if (i_hi - i_lo + 1) * len(columns) > len(self._cells):
+            # Search box covers more cells than are occupied: walk occupied cells
+            for (i, j), rows in self._cells.items():
+                if i_lo <= i <= i_hi and (dlon >= 180.0 or (j - columns.start) % self._lon_cells < len(columns)):
+                    arrays.append(self._cell_array((i, j), rows))
+        else:
+            for i in range(i_lo, i_hi + 1):
+                for j in columns:
+                    cell = (i, j % self._lon_cells)
+                    rows = self._cells.get(cell)
+                    if rows:
+                        arrays.append(self._cell_array(cell, rows))
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(arrays)
+
+    def _cell_array(self, cell, rows) -> np.ndarray:
+        array = self._cell_arrays.get(cell)
+        if array is None:
+            array = self._cell_arrays[cell] = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        return array
+
+    def query_radius(self, lat: float, lon: float, radius_m: float,
+                     limit: Optional[int] = None) -> List[Tuple[object, float]]:
+        """(key, distance_m) of points within radius_m, nearest first"""
+        with self._lock:
+            rows = self._candidate_rows(lat, lon, radius_m)
+            if not len(rows):
+                return []
+            distances = haversine_m_vec(lat, lon, self._lat[rows], self._lon[rows])
+            within = distances <= radius_m
+            rows, distances = rows[within], distances[within]
+            if limit is not None and len(rows) > limit:
+                nearest = np.argpartition(distances, limit - 1)[:limit]
+                rows, distances = rows[nearest], distances[nearest]
+            order = np.argsort(distances, kind="stable")
+            keys = self._keys
+            return [(keys[row], float(distance)) for row, distance in zip(rows[order], distances[order])]
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_radius_m: float = math.pi * EARTH_RADIUS_M) -> List[Tuple[object, float]]:
+        """k nearest points (within max_radius_m), found by widening the search circle"""
+        radius = min(self.cell_deg * _METERS_PER_DEGREE, max_radius_m)
+        while True:
+            hits = self.query_radius(lat, lon, radius, k)
+            # Every point inside the circle was ranked, so k hits are the true k nearest
+            if len(hits) >= k or radius >= max_radius_m or len(hits) == len(self):
+                return hits
+            radius = min(radius * 4, max_radius_m)
+
+    def query_corridor(self, route: List[Tuple[float, float]], buffer_m: float,
+                       limit: Optional[int] = None) -> List[Tuple[object, float, float]]:
+        """
+        (key, along_m, offset_m) of points within buffer_m of the route,
+        ordered by distance along it
+
+        Each occupied cell near the route is ranked against only the
+        segments whose buffered bounding box reaches it, in one NumPy pass
+        per cell (equirectangular projection around the cell; a point near
+        several segments takes the nearest).
+        """
+        a_lat, a_lon, b_lat, b_lon, lengths, starts = route_segments(route)
+        dlat = buffer_m / _METERS_PER_DEGREE
+        lat_lo = np.minimum(a_lat, b_lat) - dlat
+        lat_hi = np.maximum(a_lat, b_lat) + dlat
+        cos_lat = np.cos(np.radians(np.minimum(np.maximum(np.abs(lat_lo), np.abs(lat_hi)), 89.0)))
+        lon_lo = np.minimum(a_lon, b_lon) - dlat / cos_lat
+        lon_hi = np.maximum(a_lon, b_lon) + dlat / cos_lat
+
+        cell_segments: Dict[Tuple[int, int], List[int]] = {}
+        for segment, (la0, la1, lo0, lo1) in enumerate(zip(lat_lo, lat_hi, lon_lo, lon_hi)):
+            for i in range(int(math.floor(la0 / self.cell_deg)), int(math.floor(la1 / self.cell_deg)) + 1):
+                for j in range(int(math.floor((lo0 + 180) / self.cell_deg)),
+                               int(math.floor((lo1 + 180) / self.cell_deg)) + 1):
+                    cell_segments.setdefault((i, j % self._lon_cells), []).append(segment)
+
+        hit_rows, hit_along, hit_offset = [], [], []
+        with self._lock:
+            for cell, segments in cell_segments.items():
+                rows = self._cells.get(cell)
+                if not rows:
+                    continue
+                rows = self._cell_array(cell, rows)
+                segments = np.fromiter(segments, dtype=np.int64, count=len(segments))
+                lat0 = (cell[0] + 0.5) * self.cell_deg
+                lon0 = (cell[1] + 0.5) * self.cell_deg - 180.0
+                kx = math.cos(math.radians(lat0)) * _METERS_PER_DEGREE
+                # Points (P x 1) against segments (1 x S), meters around the cell
+                px = (((self._lon[rows] - lon0 + 180.0) % 360.0 - 180.0) * kx)[:, None]
+                py = ((self._lat[rows] - lat0) * _METERS_PER_DEGREE)[:, None]
+                ax = ((a_lon[segments] - lon0 + 180.0) % 360.0 - 180.0) * kx
+                ay = (a_lat[segments] - lat0) * _METERS_PER_DEGREE
+                dx = (b_lon[segments] - a_lon[segments]) * kx
+                dy = (b_lat[segments] - a_lat[segments]) * _METERS_PER_DEGREE
+                squared = dx * dx + dy * dy
+                t = ((px - ax) * dx + (py - ay) * dy) / np.where(squared > 0, squared, 1.0)
+                t = np.clip(t, 0.0, 1.0)
+                offsets = np.hypot(px - (ax + t * dx), py - (ay + t * dy))
+                nearest = np.argmin(offsets, axis=1)
+                picked = np.arange(len(rows))
+                offset = offsets[picked, nearest]
+                within = offset <= buffer_m
+                if not within.any():
+                    continue
+                segment = segments[nearest][within]
+                hit_rows.append(rows[within])
+                hit_offset.append(offset[within])
+                hit_along.append(starts[segment] + t[picked, nearest][within] * lengths[segment])
+            if not hit_rows:
+                return []
+            rows = np.concatenate(hit_rows)
+            along = np.concatenate(hit_along)
+            offset = np.concatenate(hit_offset)
+            order = np.argsort(along, kind="stable")
+            if limit is not None:
+                order = order[:limit]
+            keys = self._keys
+            return [(keys[row], float(a), float(o)) for row, a, o in zip(rows[order], along[order], offset[order])]
+
+
+class SpatialQueryEngine(ABC):
+    name = "base"
+
+    @abstractmethod
+    def nearby(self, db: Session, latitude: float, longitude: float,
+               radius_m: float, limit: int) -> List[Tuple[Hazard, float]]:
+        """Up to `limit` canonical hazards within radius_m as (hazard, distance_m), nearest first"""
+
+    @abstractmethod
+    def along_route(self, db: Session, route: List[Tuple[float, float]],
+                    buffer_m: float, limit: int) -> List[Tuple[Hazard, float, float]]:
+        """
+        Up to `limit` canonical hazards within buffer_m of the route
+        ([(lat, lon), ...]) as (hazard, along_m, offset_m), in route order
+        """
+
+    def on_insert(self, hazard: Hazard):
+        """Called after a hazard has been committed"""
+
+    def on_delete(self, hazard_id):
+        """Called after a hazard has been deleted"""
+
+
+class PostGISQueryEngine(SpatialQueryEngine):
+    name = "postgis"
+
+    def nearby(self, db, latitude, longitude, radius_m, limit):
+        return self.nearby_query(db, latitude, longitude, radius_m, limit).all()
+
+    def nearby_query(self, db, latitude, longitude, radius_m, limit):
+        """The Query behind nearby() (app.maintenance explain-nearby checks its plan)"""
+        from geoalchemy2.elements import WKTElement
+        from geoalchemy2.functions import ST_DWithin, ST_Distance
+
+        point = WKTElement(f'POINT({longitude} {latitude})', srid=4326)
+        # Matches the partial GIST index ix_hazards_location_canonical
+        return db.query(
+            Hazard,
+            cast(ST_Distance(Hazard.location, point), Float).label("distance")
+        ).filter(
+            ST_DWithin(Hazard.location, point, radius_m),
+            Hazard.canonical_id.is_(None)  # duplicate reports are folded into their canonical hazard
+        ).order_by("distance").limit(limit)
+
+    def along_route(self, db, route, buffer_m, limit):
+        from geoalchemy2.functions import (
+            ST_Distance, ST_DWithin, ST_GeomFromText, ST_LineLocatePoint, ST_Subdivide
+        )
+
+        wkt = "LINESTRING(" + ", ".join(f"{lon} {lat}" for lat, lon in route) + ")"
+        route_m = float(route_segments(route)[4].sum())
+        line = select(ST_GeomFromText(wkt, 4326).label("geom")).cte("route")
+        # One index probe per short piece instead of the whole route's bounding box
+        pieces = select(
+            func.geography(ST_Subdivide(line.c.geom, ROUTE_PIECE_VERTICES)).label("geog")
+        ).cte("route_pieces")
+        matched = select(Hazard.hazard_id).join(
+            pieces, ST_DWithin(Hazard.location, pieces.c.geog, float(buffer_m))
+        ).where(Hazard.canonical_id.is_(None)).distinct().subquery()
+        # Planar position along the line, scaled by the route's geodesic length
+        along = cast(ST_LineLocatePoint(line.c.geom, func.geometry(Hazard.location)), Float) * route_m
+        offset = cast(ST_Distance(Hazard.location, func.geography(line.c.geom)), Float)
+        return db.query(Hazard, along.label("along"), offset.label("offset")).join(
+            matched, matched.c.hazard_id == Hazard.hazard_id
+        ).join(line, true()).order_by("along").limit(limit).all()
+
+
+class InMemoryQueryEngine(SpatialQueryEngine):
+    name = "memory"
+
+    def __init__(self, cell_deg: float, sync_seconds: float, session_factory=None, settle_seconds: float = 0.0):
+        self.index = GridIndex(cell_deg)
+        self.sync_seconds = sync_seconds
+        self.settle = timedelta(seconds=settle_seconds)
+        self.session_factory = session_factory  # initial load; app.database.SessionLocal if None
+        self._loaded = False
+        self._watermark = None  # created_at of the newest row seen by a sync
+        self._next_sync = 0.0
+        self._sync_lock = threading.Lock()
+
+    def _sync(self, db: Session):
+        """Initial load, then periodic catch-up on rows inserted by other workers"""
+        if self._loaded and time.monotonic() < self._next_sync:
+            return
+        if not self._loaded:
+            # Own blocking session: with the async routes `db` may yield to the
+            # event loop mid-query, and a waiter on this lock would then block it
+            if self.session_factory is None:
+                from app.database import SessionLocal
+                self.session_factory = SessionLocal
+            with self._sync_lock:
+                if not self._loaded:
+                    load_db = self.session_factory()
+                    try:
+                        self._catch_up(load_db)
+                    finally:
+                        load_db.close()
+            return
+        # Catch-ups are best effort: if another request is already running
+        # one, serve from the index as it is rather than wait
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() >= self._next_sync:
+                self._catch_up(db)
+        finally:
+            self._sync_lock.release()
+
+    def _catch_up(self, db: Session):
+        query = db.query(
+            Hazard.hazard_id, Hazard.latitude, Hazard.longitude, Hazard.created_at
+        ).filter(Hazard.canonical_id.is_(None))
+        if self._watermark is not None:
+            # created_at is taken before commit: re-read a settle window behind
+            # the newest row seen so a slow transaction's rows aren't skipped
+            # (add is idempotent)
+            query = query.filter(Hazard.created_at >= self._watermark - self.settle)
+        for hazard_id, latitude, longitude, created_at in query.yield_per(10000):
+            self.index.add(hazard_id, latitude, longitude)
+            if created_at is not None and (self._watermark is None or created_at > self._watermark):
+                self._watermark = created_at
+        self._loaded = True
+        self._next_sync = time.monotonic() + self.sync_seconds
+
+    def nearby(self, db, latitude, longitude, radius_m, limit):
+        self._sync(db)
+        hits = self.index.query_radius(latitude, longitude, radius_m, limit)
+        if not hits:
+            return []
+        rows = db.query(Hazard).filter(Hazard.hazard_id.in_([key for key, _ in hits])).all()
+        by_id = {hazard.hazard_id: hazard for hazard in rows}
+        result = []
+        for key, distance in hits:
+            hazard = by_id.get(key)
+            if hazard is None:
+                self.index.remove(key)  # deleted behind our back
+                continue
+            result.append((hazard, distance))
+        return result
+
+    def along_route(self, db, route, buffer_m, limit):
+        self._sync(db)
+        hits = self.index.query_corridor(route, buffer_m, limit)
+        if not hits:
+            return []
+        rows = db.query(Hazard).filter(Hazard.hazard_id.in_([key for key, _, _ in hits])).all()
+        by_id = {hazard.hazard_id: hazard for hazard in rows}
+        return [(by_id[key], along, offset) for key, along, offset in hits if key in by_id]
+
+    def on_insert(self, hazard):
+        if hazard.canonical_id is None:
+            self.index.add(hazard.hazard_id, hazard.latitude, hazard.longitude)
+
+    def on_delete(self, hazard_id):
+        self.index.remove(hazard_id)
+
+
+def configured_engine_name() -> str:
+    """SPATIAL_ENGINE, with "auto" resolved from the database dialect"""
+    if settings.SPATIAL_ENGINE != "auto":
+        return settings.SPATIAL_ENGINE
+    from app.database import engine
+    return "postgis" if engine.dialect.name == "postgresql" else "memory"
+
+
+def create_spatial_engine(name: str) -> SpatialQueryEngine:
+    if name == "postgis":
+        return PostGISQueryEngine()
+    if name == "memory":
+        return InMemoryQueryEngine(
+            settings.SPATIAL_INDEX_CELL_DEGREES, settings.SPATIAL_INDEX_SYNC_SECONDS,
+            settle_seconds=settings.SPATIAL_INDEX_SETTLE_SECONDS,
+        )
+    raise ValueError(f"Unknown spatial engine: {name}")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_spatial_engine() -> SpatialQueryEngine:
+    """Process-wide engine, created lazily on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_spatial_engine(configured_engine_name())
+    return _engine
@@ -0,0 +1,229 @@
+"""
+Storage Backends - Pluggable image storage with async and blocking APIs
+
+Every backend implements two blocking primitives (_put / _remove) on top of
+a client that is configured once and reused, so HTTP connections are pooled
+across uploads. StorageBackend turns those into:
+
+- async upload / delete / upload_many for event-loop callers
+- upload_blocking / upload_many_blocking for worker threads
+
+Both run the primitives on one bounded thread pool per backend
+(STORAGE_MAX_CONCURRENCY), which is also the HTTP connection pool size, so
+multi-object uploads (full image + renditions) go out concurrently.
+
+Backends: "cloudinary" (FREE), "gcs" (paid) and "local" (filesystem, for
+development and offline load testing).
+"""
+
+import asyncio
+import mimetypes
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+
+def _content_type(filename: str, content_type: Optional[str]) -> str:
+    return content_type or mimetypes.guess_type(filename)[0] or "image/jpeg"
+
+
+class StorageBackend(ABC):
+    """Base class: subclasses implement the blocking _put/_remove primitives"""
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix=f"storage-{self.name}"
+        )
+
+    @abstractmethod
+    def _put(self, data: bytes, filename: str, content_type: str) -> str:
+        """Store one object and return its public URL"""
+
+    @abstractmethod
+    def _remove(self, filename: str) -> bool:
+        """Delete one object, returning True if it existed"""
+
+    async def upload(self, data: bytes, filename: str, content_type: str = None) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._put, data, filename, _content_type(filename, content_type)
+        )
+
+    async def delete(self, filename: str) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._remove, filename)
+
+    async def upload_many(self, items: Sequence[Tuple[bytes, str]]) -> List[str]:
+        """Upload (data, filename) pairs concurrently; URLs are returned in order"""
+        return list(await asyncio.gather(*(self.upload(data, filename) for data, filename in items)))
+
+    def upload_blocking(self, data: bytes, filename: str, content_type: str = None) -> str:
+        return self._executor.submit(
+            self._put, data, filename, _content_type(filename, content_type)
+        ).result()
+
+    def upload_many_blocking(self, items: Sequence[Tuple[bytes, str]]) -> List[str]:
+        """Thread-friendly upload_many: submits all objects, then waits for them"""
+        futures = [
+            self._executor.submit(self._put, data, filename, _content_type(filename, None))
+            for data, filename in items
+        ]
+        return [future.result() for future in futures]
+
+    def delete_blocking(self, filename: str) -> bool:
+        return self._executor.submit(self._remove, filename).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Stores objects under a local directory, served by the API at LOCAL_STORAGE_BASE_URL
+
+    latency_ms adds a simulated network round trip per request so offline
+    load tests behave like a remote object store.
+    """
+
+    name = "local"
+
+    def __init__(self, root_dir: str, base_url: str, max_concurrency: int, latency_ms: int = 0):
+        super().__init__(max_concurrency)
+        self.root_dir = root_dir
+        self.base_url = base_url.rstrip("/")
+        self.latency = latency_ms / 1000.0
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, filename: str) -> str:
+        path = os.path.normpath(os.path.join(self.root_dir, filename))
+        if not path.startswith(os.path.normpath(self.root_dir) + os.sep):
+            raise ValueError(f"Invalid object name: {filename}")
+        return path
+
+    def _put(self, data: bytes, filename: str, content_type: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        path = self._path(filename)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return f"{self.base_url}/{filename}"
+
+    def _remove(self, filename: str) -> bool:
+        try:
+            os.remove(self._path(filename))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class GCSStorageBackend(StorageBackend):
+    """Google Cloud Storage: one client, connection pool sized to max_concurrency"""
+
+    name = "gcs"
+
+    def __init__(self, bucket_name: str, predefined_acl: Optional[str], max_concurrency: int):
+        super().__init__(max_concurrency)
+        from google.cloud import storage
+        from requests.adapters import HTTPAdapter
+
+        self.client = storage.Client()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.client._http.mount("https://", adapter)
+        self.bucket = self.client.bucket(bucket_name)
+        self.predefined_acl = predefined_acl
+
+    def _put(self, data: bytes, filename: str, content_type: str) -> str:
+        blob = self.bucket.blob(f"hazards/{filename}")
+        # predefined_acl makes the object public in the upload request itself
+        # (no second make_public() round trip)
+        blob.upload_from_string(data, content_type=content_type, predefined_acl=self.predefined_acl)
+        return blob.public_url
+
+    def _remove(self, filename: str) -> bool:
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(f"hazards/{filename}").delete()
+            return True
+        except NotFound:
+            return False
+
+
+class CloudinaryStorageBackend(StorageBackend):
+    """Cloudinary (FREE tier): SDK configured once, its urllib3 pool reused"""
+
+    name = "cloudinary"
+    folder = "safar-nexus-hazards"
+
+    def __init__(self, max_concurrency: int):
+        super().__init__(max_concurrency)
+        from app.services.cloudinary_storage_service import initialize_cloudinary
+        initialize_cloudinary()
+
+    def _put(self, data: bytes, filename: str, content_type: str) -> str:
+        import cloudinary.uploader
+        result = cloudinary.uploader.upload(
+            data,
+            folder=self.folder,
+            public_id=os.path.splitext(filename)[0],
+            resource_type="image",
+            overwrite=False
+        )
+        return result['secure_url']
+
+    def _remove(self, filename: str) -> bool:
+        import cloudinary.uploader
+        public_id = f"{self.folder}/{os.path.splitext(filename)[0]}"
+        return cloudinary.uploader.destroy(public_id).get('result') == 'ok'
+
+
+def configured_backend_name() -> str:
+    """STORAGE_BACKEND if set, otherwise follow USE_CLOUDINARY"""
+    if settings.STORAGE_BACKEND:
+        return settings.STORAGE_BACKEND
+    return "cloudinary" if settings.USE_CLOUDINARY else "gcs"
+
+
+def create_storage_backend(name: str) -> StorageBackend:
+    concurrency = settings.STORAGE_MAX_CONCURRENCY
+    if name == "local":
+        return LocalStorageBackend(
+            settings.LOCAL_STORAGE_DIR, settings.LOCAL_STORAGE_BASE_URL, concurrency,
+            settings.LOCAL_STORAGE_LATENCY_MS,
+        )
+    if name == "gcs":
+        return GCSStorageBackend(settings.GCS_BUCKET_NAME, settings.GCS_PREDEFINED_ACL, concurrency)
+    if name == "cloudinary":
+        return CloudinaryStorageBackend(concurrency)
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """Process-wide backend, created lazily on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_storage_backend(configured_backend_name())
+    return _backend
+
+
+def close_storage_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
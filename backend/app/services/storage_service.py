@@ -1,24 +1,22 @@
 """
 Storage Service - Supports both FREE (Cloudinary) and Paid (GCS) options
+
+Thin blocking helpers over the pluggable backends in storage_backends
+(clients are configured once and their HTTP connections pooled).
 """
 
-from app.config import settings
+from app.services.storage_backends import create_storage_backend, get_storage_backend
 import uuid
 
 
-# Lazy import GCS only if needed (allows running without GCS credentials)
-_gcs_client = None
-_gcs_bucket = None
+# Lazily created per-provider backends for the explicit upload_to_* helpers
+_backends = {}
 
 
-def _get_gcs_bucket():
-    """Lazy initialize GCS client"""
-    global _gcs_client, _gcs_bucket
-    if _gcs_bucket is None:
-        from google.cloud import storage
-        _gcs_client = storage.Client()
-        _gcs_bucket = _gcs_client.bucket(settings.GCS_BUCKET_NAME)
-    return _gcs_bucket
+def _backend(name: str):
+    if name not in _backends:
+        _backends[name] = create_storage_backend(name)
+    return _backends[name]
 
 
 def upload_to_gcs(image_bytes: bytes, filename: str) -> str:
@@ -26,14 +24,7 @@ def upload_to_gcs(image_bytes: bytes, filename: str) -> str:
     Upload image to Google Cloud Storage (Paid option)
     Returns public URL of uploaded image
     """
-    bucket = _get_gcs_bucket()
-    blob = bucket.blob(f"hazards/{filename}")
-    blob.upload_from_string(image_bytes, content_type='image/jpeg')
-
-    # Make blob publicly readable (for MVP; use signed URLs in production)
-    blob.make_public()
-
-    return blob.public_url
+    return _backend("gcs").upload_blocking(image_bytes, filename)
 
 
 def upload_to_cloudinary(image_bytes: bytes, filename: str) -> str:
@@ -41,14 +32,13 @@ def upload_to_cloudinary(image_bytes: bytes, filename: str) -> str:
     Upload image to Cloudinary (FREE option - 25GB free)
     Returns public URL of uploaded image
     """
-    from app.services.cloudinary_storage_service import upload_to_cloudinary as cloudinary_upload
-    return cloudinary_upload(image_bytes, filename)
+    return _backend("cloudinary").upload_blocking(image_bytes, filename)
 
 
 def upload_image(image_bytes: bytes, filename: str = None) -> str:
     """
     Upload image to configured storage backend
-    Automatically routes to Cloudinary (FREE) or GCS based on USE_CLOUDINARY setting
+    Routes to STORAGE_BACKEND, or to Cloudinary (FREE) / GCS based on USE_CLOUDINARY
 
     Args:
         image_bytes: Image data as bytes
@@ -60,9 +50,13 @@ def upload_image(image_bytes: bytes, filename: str = None) -> str:
     if filename is None:
         filename = f"{uuid.uuid4()}.jpg"
 
-    if settings.USE_CLOUDINARY:
-        # Use FREE Cloudinary storage
-        return upload_to_cloudinary(image_bytes, filename)
-    else:
-        # Use Google Cloud Storage (paid)
-        return upload_to_gcs(image_bytes, filename)
+    return get_storage_backend().upload_blocking(image_bytes, filename)
+
+
+def upload_images(items) -> list:
+    """
+    Upload several (image_bytes, filename) pairs concurrently
+
+    Returns public URLs in the same order
+    """
+    return get_storage_backend().upload_many_blocking(items)
@@ -0,0 +1,130 @@
+"""
+Sync Service - Incremental hazard changes for clients with a local store
+
+A client keeps the canonical hazards of a region (bounding box) on the
+device and asks /hazards/sync for what changed since its last cursor:
+inserted and updated hazards (every write bumps Hazard.updated_at) and
+deletions (HazardTombstone rows), merged into one stream ordered by
+(timestamp, hazard_id). A cursor is the key of the last change sent, so
+paging is a keyset range scan on the (updated_at, hazard_id) index and
+concurrent inserts land after it instead of shifting later pages.
+
+Timestamps are taken before commit, so a slow transaction can commit a row
+older than a cursor already handed out. Changes younger than
+SYNC_SETTLE_SECONDS are therefore held back until the next call. A hazard
+that changes again after it was sent is sent again; clients upsert by
+hazard_id.
+"""
+
+import base64
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.hazard import Hazard
+from app.models.tombstone import HazardTombstone
+from app.services.hazard_stream import hazard_item
+
+Cursor = Tuple[datetime, uuid.UUID]
+Region = Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+
+_MAX_UUID = uuid.UUID(int=(1 << 128) - 1)
+
+
+class CursorExpired(ValueError):
+    """The cursor predates the tombstones still kept; the client must sync from scratch"""
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    timestamp, hazard_id = cursor
+    raw = f"{_as_utc(timestamp).isoformat()}|{hazard_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: str) -> Cursor:
+    """Raises ValueError for anything encode_cursor did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        timestamp, hazard_id = raw.split("|")
+        return _as_utc(datetime.fromisoformat(timestamp)), uuid.UUID(hazard_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor") from None
+
+
+def _page(query, timestamp_col, id_col, lat_col, lon_col, region: Region,
+          since: Optional[Cursor], horizon: datetime, limit: int):
+    min_lat, min_lon, max_lat, max_lon = region
+    query = query.filter(
+        lat_col.between(min_lat, max_lat),
+        lon_col.between(min_lon, max_lon),
+        timestamp_col <= horizon,
+    )
+    if since is not None:
+        query = query.filter(tuple_(timestamp_col, id_col) > since)
+    return query.order_by(timestamp_col, id_col).limit(limit).all()
+
+
+def changes(db: Session, region: Region, since: Optional[Cursor], limit: int) -> dict:
+    """
+    Up to `limit` changes in the region after `since` (None = everything),
+    oldest first, with the cursor to pass next time
+
+    has_more is True when another page is ready now; otherwise the cursor
+    moves up to the settle horizon so the next call skips what was scanned.
+    """
+    now = datetime.now(timezone.utc)
+    if since is not None and since[0] < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        raise CursorExpired("Cursor expired; sync again without since")
+    horizon = now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    # limit + 1 of each: the merged first `limit` plus whether more remain
+    hazards = _page(
+        db.query(Hazard).filter(Hazard.canonical_id.is_(None)),
+        Hazard.updated_at, Hazard.hazard_id, Hazard.latitude, Hazard.longitude,
+        region, since, horizon, limit + 1,
+    )
+    tombstones = _page(
+        db.query(HazardTombstone),
+        HazardTombstone.deleted_at, HazardTombstone.hazard_id,
+        HazardTombstone.latitude, HazardTombstone.longitude,
+        region, since, horizon, limit + 1,
+    )
+    merged = sorted(
+        [((_as_utc(h.updated_at), h.hazard_id), h) for h in hazards]
+        + [((_as_utc(t.deleted_at), t.hazard_id), None) for t in tombstones],
+        key=lambda change: change[0],
+    )
+    has_more = len(merged) > limit
+    page = merged[:limit]
+
+    updated, deleted = [], []
+    for (timestamp, hazard_id), hazard in page:
+        if hazard is None:
+            deleted.append(str(hazard_id))
+        else:
+            updated.append(dict(hazard_item(hazard), updated_at=timestamp.isoformat()))
+
+    if has_more:
+        cursor = page[-1][0]
+    else:
+        cursor = max(since, (horizon, _MAX_UUID)) if since is not None else (horizon, _MAX_UUID)
+    return {"hazards": updated, "deleted": deleted, "cursor": encode_cursor(cursor), "has_more": has_more}
+
+
+def record_deletions(db: Session, hazards):
+    """Leave tombstones for canonical hazards being deleted (caller deletes and commits)"""
+    now = datetime.now(timezone.utc)
+    for hazard in hazards:
+        if hazard.canonical_id is None:
+            db.merge(HazardTombstone(
+                hazard_id=hazard.hazard_id, latitude=hazard.latitude,
+                longitude=hazard.longitude, deleted_at=now,
+            ))
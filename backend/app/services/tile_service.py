@@ -0,0 +1,186 @@
+"""
+Tile Service - Pre-aggregated hazard counts for zoomed-out map views
+
+Canonical hazards are counted into hazard_tile_cells: for every zoom level
+z <= TILE_MAX_ZOOM, the web-mercator tile at zoom z + CELL_BITS containing
+the hazard gets its count and coordinate sums incremented.
+hazard_writer.store_hazards does this in the transaction that inserts the
+hazards (a group commit of concurrent reports): one executemany upsert,
+rows in (z, x, y) order so concurrent batches can't deadlock.
+
+A map tile (z, x, y) is then answered from its 8x8 cells with a single
+primary-key range scan: one cluster (centroid + count) per non-empty cell,
+rendered as compact JSON or a packed little-endian binary, with an ETag
+derived from the cells' counts and update times.
+"""
+
+import hashlib
+import math
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.hazard import Hazard
+from app.models.tile_cell import HazardTileCell
+
+CELL_BITS = 3  # 2^3 x 2^3 cluster cells per map tile
+MAX_MERCATOR_LAT = 85.05112878
+
+PACKED_MAGIC = b"SNT1"
+PACKED_CONTENT_TYPE = "application/vnd.safar-nexus.tile"
+# magic, z, x, y, total hazards, cluster count
+_PACKED_HEADER = struct.Struct("<4sBIIIH")
+# latitude, longitude, hazard count
+_PACKED_CLUSTER = struct.Struct("<ffI")
+
+
+def tile_xy(latitude: float, longitude: float, z: int) -> Tuple[int, int]:
+    """Slippy-map (web mercator) tile containing a coordinate"""
+    n = 1 << z
+    lat = math.radians(max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude)))
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _cell_keys(latitude: float, longitude: float):
+    """(z, x, y) of the cell counting this point, for every served zoom"""
+    finest = settings.TILE_MAX_ZOOM + CELL_BITS
+    x, y = tile_xy(latitude, longitude, finest)
+    # Cells at coarser zooms are the finest cell's ancestors
+    return [(z, x >> (finest - z), y >> (finest - z)) for z in range(CELL_BITS, finest + 1)]
+
+
+def _upsert(db: Session, deltas: Dict[Tuple[int, int, int], List[float]]):
+    """Add (count, sum_lat, sum_lon) deltas to cells, creating missing ones"""
+    if not deltas:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"z": z, "x": x, "y": y, "hazard_count": count, "sum_latitude": sum_lat,
+         "sum_longitude": sum_lon, "updated_at": now}
+        for (z, x, y), (count, sum_lat, sum_lon) in sorted(deltas.items())
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Tile aggregation is not supported on {dialect}")
+
+    # executemany of one cached statement (a multi-row VALUES is compiled anew each call)
+    stmt = insert(HazardTileCell)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[HazardTileCell.z, HazardTileCell.x, HazardTileCell.y],
+        set_={
+            "hazard_count": HazardTileCell.hazard_count + stmt.excluded.hazard_count,
+            "sum_latitude": HazardTileCell.sum_latitude + stmt.excluded.sum_latitude,
+            "sum_longitude": HazardTileCell.sum_longitude + stmt.excluded.sum_longitude,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.connection().execute(stmt, rows)
+
+
+def _deltas(hazards, sign: int = 1):
+    deltas: Dict[Tuple[int, int, int], List[float]] = {}
+    for hazard in hazards:
+        for key in _cell_keys(hazard.latitude, hazard.longitude):
+            delta = deltas.setdefault(key, [0, 0.0, 0.0])
+            delta[0] += sign
+            delta[1] += sign * hazard.latitude
+            delta[2] += sign * hazard.longitude
+    return deltas
+
+
+def record_hazards(db: Session, hazards):
+    """Count new canonical hazards into their cells (caller commits)"""
+    _upsert(db, _deltas([h for h in hazards if h.canonical_id is None]))
+
+
+def remove_hazards(db: Session, hazards):
+    """Take deleted canonical hazards out of their cells (caller commits)"""
+    _upsert(db, _deltas([h for h in hazards if h.canonical_id is None], sign=-1))
+
+
+def get_tile(db: Session, z: int, x: int, y: int):
+    """
+    Clusters of a map tile as ([(latitude, longitude, count), ...], total, etag)
+    """
+    cell_z = z + CELL_BITS
+    x_lo, y_lo = x << CELL_BITS, y << CELL_BITS
+    side = 1 << CELL_BITS
+    cells = db.query(
+        HazardTileCell.hazard_count, HazardTileCell.sum_latitude,
+        HazardTileCell.sum_longitude, HazardTileCell.updated_at,
+    ).filter(
+        HazardTileCell.z == cell_z,
+        HazardTileCell.x.between(x_lo, x_lo + side - 1),
+        HazardTileCell.y.between(y_lo, y_lo + side - 1),
+        HazardTileCell.hazard_count > 0,
+    ).all()
+
+    clusters = []
+    total = 0
+    latest = None
+    for count, sum_lat, sum_lon, updated_at in cells:
+        clusters.append((sum_lat / count, sum_lon / count, count))
+        total += count
+        if latest is None or updated_at > latest:
+            latest = updated_at
+    clusters.sort(key=lambda c: (-c[2], c[0], c[1]))
+
+    digest = hashlib.sha1(f"{z}/{x}/{y}:{total}:{len(clusters)}:{latest}".encode()).hexdigest()[:20]
+    return clusters, total, digest
+
+
+def encode_json(z: int, x: int, y: int, clusters, total: int) -> dict:
+    return {
+        "z": z, "x": x, "y": y,
+        "count": total,
+        "clusters": [[round(lat, 6), round(lon, 6), count] for lat, lon, count in clusters],
+    }
+
+
+def encode_packed(z: int, x: int, y: int, clusters, total: int) -> bytes:
+    """Header (magic "SNT1", z u8, x u32, y u32, total u32, n u16) + n x (lat f32, lon f32, count u32)"""
+    parts = [_PACKED_HEADER.pack(PACKED_MAGIC, z, x, y, total, len(clusters))]
+    parts.extend(_PACKED_CLUSTER.pack(lat, lon, count) for lat, lon, count in clusters)
+    return b"".join(parts)
+
+
+def rebuild_tile_cells(db: Session, batch_size: int = 10000) -> int:
+    """Recompute every cell from the hazards table. Commits; returns hazards counted"""
+    db.query(HazardTileCell).delete(synchronize_session=False)
+    deltas: Dict[Tuple[int, int, int], List[float]] = {}
+    counted = 0
+    rows = db.query(Hazard.latitude, Hazard.longitude).filter(
+        Hazard.canonical_id.is_(None)
+    ).yield_per(batch_size)
+    for latitude, longitude in rows:
+        for key in _cell_keys(latitude, longitude):
+            delta = deltas.setdefault(key, [0, 0.0, 0.0])
+            delta[0] += 1
+            delta[1] += latitude
+            delta[2] += longitude
+        counted += 1
+
+    items = sorted(deltas.items())
+    for start in range(0, len(items), batch_size):
+        _upsert(db, dict(items[start:start + batch_size]))
+    db.commit()
+    return counted
+
+
+def ensure_tile_cells(db: Session):
+    """Build the aggregates once if hazards exist but no cells do (first deploy)"""
+    if db.query(func.count()).select_from(HazardTileCell).scalar():
+        return
+    if db.query(Hazard.hazard_id).filter(Hazard.canonical_id.is_(None)).first() is None:
+        return
+    rebuild_tile_cells(db)
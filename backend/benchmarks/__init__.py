@@ -0,0 +1 @@
+# Benchmark harnesses for the SAFAR-Nexus API hot paths
@@ -0,0 +1,425 @@
+"""
+API load test: throughput, latency percentiles, CPU and RSS per endpoint
+
+Runs offline and reproducibly. The API is started with uvicorn in a
+subprocess on a copy of a seeded dataset (benchmarks.datasets: --hazards
+10k to 10M, built once and cached under --data-dir), with local storage
+standing in for Cloudinary/GCS (STORAGE_BACKEND=local, each upload taking
+--storage-latency-ms). Each scenario then drives one endpoint from
+--concurrency closed-loop clients for --duration seconds (after --warmup):
+
+    register  POST /api/v1/auth/register       new accounts (bcrypt)
+    login     POST /api/v1/auth/login          seed users (bcrypt)
+    nearby    GET  /api/v1/hazards/nearby      around the dataset's cities
+    detail    GET  /api/v1/hazards/{id}        sampled seed hazards
+    create    POST /api/v1/hazards             unique synthetic dashcam JPEGs
+
+Reported per scenario: requests/sec, p50/p95/p99, status codes, the server's
+CPU seconds (process tree, blur workers included) per request and in cores,
+and its peak RSS (summed over the tree). Uploads are processed in the
+background, so "create" also waits for the ingestion workers to finish the
+accepted uploads: its CPU figures include that work (cpu_ms_per_request is
+per processed upload) and ingested_per_sec is the end-to-end rate. The
+load generator runs on the same machine; its own CPU use is reported as
+client_cpu_pct.
+
+--base-url measures a running server instead (e.g. PostgreSQL, seeded with
+`python -m benchmarks.datasets --database-url ...`), with --manifest from
+that dataset; pass --server-pid for CPU and RSS. Compare two reports with
+--compare, which exits 1 if any metric got worse by more than
+--max-regression percent.
+
+    python -m benchmarks.bench_api_suite --hazards 100k --concurrency 16 --output build.json
+    python -m benchmarks.bench_api_suite --compare main.json build.json --max-regression 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import cv2
+import httpx
+import numpy as np
+
+from benchmarks.common import (
+    compare_reports, environment_info, latency_summary, synthetic_dashcam_frame, write_report,
+)
+from benchmarks.datasets import cached_dataset, parse_count
+
+SCENARIOS = ("register", "login", "nearby", "detail", "create")
+COMPARE_KEYS = (
+    "requests_per_sec", "ingested_per_sec", "p50_ms", "p95_ms", "p99_ms", "cpu_ms_per_request", "peak_rss_mb",
+)
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_INGESTED = re.compile(r'^safar_ingestion_stage_seconds_count\{stage="finish"\} (\S+)$', re.MULTILINE)
+
+
+class ProcessTree:
+    """CPU time and RSS of a process and its descendants (Linux /proc)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def pids(self):
+        parents = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue  # Exited while listing
+        tree, frontier = [self.pid], [self.pid]
+        while frontier:
+            frontier = [pid for pid, parent in parents.items() if parent in frontier]
+            tree.extend(frontier)
+        return tree
+
+    def cpu_seconds(self) -> float:
+        ticks = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                ticks += int(fields[11]) + int(fields[12])  # utime, stime
+            except (OSError, IndexError, ValueError):
+                continue
+        return ticks / _CLOCK_TICKS
+
+    def rss_bytes(self) -> int:
+        total = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                continue
+        return total
+
+
+class PeakRss:
+    """Background thread recording a process tree's peak RSS"""
+
+    def __init__(self, tree: ProcessTree, interval: float = 0.1):
+        self.tree = tree
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.tree.rss_bytes())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def unique_jpeg(base: np.ndarray, rng: np.random.Generator) -> bytes:
+    """
+    Dashcam-like JPEG no earlier upload matches: a random coarse brightness
+    grid changes the image's dHash, so dedup does not skip its processing
+    """
+    height, width = base.shape[:2]
+    grid = rng.uniform(-40, 40, (8, 9)).astype(np.float32)
+    shade = cv2.resize(grid, (width, height), interpolation=cv2.INTER_NEAREST)
+    frame = np.clip(base + shade[:, :, None], 0, 255).astype(np.uint8)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("Failed to encode synthetic frame")
+    return buf.tobytes()
+
+
+class Workload:
+    """Requests of each scenario, drawn from the dataset manifest"""
+
+    def __init__(self, manifest: dict, args):
+        self.manifest = manifest
+        self.args = args
+        frame = synthetic_dashcam_frame(args.image_width, args.image_height, args.seed)
+        self.base_frame = frame.astype(np.float32)
+
+    def _point(self, rng: random.Random):
+        lat, lon = rng.choice(self.manifest["centers"])
+        spread = self.manifest["city_spread_deg"]
+        return lat + rng.gauss(0, spread), lon + rng.gauss(0, spread)
+
+    async def request(self, scenario: str, client: httpx.AsyncClient, headers: dict, rng: random.Random):
+        """Send one request; returns (status, seconds)"""
+        if scenario == "register":
+            call = client.post("/api/v1/auth/register", json={
+                "email": f"bench-new-{uuid.uuid4().hex}@example.com", "password": "benchmark-pass",
+                "name": "Benchmark",
+            })
+        elif scenario == "login":
+            call = client.post("/api/v1/auth/login", json={
+                "email": self.manifest["email_format"].format(rng.randrange(self.manifest["users"])),
+                "password": self.manifest["password"],
+            })
+        elif scenario == "nearby":
+            lat, lon = self._point(rng)
+            call = client.get("/api/v1/hazards/nearby", headers=headers, params={
+                "latitude": lat, "longitude": lon, "radius_km": self.args.radius_km,
+            })
+        elif scenario == "detail":
+            call = client.get(f"/api/v1/hazards/{rng.choice(self.manifest['sample_hazard_ids'])}",
+                              headers=headers)
+        else:
+            lat, lon = self._point(rng)
+            # Encoded off the event loop, before the clock starts
+            image = await asyncio.to_thread(unique_jpeg, self.base_frame,
+                                            np.random.default_rng(rng.getrandbits(64)))
+            call = client.post("/api/v1/hazards", headers=headers, files={
+                "image": ("frame.jpg", image, "image/jpeg"),
+            }, data={
+                "latitude": str(lat), "longitude": str(lon),
+                "confidence": str(round(rng.uniform(0.5, 0.99), 3)),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "device_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            })
+        start = time.perf_counter()
+        try:
+            status = (await call).status_code
+        except httpx.HTTPError:
+            status = "error"
+        return status, time.perf_counter() - start
+
+
+async def _ingested(client: httpx.AsyncClient) -> float:
+    """Uploads the server's ingestion workers have finished so far"""
+    match = _INGESTED.search((await client.get("/metrics")).text)
+    return float(match.group(1)) if match else 0.0
+
+
+async def run_scenario(client, scenario, workload, tokens, args, tree) -> dict:
+    latencies, statuses = [], {}
+    accepted = 0  # Including warmup requests
+    measure_from = time.perf_counter() + args.warmup
+    stop_at = measure_from + args.duration
+
+    async def worker(number):
+        nonlocal accepted
+        rng = random.Random(f"{args.seed}-{scenario}-{number}")
+        headers = {"Authorization": f"Bearer {tokens[number % len(tokens)]}"}
+        while time.perf_counter() < stop_at:
+            status, seconds = await workload.request(scenario, client, headers, rng)
+            accepted += status in (200, 201, 202)
+            if time.perf_counter() - seconds >= measure_from:
+                latencies.append(seconds * 1000)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    ingested_start = await _ingested(client) if scenario == "create" else 0.0
+    tasks = [asyncio.create_task(worker(number)) for number in range(args.concurrency)]
+    await asyncio.sleep(max(0.0, measure_from - time.perf_counter()))
+    ingested_from = await _ingested(client) if scenario == "create" else 0.0
+    cpu_from = tree.cpu_seconds() if tree else 0.0
+    client_cpu_from = time.process_time()
+    peak = PeakRss(tree) if tree else None
+    if peak:
+        peak.start()
+    try:
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - measure_from
+        client_cpu = time.process_time() - client_cpu_from
+        drain_seconds = 0.0
+        if scenario == "create":
+            # Wait for the ingestion workers to process everything accepted
+            drain_start = time.perf_counter()
+            while (await _ingested(client) - ingested_start < accepted
+                   and time.perf_counter() - drain_start < args.drain_timeout):
+                await asyncio.sleep(0.2)
+            drain_seconds = time.perf_counter() - drain_start
+        cpu = tree.cpu_seconds() - cpu_from if tree else None
+    finally:
+        if peak:
+            peak.stop()
+
+    ok = sum(count for status, count in statuses.items() if status in ("200", "201", "202"))
+    summary = latency_summary(latencies)
+    summary["statuses"] = statuses
+    summary["errors"] = len(latencies) - ok
+    summary["requests_per_sec"] = round(ok / elapsed, 2)
+    summary["client_cpu_pct"] = round(client_cpu / elapsed * 100, 1)
+    # Work done in the window: requests answered, and for uploads their background processing
+    done = ok
+    if scenario == "create":
+        done = int(await _ingested(client) - ingested_from)
+        summary["drain_seconds"] = round(drain_seconds, 2)
+        summary["ingested"] = done
+        summary["ingested_per_sec"] = round(done / (elapsed + drain_seconds), 2)
+    if tree:
+        summary["cpu_seconds"] = round(cpu, 2)
+        summary["cpu_cores"] = round(cpu / (elapsed + drain_seconds), 2)
+        summary["cpu_ms_per_request"] = round(cpu / done * 1000, 2) if done else None
+        summary["peak_rss_mb"] = round(peak.peak / 2**20, 1)
+    return summary
+
+
+def start_server(db_path: str, tmp: str, port: int, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        JWT_SECRET_KEY="benchmark-only-secret-key-not-for-production",
+        STORAGE_BACKEND="local",
+        LOCAL_STORAGE_DIR=os.path.join(tmp, "media"),
+        LOCAL_STORAGE_LATENCY_MS=str(args.storage_latency_ms),
+        SPOOL_DIR=os.path.join(tmp, "spool"),
+        PROFILE_DIR=os.path.join(tmp, "profiles"),
+        RETENTION_INTERVAL_MINUTES="0",  # No maintenance passes mid-measurement
+    )
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _tokens(client: httpx.AsyncClient, manifest: dict, count: int):
+    """Access tokens of the first `count` seed users (one per client)"""
+    async def login(i):
+        response = await client.post("/api/v1/auth/login", json={
+            "email": manifest["email_format"].format(i), "password": manifest["password"],
+        })
+        response.raise_for_status()
+        return response.json()["token"]
+
+    tokens = []
+    for start in range(0, count, 8):  # A few at a time: logins queue behind bcrypt
+        tokens.extend(await asyncio.gather(*[login(i) for i in range(start, min(count, start + 8))]))
+    return tokens
+
+
+async def run(args, base_url: str, manifest: dict, tree) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        tokens = await _tokens(client, manifest, min(args.concurrency, manifest["users"]))
+        workload = Workload(manifest, args)
+        results = {}
+        for scenario in args.scenarios:
+            results[scenario] = await run_scenario(client, scenario, workload, tokens, args, tree)
+            print(f"{scenario}: {json.dumps(results[scenario])}", file=sys.stderr)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=parse_count, default=parse_count("100k"), help="Dataset size: 10k to 10m")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default="benchmark-data", help="Cached seeded datasets")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--drain-timeout", type=float, default=300.0, help="Max wait for uploads to be processed")
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--image-width", type=int, default=1280)
+    parser.add_argument("--image-height", type=int, default=720)
+    parser.add_argument("--storage-latency-ms", type=int, default=50, help="Simulated storage round trip")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Server setting override")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--base-url", help="Running server to measure instead")
+    parser.add_argument("--manifest", help="Dataset manifest of the --base-url server's database")
+    parser.add_argument("--server-pid", type=int, help="--base-url server process, for CPU and RSS")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--max-regression", type=float, default=10.0, help="--compare: tolerated %% change")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_reports(*args.compare, keys=COMPARE_KEYS, max_regression_pct=args.max_regression)
+        sys.exit(1 if regressions else 0)
+
+    server_info = {}
+    if args.base_url:
+        if not args.manifest:
+            parser.error("--base-url needs --manifest")
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        tree = ProcessTree(args.server_pid) if args.server_pid else None
+        results = asyncio.run(run(args, args.base_url, manifest, tree))
+    else:
+        dataset, manifest = cached_dataset(args.hazards, args.seed, args.data_dir)
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            shutil.copyfile(dataset, db_path)  # Runs write to the database; the cached copy stays pristine
+            port = _free_port()
+            start = time.perf_counter()
+            server = start_server(db_path, tmp, port, args)
+            tree = ProcessTree(server.pid)
+            server_info = {
+                "startup_seconds": round(time.perf_counter() - start, 2),
+                "idle_rss_mb": round(tree.rss_bytes() / 2**20, 1),
+            }
+            try:
+                results = asyncio.run(run(args, f"http://127.0.0.1:{port}", manifest, tree))
+            finally:
+                server.terminate()
+                server.wait(60)
+
+    write_report({
+        "benchmark": "api_suite",
+        "label": args.label,
+        "revision": _git_revision(),
+        "environment": environment_info(),
+        "target": args.base_url or "local sqlite",
+        "dataset": {key: manifest[key] for key in ("hazards", "seed", "users", "duplicate_fraction", "version")},
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "storage_latency_ms": None if args.base_url else args.storage_latency_ms,
+        "server_env": args.env,
+        "server": server_info,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
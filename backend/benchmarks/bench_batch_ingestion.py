@@ -0,0 +1,128 @@
+"""
+Offline-sync replay: one POST per hazard vs POST /hazards/batch
+
+Replays a trip's worth of queued detections (--hazards, spread along a
+road so some cluster) against the app in process on a temporary SQLite
+database, first one multipart upload at a time, then in batches of
+--batch-size. Reports wall time, requests and database commits for each.
+Measures the accept path (validation, dedup, clustering, spool, insert);
+the ingestion workers are not started, so blurring is excluded.
+
+    python -m benchmarks.bench_batch_ingestion --hazards 500 --batch-size 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_db_concurrency import CENTER, in_process_app
+from benchmarks.common import environment_info, latency_summary, synthetic_jpeg, write_report
+
+
+def trip(count: int, offset: float):
+    """(metadata, image) per detection; every 4th revisits an earlier spot"""
+    device_id = str(uuid.uuid4())
+    items = []
+    for i in range(count):
+        step = i - i % 4 if i % 4 == 3 else i
+        items.append(({
+            "latitude": CENTER[0] + offset + step * 2e-4,
+            "longitude": CENTER[1] + step * 2e-4,
+            "confidence": 0.7,
+            "timestamp": f"2026-01-01T{10 + i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+            "device_id": device_id,
+            "client_ref": str(i),
+        }, synthetic_jpeg(320, 240, seed=i, quality=80)))
+    return items
+
+
+async def replay_single(client, headers, items) -> dict:
+    latencies = []
+    for meta, image in items:
+        data = {k: str(v) for k, v in meta.items() if k != "client_ref"}
+        start = time.perf_counter()
+        response = await client.post("/api/v1/hazards", headers=headers, data=data,
+                                     files={"image": ("frame.jpg", image, "image/jpeg")})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"requests": len(items), "latency": latency_summary(latencies)}
+
+
+async def replay_batch(client, headers, items, batch_size: int) -> dict:
+    latencies = []
+    for start_index in range(0, len(items), batch_size):
+        chunk = items[start_index:start_index + batch_size]
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/v1/hazards/batch", headers=headers,
+            data={"metadata": json.dumps([meta for meta, _ in chunk])},
+            files=[("images", (f"{i}.jpg", image, "image/jpeg")) for i, (_, image) in enumerate(chunk)],
+        )
+        response.raise_for_status()
+        if response.json()["rejected"]:
+            raise RuntimeError(f"Batch items rejected: {response.text[:500]}")
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"requests": len(latencies), "latency": latency_summary(latencies)}
+
+
+async def run(app, token, args) -> dict:
+    from sqlalchemy import event
+    from app.database import async_engine
+
+    commits = [0]
+    event.listen(async_engine.sync_engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        for name, offset in (("single", 0.0), ("batch", 0.5)):
+            items = trip(args.hazards, offset)
+            commits[0] = 0
+            start = time.perf_counter()
+            if name == "single":
+                result = await replay_single(client, headers, items)
+            else:
+                result = await replay_batch(client, headers, items, args.batch_size)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            result["hazards_per_sec"] = round(args.hazards / result["seconds"], 2)
+            result["commits"] = commits[0]
+            results[name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    # Workers aren't started in process; let the queue hold the whole replay
+    os.environ.setdefault("INGEST_MAX_BACKLOG", str(args.hazards * 4))
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("SPOOL_DIR", os.path.join(tmp, "spool"))
+        app, token = in_process_app(os.path.join(tmp, "bench.db"), 0, False, 0)
+        results = asyncio.run(run(app, token, args))
+        from app.database import async_engine, engine
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+    write_report({
+        "benchmark": "batch_ingestion",
+        "environment": environment_info(),
+        "hazards": args.hazards,
+        "batch_size": args.batch_size,
+        "results": results,
+        "speedup": round(results["single"]["seconds"] / max(results["batch"]["seconds"], 1e-6), 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
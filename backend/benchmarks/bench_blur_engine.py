@@ -0,0 +1,94 @@
+"""
+Blur engine throughput benchmark (images/sec against worker process count)
+
+Runs in-process, no server or database needed:
+
+    python -m benchmarks.bench_blur_engine --workers 1 2 4 8 --images 200
+"""
+
+import argparse
+import time
+from concurrent.futures import wait
+
+from benchmarks.common import (
+    configure_offline_env,
+    environment_info,
+    synthetic_jpeg,
+    write_report,
+)
+
+configure_offline_env()
+
+from app.services.blur_engine import BlurEngine, BlurEngineSaturated  # noqa: E402
+from app.services.image_service import blur_sensitive_data  # noqa: E402
+
+
+def run_inline(images, count: int) -> dict:
+    """Baseline: blur_sensitive_data called serially in this process"""
+    start = time.perf_counter()
+    for i in range(count):
+        blur_sensitive_data(images[i % len(images)])
+    elapsed = time.perf_counter() - start
+    return {"images": count, "seconds": round(elapsed, 3), "images_per_sec": round(count / elapsed, 2)}
+
+
+def run_engine(images, count: int, workers: int, batch_size: int, queue_size: int) -> dict:
+    engine = BlurEngine(num_workers=workers, queue_size=queue_size,
+                        batch_size=batch_size, batch_wait_ms=10)
+    engine.start()
+    try:
+        # Warm up: make sure every worker process has spawned and loaded the cascade
+        wait([engine.submit(images[0], timeout=30) for _ in range(workers)])
+
+        shed = 0
+        futures = []
+        start = time.perf_counter()
+        for i in range(count):
+            try:
+                futures.append(engine.submit(images[i % len(images)], timeout=30))
+            except BlurEngineSaturated:
+                shed += 1
+        wait(futures)
+        elapsed = time.perf_counter() - start
+    finally:
+        engine.stop()
+
+    done = len(futures)
+    return {
+        "workers": workers,
+        "batch_size": batch_size,
+        "images": done,
+        "shed": shed,
+        "seconds": round(elapsed, 3),
+        "images_per_sec": round(done / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    images = [synthetic_jpeg(args.width, args.height, seed=s) for s in range(8)]
+    results = {"inline": run_inline(images, min(args.images, 50))}
+    for workers in args.workers:
+        results[f"workers_{workers}"] = run_engine(
+            images, args.images, workers, args.batch_size, args.queue_size
+        )
+
+    write_report({
+        "benchmark": "blur_engine",
+        "environment": environment_info(),
+        "image_size": f"{args.width}x{args.height}",
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
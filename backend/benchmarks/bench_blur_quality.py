@@ -0,0 +1,152 @@
+"""
+Fast vs accurate blur mode: latency and quality regression check
+
+For every sample image, runs blur_sensitive_data in "accurate" mode (the
+reference output) and in "fast" mode, then reports:
+
+- ms per image for each mode
+- face recall: share of reference face boxes covered by a fast-mode box
+- residual detail: Laplacian variance left in each reference face region of
+  the fast output, relative to the original (lower = better obscured)
+- PSNR of the fast output against the reference output
+
+Exits with status 1 when recall drops below --min-recall, so it can gate a
+change to the fast path. Point --images-dir at real captures with faces;
+without it, synthetic frames only exercise the latency numbers (the
+committed face/plate fixture is gated by tests/test_blur_quality.py).
+
+    python -m benchmarks.bench_blur_quality --images-dir samples/ --min-recall 0.95
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import configure_offline_env, environment_info, synthetic_jpeg, write_report
+
+configure_offline_env()
+
+from app.services import image_service  # noqa: E402
+from app.services.image_service import BLUR_MODE_ACCURATE, BLUR_MODE_FAST  # noqa: E402
+
+
+def _load_samples(images_dir: str, width: int, height: int):
+    if images_dir:
+        paths = sorted(
+            p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(images_dir, ext))
+        )
+        samples = []
+        for path in paths:
+            with open(path, "rb") as f:
+                samples.append((os.path.basename(path), f.read()))
+        return samples
+    return [(f"synthetic-{s}", synthetic_jpeg(width, height, seed=s)) for s in range(8)]
+
+
+def _coverage(ref_box, boxes) -> float:
+    """Fraction of ref_box area covered by the union of boxes"""
+    x, y, w, h = ref_box
+    mask = np.zeros((h, w), dtype=bool)
+    for bx, by, bw, bh in boxes:
+        x0, y0 = max(bx, x) - x, max(by, y) - y
+        x1, y1 = min(bx + bw, x + w) - x, min(by + bh, y + h) - y
+        if x1 > x0 and y1 > y0:
+            mask[y0:y1, x0:x1] = True
+    return float(mask.mean()) if mask.size else 1.0
+
+
+def _detail(img, box) -> float:
+    x, y, w, h = box
+    region = cv2.cvtColor(img[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(region, cv2.CV_64F).var())
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images-dir")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--min-coverage", type=float, default=0.8)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    samples = _load_samples(args.images_dir, args.width, args.height)
+    if not samples:
+        parser.error(f"No images found in {args.images_dir}")
+
+    accurate_ms, fast_ms, psnrs, residuals = [], [], [], []
+    ref_faces = covered_faces = 0
+    per_image = {}
+
+    for name, image_bytes in samples:
+        original = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+        gray = cv2.cvtColor(original, cv2.COLOR_BGR2GRAY)
+        ref_boxes = image_service.detect_faces(gray, BLUR_MODE_ACCURATE)
+        fast_boxes = image_service.detect_faces(gray, BLUR_MODE_FAST)
+
+        reference, ms_a = _timed(image_service.blur_sensitive_data, image_bytes, BLUR_MODE_ACCURATE)
+        fast, ms_f = _timed(image_service.blur_sensitive_data, image_bytes, BLUR_MODE_FAST)
+        accurate_ms.append(ms_a)
+        fast_ms.append(ms_f)
+
+        reference_img = cv2.imdecode(np.frombuffer(reference, np.uint8), cv2.IMREAD_COLOR)
+        fast_img = cv2.imdecode(np.frombuffer(fast, np.uint8), cv2.IMREAD_COLOR)
+        psnrs.append(float(cv2.PSNR(reference_img, fast_img)))
+
+        covered = sum(1 for box in ref_boxes if _coverage(box, fast_boxes) >= args.min_coverage)
+        ref_faces += len(ref_boxes)
+        covered_faces += covered
+        for box in ref_boxes:
+            before = _detail(original, box)
+            if before > 0:
+                residuals.append(_detail(fast_img, box) / before)
+
+        per_image[name] = {
+            "accurate_ms": round(ms_a, 1),
+            "fast_ms": round(ms_f, 1),
+            "reference_faces": len(ref_boxes),
+            "fast_faces": len(fast_boxes),
+            "covered_faces": covered,
+        }
+
+    recall = covered_faces / ref_faces if ref_faces else None
+    results = {
+        "accurate": {"mean_ms": round(float(np.mean(accurate_ms)), 1)},
+        "fast": {"mean_ms": round(float(np.mean(fast_ms)), 1)},
+        "speedup": round(float(np.mean(accurate_ms) / np.mean(fast_ms)), 2),
+        "reference_faces": ref_faces,
+        "face_recall": round(recall, 3) if recall is not None else None,
+        "mean_residual_detail": round(float(np.mean(residuals)), 3) if residuals else None,
+        "mean_psnr_vs_reference_db": round(float(np.mean(psnrs)), 2),
+    }
+    write_report({
+        "benchmark": "blur_quality",
+        "environment": environment_info(),
+        "settings": {
+            "BLUR_DETECT_MAX_DIM": image_service.settings.BLUR_DETECT_MAX_DIM,
+            "BLUR_FAST_PADDING": image_service.settings.BLUR_FAST_PADDING,
+            "BLUR_FAST_FILTER": image_service.settings.BLUR_FAST_FILTER,
+        },
+        "results": results,
+        "per_image": per_image,
+    }, args.output)
+
+    if recall is not None and recall < args.min_recall:
+        print(f"FAIL: fast-mode face recall {recall:.3f} < {args.min_recall}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Database-bound read throughput under concurrent clients
+
+Drives GET /api/v1/hazards/nearby and GET /api/v1/hazards/{id} from 1, 16
+and 128 concurrent clients and reports requests/sec and p50/p95/p99 per
+level. These routes run on the async session, so the numbers show how far
+the event loop scales before the connection pool (DB_POOL_SIZE +
+DB_MAX_OVERFLOW) becomes the limit.
+
+By default the app runs in process (httpx ASGI transport) on a temporary
+SQLite database seeded with --hazards points, with the /nearby cache off so
+every request reaches the database. Use --base-url to measure a running
+server (e.g. PostgreSQL + asyncpg) instead; compare builds with --compare.
+
+    python -m benchmarks.bench_db_concurrency --hazards 20000 --requests-per-client 50
+    python -m benchmarks.bench_db_concurrency --base-url http://localhost:8000 --output after.json
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import compare_reports, environment_info, latency_summary, write_report
+
+CENTER = (28.61, 77.21)
+
+
+def in_process_app(db_path: str, hazards: int, cache: bool, seed: int):
+    """Seed a SQLite database and return (ASGI app, token); must run before app is imported"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["NEARBY_CACHE_ENABLED"] = "true" if cache else "false"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from app.models.hazard import Hazard, STATUS_READY
+    from app.models.user import User
+    from app.services.auth_service import create_user_token
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    db = SessionLocal()
+    # Password hashing is not what this measures; mint the token directly
+    user = User(email="bench@example.com", password_hash="-", name="Benchmark")
+    db.add(user)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    batch = []
+    for _ in range(hazards):
+        lat, lon = CENTER[0] + rng.gauss(0, 0.1), CENTER[1] + rng.gauss(0, 0.1)
+        batch.append(Hazard(
+            hazard_id=uuid.uuid4(), user_id=user.user_id, device_id=uuid.uuid4(),
+            location=f"SRID=4326;POINT({lon} {lat})", latitude=lat, longitude=lon,
+            confidence=0.8, aggregate_confidence=0.8, report_count=1, detected_at=now,
+            last_reported_at=now, status=STATUS_READY, image_url="/media/x.jpg",
+        ))
+        if len(batch) == 5000:
+            db.add_all(batch)
+            db.commit()
+            batch = []
+    db.add_all(batch)
+    db.commit()
+    token = create_user_token(user)
+    db.close()
+    return app, token
+
+
+async def _register(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/api/v1/auth/register", json={
+        "email": email, "password": "benchmark-pass", "name": "Benchmark"
+    })
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def _client(client, headers, scenario, hazard_ids, requests, radius_km, latencies, errors, rng):
+    for _ in range(requests):
+        if scenario == "nearby":
+            path = "/api/v1/hazards/nearby"
+            params = {
+                "latitude": CENTER[0] + rng.gauss(0, 0.1),
+                "longitude": CENTER[1] + rng.gauss(0, 0.1),
+                "radius_km": radius_km,
+            }
+        else:
+            path, params = f"/api/v1/hazards/{rng.choice(hazard_ids)}", None
+        start = time.perf_counter()
+        try:
+            ok = (await client.get(path, params=params, headers=headers)).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors.append(1)
+
+
+async def run_level(client, headers, scenario, hazard_ids, concurrency, requests, radius_km, seed) -> dict:
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _client(client, headers, scenario, hazard_ids, requests, radius_km, latencies, errors,
+                random.Random(seed * 1000 + c))
+        for c in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary["errors"] = len(errors)
+    summary["requests_per_sec"] = round((len(latencies) - len(errors)) / elapsed, 2)
+    return summary
+
+
+async def run(args, app=None, token=None) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    if app is not None:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                   timeout=120)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits)
+    async with client:
+        if token is None:
+            token = await _register(client)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Detail lookups pick from hazards the server actually has
+        response = await client.get("/api/v1/hazards/nearby", headers=headers, params={
+            "latitude": CENTER[0], "longitude": CENTER[1], "radius_km": 50, "limit": 500,
+        })
+        response.raise_for_status()
+        hazard_ids = [item["hazard_id"] for item in response.json()["hazards"]]
+
+        results = {}
+        for scenario in args.scenarios:
+            if scenario == "detail" and not hazard_ids:
+                continue
+            for concurrency in args.concurrency:
+                results[f"{scenario}_c{concurrency}"] = await run_level(
+                    client, headers, scenario, hazard_ids, concurrency,
+                    args.requests_per_client, args.radius_km, args.seed,
+                )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", help="Running server; default runs the app in process on SQLite")
+    parser.add_argument("--hazards", type=int, default=20000, help="Seeded hazards (in process only)")
+    parser.add_argument("--cache", action="store_true", help="Keep the /nearby cache on (in process only)")
+    parser.add_argument("--scenarios", nargs="+", choices=("nearby", "detail"), default=["nearby", "detail"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--requests-per-client", type=int, default=20)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare, keys=("p50_ms", "p99_ms", "requests_per_sec"))
+        return
+
+    if args.base_url:
+        results = asyncio.run(run(args))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            app, token = in_process_app(os.path.join(tmp, "bench.db"), args.hazards, args.cache, args.seed)
+            results = asyncio.run(run(args, app, token))
+            from app.database import async_engine, engine
+            asyncio.run(async_engine.dispose())
+            engine.dispose()
+
+    write_report({
+        "benchmark": "db_concurrency",
+        "label": args.label,
+        "environment": environment_info(),
+        "target": args.base_url or "in-process sqlite",
+        "hazards": None if args.base_url else args.hazards,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
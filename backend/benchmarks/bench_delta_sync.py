@@ -0,0 +1,147 @@
+"""
+Delta sync: cost of refreshing a local hazard store, full refetch vs cursor
+
+Seeds a temporary SQLite database with N hazards around a city, then runs
+--refreshes rounds in which --inserts hazards are reported, --updates
+existing ones get another report and --deletes are removed. After each
+round the client's bounding box is refreshed two ways through
+sync_service.changes (paged by --page):
+
+    full   no cursor: every hazard in the box again (what a client without
+           a cursor, or polling /nearby over its area, downloads)
+    delta  from the previous cursor: only the round's changes
+
+Reported per mode: ms, pages (queries), rows and JSON bytes per refresh,
+plus whether the delta-synced store ends up identical to the database.
+Offline.
+
+    python -m benchmarks.bench_delta_sync --hazards 50000 --refreshes 20
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import configure_offline_env, environment_info, latency_summary, write_report
+
+configure_offline_env()
+os.environ.setdefault("SYNC_SETTLE_SECONDS", "0")  # The benchmark commits before it syncs
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models.hazard import Hazard  # noqa: E402
+from app.services.sync_service import changes, decode_cursor, record_deletions  # noqa: E402
+from benchmarks.bench_nearby_cache import CENTER, _hazard, seed  # noqa: E402
+
+REGION = (CENTER[0] - 0.1, CENTER[1] - 0.1, CENTER[0] + 0.1, CENTER[1] + 0.1)
+
+
+def refresh(session, since, page_size):
+    """Page through changes like a client; returns (cursor, changes, pages, bytes)"""
+    received, pages, sent = [], 0, 0
+    while True:
+        body = changes(session, REGION, since, page_size)
+        pages += 1
+        sent += len(json.dumps(body))
+        received.append(body)
+        since = decode_cursor(body["cursor"])
+        if not body["has_more"]:
+            return since, received, pages, sent
+
+
+def mutate(session, rng: random.Random, args, live):
+    for _ in range(args.inserts):
+        hazard = _hazard(CENTER[0] + rng.gauss(0, 0.05), CENTER[1] + rng.gauss(0, 0.05))
+        session.add(hazard)
+        live.append(hazard.hazard_id)
+    for hazard_id in rng.sample(live, min(args.updates, len(live))):
+        session.query(Hazard).filter(Hazard.hazard_id == hazard_id).update(
+            {Hazard.report_count: Hazard.report_count + 1}, synchronize_session=False
+        )
+    for hazard_id in rng.sample(live, min(args.deletes, len(live))):
+        hazard = session.get(Hazard, hazard_id)
+        record_deletions(session, [hazard])
+        session.delete(hazard)
+        live.remove(hazard_id)
+    session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=50000)
+    parser.add_argument("--refreshes", type=int, default=20)
+    parser.add_argument("--inserts", type=int, default=50, help="New hazards per round")
+    parser.add_argument("--updates", type=int, default=100, help="Changed hazards per round")
+    parser.add_argument("--deletes", type=int, default=5, help="Deleted hazards per round")
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'sync.db')}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        seed(session, args.hazards, rng)
+
+        start = time.perf_counter()
+        cursor, received, pages, sent = refresh(session, None, args.page)
+        initial = {"ms": round((time.perf_counter() - start) * 1000, 1), "pages": pages,
+                   "rows": sum(len(body["hazards"]) for body in received), "bytes": sent}
+        store = {item["hazard_id"]: item for body in received for item in body["hazards"]}
+        live = [hazard_id for (hazard_id,) in session.query(Hazard.hazard_id)]
+
+        stats = {mode: {"ms": [], "pages": 0, "rows": 0, "bytes": 0} for mode in ("full", "delta")}
+        for _ in range(args.refreshes):
+            mutate(session, rng, args, live)
+            session.expire_all()
+            for mode in ("full", "delta"):
+                start = time.perf_counter()
+                new_cursor, received, pages, sent = refresh(session, None if mode == "full" else cursor, args.page)
+                stats[mode]["ms"].append((time.perf_counter() - start) * 1000)
+                stats[mode]["pages"] += pages
+                stats[mode]["bytes"] += sent
+                stats[mode]["rows"] += sum(len(body["hazards"]) + len(body["deleted"]) for body in received)
+                if mode == "delta":
+                    cursor = new_cursor
+                    for body in received:
+                        store.update((item["hazard_id"], item) for item in body["hazards"])
+                        for hazard_id in body["deleted"]:
+                            store.pop(hazard_id, None)
+
+        _, received, _, _ = refresh(session, None, args.page)
+        expected = {item["hazard_id"]: item["report_count"] for body in received for item in body["hazards"]}
+        consistent = expected == {hazard_id: item["report_count"] for hazard_id, item in store.items()}
+        session.close()
+        engine.dispose()
+
+    results = {}
+    for mode, s in stats.items():
+        results[mode] = {
+            "latency": latency_summary(s["ms"]),
+            "pages_per_refresh": round(s["pages"] / args.refreshes, 1),
+            "rows_per_refresh": round(s["rows"] / args.refreshes, 1),
+            "kb_per_refresh": round(s["bytes"] / args.refreshes / 1024, 1),
+        }
+    write_report({
+        "benchmark": "delta_sync",
+        "environment": environment_info(),
+        "hazards": args.hazards,
+        "refreshes": args.refreshes,
+        "changes_per_round": {"inserts": args.inserts, "updates": args.updates, "deletes": args.deletes},
+        "initial_sync": initial,
+        "results": results,
+        "delta_store_consistent": consistent,
+        "bytes_ratio": round(results["full"]["kb_per_refresh"] / max(results["delta"]["kb_per_refresh"], 1e-9), 1),
+        "latency_ratio": round(results["full"]["latency"]["mean_ms"] / max(results["delta"]["latency"]["mean_ms"], 1e-9), 1),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Group commit: POST /hazards inserts/sec and transactions/sec vs concurrency
+
+Runs the app in process on a temporary SQLite database and has --clients
+concurrent clients (each level in turn) upload --reports single hazard
+reports in total, with the hazard writer in two modes:
+
+    per_report  HAZARD_WRITE_BATCH_SIZE=1: every report commits on its own
+                (one transaction per request, as before group commit)
+    grouped     the configured group commit (HAZARD_WRITE_BATCH_SIZE,
+                HAZARD_WRITE_BATCH_WAIT_MS)
+
+Reported per mode and level: inserts/sec, database commits/sec, reports
+per commit, request p50/p99 and failed requests. Measures the accept path
+(spool, clustering, insert); the ingestion workers are not started.
+
+    python -m benchmarks.bench_group_commit --clients 1 8 32 128 --reports 1024
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_db_concurrency import CENTER, in_process_app
+from benchmarks.common import environment_info, latency_summary, synthetic_jpeg, write_report
+
+
+async def drive(client, headers, clients: int, reports, images) -> dict:
+    latencies, failures = [], [0]
+    pending = list(reports)
+
+    async def vehicle():
+        device_id = str(uuid.uuid4())
+        while pending:
+            lat, lon, n = pending.pop()
+            start = time.perf_counter()
+            response = await client.post("/api/v1/hazards", headers=headers, data={
+                "latitude": str(lat), "longitude": str(lon), "confidence": "0.7",
+                "timestamp": "2026-01-01T10:00:00Z", "device_id": device_id,
+            }, files={"image": ("frame.jpg", images[n % len(images)], "image/jpeg")})
+            if response.status_code == 202:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                failures[0] += 1
+
+    await asyncio.gather(*[vehicle() for _ in range(clients)])
+    return {"latency": latency_summary(latencies), "failed": failures[0]}
+
+
+async def run(app, token, args) -> dict:
+    from sqlalchemy import event
+    from app.config import settings
+    from app.database import async_engine
+    from app.services.hazard_writer import get_hazard_writer
+
+    commits = [0]
+    event.listen(async_engine.sync_engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+    writer = get_hazard_writer()
+    rng = random.Random(args.seed)
+    images = [synthetic_jpeg(320, 240, seed=i, quality=80) for i in range(16)]
+
+    results = {}
+    # Server errors (e.g. SQLite lock timeouts) count as failed requests
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        for mode, batch_size in (("per_report", 1), ("grouped", settings.HAZARD_WRITE_BATCH_SIZE)):
+            writer.batch_size = batch_size
+            results[mode] = {}
+            for clients in args.clients:
+                reports = [(CENTER[0] + rng.gauss(0, 0.05), CENTER[1] + rng.gauss(0, 0.05), n)
+                           for n in range(args.reports)]
+                commits[0] = 0
+                start = time.perf_counter()
+                result = await drive(client, headers, clients, reports, images)
+                seconds = time.perf_counter() - start
+                stored = result["latency"]["count"]
+                result.update({
+                    "inserts_per_sec": round(stored / seconds, 1),
+                    "commits_per_sec": round(commits[0] / seconds, 1),
+                    "reports_per_commit": round(stored / max(commits[0], 1), 1),
+                })
+                results[mode][str(clients)] = result
+        await writer.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--reports", type=int, default=1024, help="Reports per mode and concurrency level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    # Workers aren't started in process; let the queue hold every report
+    total = 2 * len(args.clients) * args.reports
+    os.environ.setdefault("INGEST_MAX_BACKLOG", str(total + 1))
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("SPOOL_DIR", os.path.join(tmp, "spool"))
+        app, token = in_process_app(os.path.join(tmp, "bench.db"), 0, False, 0)
+        results = asyncio.run(run(app, token, args))
+        from app.config import settings
+        from app.database import async_engine, engine
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+    speedup = {
+        clients: round(results["grouped"][clients]["inserts_per_sec"]
+                       / max(results["per_report"][clients]["inserts_per_sec"], 1e-9), 2)
+        for clients in results["grouped"]
+    }
+    write_report({
+        "benchmark": "group_commit",
+        "environment": environment_info(),
+        "reports": args.reports,
+        "batch_size": settings.HAZARD_WRITE_BATCH_SIZE,
+        "batch_wait_ms": settings.HAZARD_WRITE_BATCH_WAIT_MS,
+        "results": results,
+        "speedup": speedup,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Hazard stream vs /nearby polling: work and bytes per vehicle
+
+Seeds a temporary SQLite database with N hazards, then drives --vehicles
+along --roads for --ticks steps (~44m each) while a new hazard is reported
+every --insert-every vehicle steps. The same drive is served two ways:
+
+    poll    every step, the /nearby path (read-through cache + memory
+            spatial engine) and its JSON response, as the app polls today
+    stream  one subscription per vehicle: the area moves (sending only the
+            hazards it entered) once the vehicle is --move-fraction of the
+            radius from its centre, and inserts are fanned out through the
+            cell index
+
+Reported per mode: handler-side seconds, database queries, hazard rows and
+JSON bytes sent, plus the stream's publish cost per event. Offline; uses
+FakeRedis unless REDIS_URL is set.
+
+    python -m benchmarks.bench_hazard_stream --hazards 20000 --vehicles 100 --ticks 30
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import configure_offline_env, environment_info, write_report
+
+configure_offline_env()
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.services.hazard_stream import (  # noqa: E402
+    EVENT_CREATED, EVENT_SNAPSHOT, HazardStream, entered, hazard_item, hazard_message
+)
+from app.services.nearby_cache import NearbyCache, create_redis_clients  # noqa: E402
+from app.services.spatial_engine import InMemoryQueryEngine  # noqa: E402
+from app.utils import haversine_m  # noqa: E402
+from benchmarks.bench_nearby_cache import CENTER, _hazard, seed  # noqa: E402
+
+
+def drive(args, seed_value: int):
+    """Vehicle positions per tick and the insert points, identical for both modes"""
+    rng = random.Random(seed_value)
+    roads = []
+    for _ in range(args.roads):
+        angle = rng.uniform(0, math.pi)
+        roads.append((CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05),
+                      0.0004 * math.sin(angle), 0.0004 * math.cos(angle)))
+    vehicles = []
+    for _ in range(args.vehicles):
+        lat, lon, d_lat, d_lon = rng.choice(roads)
+        offset = rng.randint(-200, 200)
+        vehicles.append((lat + offset * d_lat, lon + offset * d_lon, d_lat, d_lon))
+    inserts = {}
+    step = 0
+    for tick in range(args.ticks):
+        for v in range(args.vehicles):
+            step += 1
+            if args.insert_every and step % args.insert_every == 0:
+                lat, lon, d_lat, d_lon = vehicles[rng.randrange(args.vehicles)]
+                ahead = tick + rng.randint(5, 40)  # Somewhere on a road a vehicle will pass
+                inserts.setdefault((tick, v), []).append((lat + ahead * d_lat, lon + ahead * d_lon))
+    return vehicles, inserts
+
+
+def _insert(session, spatial, lat, lon):
+    hazard = _hazard(lat, lon)
+    session.add(hazard)
+    session.commit()
+    spatial.on_insert(hazard)
+    return hazard
+
+
+async def run_poll(session, spatial, args, vehicles, inserts) -> dict:
+    cache = NearbyCache(
+        *create_redis_clients(), settings.NEARBY_CACHE_LOCAL_ENTRIES,
+        settings.NEARBY_CACHE_TTL_SECONDS, settings.NEARBY_CACHE_PRECISION,
+        settings.NEARBY_CACHE_VERSION_TTL_MS / 1000.0,
+    )
+    radius_m = args.radius_km * 1000
+    work = rows = sent = 0
+    queries = [0]
+
+    async def load(lat, lon, radius, limit):
+        queries[0] += 1
+        return [(hazard_item(h), d) for h, d in spatial.nearby(session, lat, lon, radius, limit)]
+
+    for tick in range(args.ticks):
+        for v, (lat, lon, d_lat, d_lon) in enumerate(vehicles):
+            for point in inserts.get((tick, v), ()):
+                _insert(session, spatial, *point)
+                await cache.invalidate(*point)
+            start = time.perf_counter()
+            result, _ = await cache.lookup(lat + tick * d_lat, lon + tick * d_lon, radius_m, args.limit, load)
+            body = json.dumps({"hazards": [dict(item, distance_km=round(d / 1000, 2)) for item, d in result]})
+            work += time.perf_counter() - start
+            rows += len(result)
+            sent += len(body)
+    return {"work_seconds": round(work, 3), "database_queries": queries[0], "rows_sent": rows, "bytes_sent": sent}
+
+
+async def run_stream(session, spatial, args, vehicles, inserts) -> dict:
+    stream = HazardStream(settings.STREAM_CELL_DEGREES, settings.STREAM_QUEUE_SIZE)
+    radius_m = args.radius_km * 1000
+    subs = [stream.subscribe() for _ in vehicles]
+    work = rows = sent = queries = moves = 0
+    publish_seconds, events, resyncs = 0.0, 0, 0
+    deliveries = [0]
+
+    def drain(sub):
+        nonlocal rows, sent, resyncs
+        while not sub.queue.empty():
+            message = sub.queue.get_nowait()
+            sent += len(json.dumps(message))
+            if message["type"] == "hazard":
+                rows += 1
+            else:
+                resyncs += 1
+
+    for tick in range(args.ticks):
+        for v, (lat, lon, d_lat, d_lon) in enumerate(vehicles):
+            sub = subs[v]
+            for point in inserts.get((tick, v), ()):
+                hazard = _insert(session, spatial, *point)
+                start = time.perf_counter()
+                stream.publish(hazard, EVENT_CREATED)
+                publish_seconds += time.perf_counter() - start
+                events += 1
+                deliveries[0] += sum(1 for s in subs if s.covers(hazard.latitude, hazard.longitude) is not None)
+            q_lat, q_lon = lat + tick * d_lat, lon + tick * d_lon
+            start = time.perf_counter()
+            if sub.latitude is None or haversine_m(sub.latitude, sub.longitude, q_lat, q_lon) > \
+                    radius_m * args.move_fraction:
+                previous = sub.area
+                stream.move(sub, q_lat, q_lon, radius_m)
+                queries += 1
+                moves += 1
+                for hazard, distance in entered(spatial.nearby(session, q_lat, q_lon, radius_m, args.limit),
+                                                previous):
+                    # The route awaits queue space for snapshots instead of dropping
+                    if sub.queue.full():
+                        drain(sub)
+                    sub.queue.put_nowait(hazard_message(hazard_item(hazard), EVENT_SNAPSHOT, distance))
+            work += time.perf_counter() - start
+        await asyncio.sleep(0)  # Run the deliveries scheduled by publish()
+        start = time.perf_counter()
+        for sub in subs:
+            drain(sub)
+        work += time.perf_counter() - start
+    return {
+        "work_seconds": round(work + publish_seconds, 3),
+        "database_queries": queries,
+        "rows_sent": rows,
+        "bytes_sent": sent,
+        "area_moves": moves,
+        "resyncs": resyncs,
+        "publish_us_per_event": round(publish_seconds / max(events, 1) * 1e6, 1),
+        "deliveries_per_event": round(deliveries[0] / max(events, 1), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=20000)
+    parser.add_argument("--vehicles", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=30, help="Steps per vehicle (one poll each when polling)")
+    parser.add_argument("--roads", type=int, default=20)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--insert-every", type=int, default=25)
+    parser.add_argument("--move-fraction", type=float, default=0.25,
+                        help="Stream: move the area after travelling this fraction of the radius")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    vehicles, inserts = drive(args, args.seed + 1)
+    results = {}
+    for mode, runner in (("poll", run_poll), ("stream", run_stream)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'stream.db')}")
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine)
+            session = session_factory()
+            seed(session, args.hazards, random.Random(args.seed))
+            spatial = InMemoryQueryEngine(
+                settings.SPATIAL_INDEX_CELL_DEGREES, settings.SPATIAL_INDEX_SYNC_SECONDS, session_factory
+            )
+            results[mode] = asyncio.run(runner(session, spatial, args, vehicles, inserts))
+            session.close()
+            engine.dispose()
+
+    steps = args.vehicles * args.ticks
+    for result in results.values():
+        result["us_per_vehicle_step"] = round(result["work_seconds"] / steps * 1e6, 1)
+    write_report({
+        "benchmark": "hazard_stream",
+        "environment": environment_info(),
+        "hazards": args.hazards,
+        "vehicle_steps": steps,
+        "inserts": sum(len(points) for points in inserts.values()),
+        "radius_km": args.radius_km,
+        "results": results,
+        "bytes_ratio": round(results["poll"]["bytes_sent"] / max(results["stream"]["bytes_sent"], 1), 1),
+        "work_ratio": round(results["poll"]["work_seconds"] / max(results["stream"]["work_seconds"], 1e-9), 1),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
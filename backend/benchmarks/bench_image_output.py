@@ -0,0 +1,115 @@
+"""
+Bytes and milliseconds saved per image by passthrough and encode settings
+
+Compares, on the same images:
+
+- legacy:      always decode + re-encode (cv2 default JPEG quality 95)
+- passthrough: original bytes kept when nothing is detected, EXIF/GPS stripped
+- webp:        passthrough plus WebP output whenever blurring happens
+
+Synthetic frames carry EXIF + GPS metadata and contain no faces/plates,
+i.e. the common dashcam case. Add --images-dir to include real captures.
+
+    python -m benchmarks.bench_image_output --images-dir samples/
+"""
+
+import argparse
+import glob
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import (
+    configure_offline_env,
+    environment_info,
+    synthetic_dashcam_frame,
+    write_report,
+)
+
+configure_offline_env()
+
+from app.services import image_service  # noqa: E402
+
+SCENARIOS = {
+    "legacy": {"IMAGE_PASSTHROUGH": False, "IMAGE_OUTPUT_FORMAT": "jpeg",
+               "IMAGE_JPEG_QUALITY": 95, "IMAGE_JPEG_PROGRESSIVE": False},
+    "passthrough": {"IMAGE_PASSTHROUGH": True, "IMAGE_OUTPUT_FORMAT": "jpeg",
+                    "IMAGE_JPEG_QUALITY": 85, "IMAGE_JPEG_PROGRESSIVE": True},
+    "webp": {"IMAGE_PASSTHROUGH": True, "IMAGE_OUTPUT_FORMAT": "webp"},
+}
+
+
+def _with_gps_exif(frame: np.ndarray) -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = "SAFAR dashcam"
+    exif[0x8825] = {1: "N", 2: (28.0, 36.0, 50.0), 3: "E", 4: (77.0, 12.0, 30.0)}
+    buf = io.BytesIO()
+    Image.fromarray(frame[:, :, ::-1]).save(buf, "JPEG", quality=92, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def _load_samples(images_dir, width, height, count):
+    samples = [_with_gps_exif(synthetic_dashcam_frame(width, height, seed=s)) for s in range(count)]
+    if images_dir:
+        for path in sorted(glob.glob(os.path.join(images_dir, "*.jp*g"))):
+            with open(path, "rb") as f:
+                samples.append(f.read())
+    return samples
+
+
+def run_scenario(samples, overrides: dict, repeats: int) -> dict:
+    saved = {key: getattr(image_service.settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(image_service.settings, key, value)
+    try:
+        ms, out_bytes, passthrough = [], [], 0
+        for _ in range(repeats):
+            for image_bytes in samples:
+                start = time.perf_counter()
+                result = image_service.process_image(image_bytes)
+                ms.append((time.perf_counter() - start) * 1000)
+                out_bytes.append(len(result.data))
+                passthrough += result.passthrough
+    finally:
+        for key, value in saved.items():
+            setattr(image_service.settings, key, value)
+
+    return {
+        "mean_ms": round(float(np.mean(ms)), 2),
+        "mean_output_bytes": int(np.mean(out_bytes)),
+        "passthrough_rate": round(passthrough / len(ms), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images-dir")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    samples = _load_samples(args.images_dir, args.width, args.height, args.count)
+    results = {name: run_scenario(samples, overrides, args.repeats) for name, overrides in SCENARIOS.items()}
+
+    legacy = results["legacy"]
+    for name, result in results.items():
+        result["bytes_saved_per_image"] = legacy["mean_output_bytes"] - result["mean_output_bytes"]
+        result["ms_saved_per_image"] = round(legacy["mean_ms"] - result["mean_ms"], 2)
+
+    write_report({
+        "benchmark": "image_output",
+        "environment": environment_info(),
+        "samples": len(samples),
+        "mean_input_bytes": int(np.mean([len(s) for s in samples])),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
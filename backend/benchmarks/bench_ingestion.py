@@ -0,0 +1,118 @@
+"""
+Upload latency benchmark for POST /api/v1/hazards
+
+Simulates concurrent dashcam clients against a running API server and
+reports request latency (p50/p95/p99) and accepted uploads/sec per
+concurrency level. Run it once against the old build and once against the
+new one, then compare:
+
+    python -m benchmarks.bench_ingestion --base-url http://localhost:8000 \\
+        --label before --output before.json
+    python -m benchmarks.bench_ingestion --base-url http://localhost:8000 \\
+        --label after --output after.json
+    python -m benchmarks.bench_ingestion --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import (
+    compare_reports,
+    environment_info,
+    latency_summary,
+    synthetic_jpeg,
+    write_report,
+)
+
+
+async def _register(client: httpx.AsyncClient) -> str:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/api/v1/auth/register", json={
+        "email": email, "password": "benchmark-pass", "name": "Benchmark"
+    })
+    response.raise_for_status()
+    return response.json()["token"]
+
+
+async def _dashcam_client(client, token, images, uploads, latencies, errors, rng_offset):
+    device_id = str(uuid.uuid4())
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(uploads):
+        image = images[(rng_offset + i) % len(images)]
+        data = {
+            "latitude": str(28.6 + (rng_offset + i) * 1e-4),
+            "longitude": str(77.2 + (rng_offset + i) * 1e-4),
+            "confidence": "0.9",
+            "timestamp": "2024-01-15T10:30:00Z",
+            "device_id": device_id,
+        }
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/hazards", headers=headers, data=data,
+                files={"image": ("frame.jpg", image, "image/jpeg")},
+            )
+            ok = response.status_code in (200, 202)
+        except httpx.HTTPError:
+            ok = False
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not ok:
+            errors.append(1)
+
+
+async def run_level(base_url: str, concurrency: int, uploads_per_client: int, images) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        token = await _register(client)
+        latencies, errors = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            _dashcam_client(client, token, images, uploads_per_client, latencies, errors, c * 1000)
+            for c in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    summary = latency_summary(latencies)
+    summary["errors"] = len(errors)
+    summary["uploads_per_sec"] = round((len(latencies) - len(errors)) / elapsed, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--uploads-per-client", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare, keys=("p50_ms", "p99_ms", "uploads_per_sec"))
+        return
+
+    images = [synthetic_jpeg(args.width, args.height, seed=s) for s in range(8)]
+    results = {}
+    for concurrency in args.concurrency:
+        results[f"concurrency_{concurrency}"] = asyncio.run(
+            run_level(args.base_url, concurrency, args.uploads_per_client, images)
+        )
+
+    write_report({
+        "benchmark": "ingestion",
+        "label": args.label,
+        "environment": environment_info(),
+        "image_bytes": len(images[0]),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
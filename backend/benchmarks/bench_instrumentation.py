@@ -0,0 +1,165 @@
+"""
+Instrumentation overhead: /nearby latency with metrics and the profiler on vs off
+
+Runs the app in process on a temporary SQLite database seeded with
+--hazards points (/nearby cache off, so every request runs the spatial
+query: the cheapest request that goes through every /nearby histogram,
+where fixed per-request costs weigh the most) and times --requests
+sequential /nearby requests per mode, the modes interleaved (in rotating
+order) over --rounds:
+
+    off       Counter.inc and Histogram.observe replaced by no-ops
+    metrics   the default: request, stage and cache metrics recorded
+    sampled   metrics plus the slow request profiler at --profile-rate
+              (stack samples taken, profiles dropped as not slow)
+    profiled  every request profiled (the worst case, PROFILE_SAMPLE_RATE=1)
+
+Reported per mode: p50/p99/mean and the mean's overhead over "off". The A/B
+difference is noisy at the 1% level, so the overhead of the metrics is also
+computed from the cost of one observation (timed in a loop) times the
+observations a request makes. Plus the time to render /metrics. Offline.
+
+    python -m benchmarks.bench_instrumentation --hazards 20000 --requests 200 --rounds 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_db_concurrency import CENTER, in_process_app
+from benchmarks.common import environment_info, latency_summary, write_report
+
+MODES = ("off", "metrics", "sampled", "profiled")
+
+
+def observation_ns(repeat: int = 200000) -> float:
+    """ns per labelled Histogram.observe"""
+    from app.metrics import Histogram, REGISTRY
+
+    histogram = Histogram("bench_observe_seconds", "benchmark only", ("stage",))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        histogram.observe(0.003, stage="query")
+    elapsed = time.perf_counter() - start
+    REGISTRY._metrics.remove(histogram)
+    return elapsed / repeat * 1e9
+
+
+class Switch:
+    """Turns metric updates into no-ops, or counts them"""
+
+    def __init__(self):
+        from app.metrics import Counter, Histogram
+
+        self.classes = (Counter, Histogram)
+        self.originals = (Counter.inc, Histogram.observe)
+        self.calls = 0
+
+    def set(self, mode: str):
+        counter, histogram = self.classes
+        if mode == "off":
+            counter.inc = histogram.observe = lambda self, *args, **labels: None
+        elif mode == "count":
+            switch = self
+
+            def counting(original):
+                def wrapper(self, *args, **labels):
+                    switch.calls += 1
+                    return original(self, *args, **labels)
+                return wrapper
+            counter.inc, histogram.observe = (counting(original) for original in self.originals)
+        else:
+            counter.inc, histogram.observe = self.originals
+
+
+async def run(app, token, args) -> dict:
+    from app.profiler import slow_request_profiler
+
+    switch = Switch()
+    slow_request_profiler.slow_ms = float("inf")  # Sample, never write
+    params = {"latitude": CENTER[0], "longitude": CENTER[1], "radius_km": args.radius_km, "limit": 100}
+    latencies = {mode: [] for mode in MODES}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def nearby():
+            start = time.perf_counter()
+            response = await client.get("/api/v1/hazards/nearby", params=params, headers=headers)
+            response.raise_for_status()
+            return (time.perf_counter() - start) * 1000
+
+        for _ in range(20):  # Warm up (spatial index load, first queries)
+            await nearby()
+        switch.set("count")
+        await nearby()
+        observations = switch.calls
+
+        for round_number in range(args.rounds):
+            # Rotated so no mode always runs first (drift, cache warmth)
+            shift = round_number % len(MODES)
+            for mode in MODES[shift:] + MODES[:shift]:
+                switch.set(mode)
+                slow_request_profiler.sample_rate = {"sampled": args.profile_rate, "profiled": 1.0}.get(mode, 0.0)
+                for _ in range(args.requests):
+                    latencies[mode].append(await nearby())
+        switch.set("metrics")
+        slow_request_profiler.sample_rate = 0.0
+
+        start = time.perf_counter()
+        body = (await client.get("/metrics")).text
+        render_ms = (time.perf_counter() - start) * 1000
+
+    results = {}
+    baseline = statistics.mean(latencies["off"])
+    for mode in MODES:
+        summary = latency_summary(latencies[mode])
+        summary["overhead_pct"] = round((statistics.mean(latencies[mode]) / baseline - 1) * 100, 2)
+        results[mode] = summary
+    per_observation = observation_ns()
+    return {
+        "results": results,
+        "observations_per_request": observations,
+        "ns_per_observation": round(per_observation, 1),
+        "metrics_overhead_pct_estimate": round(observations * per_observation / 1e6 / baseline * 100, 3),
+        "metrics_render_ms": round(render_ms, 2),
+        "metrics_lines": body.count("\n"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=20000)
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per mode and round")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--profile-rate", type=float, default=0.01, help="Sampled mode: fraction profiled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("PROFILE_DIR", os.path.join(tmp, "profiles"))
+        app, token = in_process_app(os.path.join(tmp, "bench.db"), args.hazards, False, args.seed)
+        report = asyncio.run(run(app, token, args))
+        from app.database import async_engine, engine
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+    write_report({
+        "benchmark": "instrumentation",
+        "environment": environment_info(),
+        "hazards": args.hazards,
+        "requests_per_mode": args.requests * args.rounds,
+        "profile_rate": args.profile_rate,
+        **report,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
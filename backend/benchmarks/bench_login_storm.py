@@ -0,0 +1,114 @@
+"""
+/nearby latency during a login storm
+
+A prober polls GET /api/v1/hazards/nearby at a fixed interval, first on a
+quiet server, then while --storm-clients clients hammer POST /auth/login
+(bcrypt verification). With hashing off the event loop the two latency
+distributions should match; 503s show the hashing pool shedding load
+instead of queueing without bound.
+
+Runs the app in process on a temporary SQLite database (like
+bench_db_concurrency), with the /nearby cache off.
+
+    python -m benchmarks.bench_login_storm --storm-clients 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_db_concurrency import CENTER, in_process_app
+from benchmarks.common import environment_info, latency_summary, write_report
+
+PASSWORD = "benchmark-pass"
+
+
+async def probe(client, headers, duration: float, interval: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/v1/hazards/nearby", headers=headers, params={
+            "latitude": CENTER[0], "longitude": CENTER[1], "radius_km": 2,
+        })
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+    return latencies
+
+
+async def login_loop(client, email: str, stop: asyncio.Event, outcomes: dict):
+    while not stop.is_set():
+        response = await client.post("/api/v1/auth/login", json={"email": email, "password": PASSWORD})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        if response.status_code == 503:
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+
+async def run(app, token, args) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        email = "storm@example.com"
+        response = await client.post("/api/v1/auth/register", json={
+            "email": email, "password": PASSWORD, "name": "Storm"
+        })
+        response.raise_for_status()
+
+        interval = args.interval_ms / 1000
+        await probe(client, headers, 1.0, interval)  # warm the spatial index
+        quiet = await probe(client, headers, args.duration, interval)
+
+        stop, outcomes = asyncio.Event(), {}
+        storm = [asyncio.create_task(login_loop(client, email, stop, outcomes)) for _ in range(args.storm_clients)]
+        start = time.perf_counter()
+        stormy = await probe(client, headers, args.duration, interval)
+        stop.set()
+        await asyncio.gather(*storm)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "quiet": latency_summary(quiet),
+        "storm": latency_summary(stormy),
+        "logins": {str(code): count for code, count in sorted(outcomes.items())},
+        "logins_per_sec": round(outcomes.get(200, 0) / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=5000)
+    parser.add_argument("--storm-clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per phase")
+    parser.add_argument("--interval-ms", type=float, default=50.0, help="Probe interval")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, token = in_process_app(os.path.join(tmp, "bench.db"), args.hazards, False, args.seed)
+        results = asyncio.run(run(app, token, args))
+        from app.database import async_engine, engine
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+    from app.config import settings
+    write_report({
+        "benchmark": "login_storm",
+        "environment": environment_info(),
+        "storm_clients": args.storm_clients,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "password_hash_workers": settings.PASSWORD_HASH_WORKERS,
+        "results": results,
+        "p99_ratio_storm_vs_quiet": round(
+            results["storm"]["p99_ms"] / max(results["quiet"]["p99_ms"], 1e-6), 2
+        ),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
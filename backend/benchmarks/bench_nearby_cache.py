@@ -0,0 +1,160 @@
+"""
+/nearby read-through cache: hit rate and latency gain
+
+Seeds a temporary SQLite database with N hazards around a city, then
+replays vehicles driving along a fixed set of --roads (straight segments
+through the city) from random starting points, polling /nearby every few
+tens of meters (the handler's query + serialization path via the memory spatial
+engine), with and without the cache. A hazard is inserted (and its cells
+invalidated) every --insert-every polls. Offline; uses FakeRedis unless
+REDIS_URL is set.
+
+    python -m benchmarks.bench_nearby_cache --hazards 20000 --vehicles 200 --polls 30
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from benchmarks.common import configure_offline_env, environment_info, latency_summary, write_report
+
+configure_offline_env()
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models.hazard import Hazard, STATUS_READY  # noqa: E402
+from app.services.hazard_stream import hazard_item  # noqa: E402
+from app.services.nearby_cache import NearbyCache, create_redis_clients  # noqa: E402
+from app.services.spatial_engine import InMemoryQueryEngine  # noqa: E402
+
+CENTER = (28.61, 77.21)
+
+
+def _hazard(lat: float, lon: float) -> Hazard:
+    now = datetime.now(timezone.utc)
+    return Hazard(
+        hazard_id=uuid.uuid4(), user_id=uuid.uuid4(), device_id=uuid.uuid4(),
+        location=f"SRID=4326;POINT({lon} {lat})", latitude=lat, longitude=lon,
+        confidence=0.8, aggregate_confidence=0.8, report_count=1, detected_at=now,
+        last_reported_at=now, status=STATUS_READY, image_url="/media/x.jpg",
+    )
+
+
+def seed(session, count: int, rng: random.Random):
+    batch = []
+    for _ in range(count):
+        batch.append(_hazard(CENTER[0] + rng.gauss(0, 0.1), CENTER[1] + rng.gauss(0, 0.1)))
+        if len(batch) == 5000:
+            session.add_all(batch)
+            session.commit()
+            batch = []
+    session.add_all(batch)
+    session.commit()
+
+
+async def replay(session, spatial, cache, args, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    roads = []
+    for _ in range(args.roads):
+        angle = rng.uniform(0, 3.14159)
+        roads.append((CENTER[0] + rng.uniform(-0.05, 0.05), CENTER[1] + rng.uniform(-0.05, 0.05),
+                      0.0004 * math.sin(angle), 0.0004 * math.cos(angle)))
+    latencies, outcomes = [], {}
+    polls = 0
+    queries = [0]
+    for _ in range(args.vehicles):
+        origin_lat, origin_lon, heading_lat, heading_lon = rng.choice(roads)
+        offset = rng.randint(-200, 200)
+        lat, lon = origin_lat + offset * heading_lat, origin_lon + offset * heading_lon
+        for step in range(args.polls):
+            q_lat, q_lon = lat + step * heading_lat, lon + step * heading_lon
+
+            async def load(lat_, lon_, radius_m, limit):
+                queries[0] += 1
+                return [(hazard_item(h), d) for h, d in spatial.nearby(session, lat_, lon_, radius_m, limit)]
+
+            start = time.perf_counter()
+            if cache is not None:
+                rows, outcome = await cache.lookup(q_lat, q_lon, args.radius_km * 1000, args.limit, load)
+            else:
+                rows, outcome = await load(q_lat, q_lon, args.radius_km * 1000, args.limit), "uncached"
+            [dict(item, distance_km=round(d / 1000, 2)) for item, d in rows]
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+            polls += 1
+            if args.insert_every and polls % args.insert_every == 0:
+                hazard = _hazard(q_lat, q_lon)
+                session.add(hazard)
+                session.commit()
+                spatial.on_insert(hazard)
+                if cache is not None:
+                    await cache.invalidate(q_lat, q_lon)
+    hits = outcomes.get("hit_local", 0) + outcomes.get("hit_redis", 0)
+    return {
+        "latency": latency_summary(latencies),
+        "outcomes": outcomes,
+        "hit_rate": round(hits / max(polls, 1), 4),
+        "database_queries": queries[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=20000)
+    parser.add_argument("--vehicles", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=30)
+    parser.add_argument("--roads", type=int, default=20)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--insert-every", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'nearby.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        session = session_factory()
+        seed(session, args.hazards, random.Random(args.seed))
+
+        spatial = InMemoryQueryEngine(
+            settings.SPATIAL_INDEX_CELL_DEGREES, settings.SPATIAL_INDEX_SYNC_SECONDS, session_factory
+        )
+        uncached = asyncio.run(replay(session, spatial, None, args, args.seed + 1))
+        cache = NearbyCache(
+            *create_redis_clients(), settings.NEARBY_CACHE_LOCAL_ENTRIES,
+            settings.NEARBY_CACHE_TTL_SECONDS, settings.NEARBY_CACHE_PRECISION,
+        settings.NEARBY_CACHE_VERSION_TTL_MS / 1000.0,
+        )
+        cached = asyncio.run(replay(session, spatial, cache, args, args.seed + 1))
+        session.close()
+        engine.dispose()
+
+    write_report({
+        "benchmark": "nearby_cache",
+        "environment": environment_info(),
+        "hazards": args.hazards,
+        "polls": args.vehicles * args.polls,
+        "roads": args.roads,
+        "radius_km": args.radius_km,
+        "limit": args.limit,
+        "redis": bool(settings.REDIS_URL),
+        "uncached": uncached,
+        "cached": cached,
+        "p99_speedup": round(uncached["latency"]["p99_ms"] / max(cached["latency"]["p99_ms"], 1e-6), 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
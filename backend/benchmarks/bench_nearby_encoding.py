@@ -0,0 +1,114 @@
+"""
+/nearby response encoding: serialization time and bytes on the wire
+
+Builds --rows /nearby rows (cached item dicts + distances, as the cache
+hands them to the route) and times turning them into a response body:
+
+    fastapi   dicts returned from the route: jsonable_encoder + JSONResponse
+              (the path before this change)
+    orjson    encode_nearby_json + ORJSONResponse
+    packed    encode_nearby_packed (columnar binary)
+
+Reported per row count: p50/p99 microseconds per response, body bytes and
+gzip bytes (for deployments compressing at the proxy). Offline.
+
+    python -m benchmarks.bench_nearby_encoding --rows 10 100 500
+"""
+
+import argparse
+import gzip
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import configure_offline_env, environment_info, latency_summary, write_report
+
+configure_offline_env()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app.services.hazard_encoding import (  # noqa: E402
+    decode_nearby_packed, encode_nearby_json, encode_nearby_packed
+)
+
+
+def make_rows(count: int, rng: random.Random):
+    """Items shaped like hazard_item() output, with Cloudinary-style URLs"""
+    now = datetime.now(timezone.utc)
+    rows = []
+    for _ in range(count):
+        name = uuid.UUID(int=rng.getrandbits(128))
+        url = f"https://res.cloudinary.com/safar-nexus/image/upload/v1700000000/hazards/{name}"
+        item = {
+            "hazard_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "latitude": 28.61 + rng.gauss(0, 0.02),
+            "longitude": 77.21 + rng.gauss(0, 0.02),
+            "confidence": round(rng.uniform(0.5, 1.0), 3),
+            "timestamp": (now - timedelta(seconds=rng.randint(0, 30 * 86400))).isoformat(),
+            "image_url": f"{url}.jpg",
+            "thumbnail_url": f"{url}_thumbnail.jpg",
+            "medium_url": f"{url}_medium.jpg",
+            "status": "ready",
+            "report_count": rng.randint(1, 20),
+            "aggregate_confidence": round(rng.uniform(0.5, 1.0), 3),
+        }
+        rows.append((item, rng.uniform(0, 5000)))
+    rows.sort(key=lambda row: row[1])
+    return rows
+
+
+ENCODERS = {
+    "fastapi": lambda rows: JSONResponse(jsonable_encoder(
+        {"hazards": [dict(item, distance_km=round(distance / 1000, 2)) for item, distance in rows]}
+    )).body,
+    "orjson": lambda rows: ORJSONResponse(encode_nearby_json(rows)).body,
+    "packed": encode_nearby_packed,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {}
+    for count in args.rows:
+        rows = make_rows(count, rng)
+        decoded = decode_nearby_packed(encode_nearby_packed(rows))
+        assert [d["hazard_id"] for d in decoded] == [item["hazard_id"] for item, _ in rows]
+        per_count = {}
+        for name, encode in ENCODERS.items():
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                body = encode(rows)
+                samples.append((time.perf_counter() - start) * 1e6)
+            latency = latency_summary(samples)
+            per_count[name] = {
+                "p50_us": latency["p50_ms"],  # latency_summary labels; values are microseconds
+                "p99_us": latency["p99_ms"],
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, 6)),
+            }
+        baseline = per_count["fastapi"]
+        for name in ("orjson", "packed"):
+            per_count[name]["speedup"] = round(baseline["p50_us"] / max(per_count[name]["p50_us"], 1e-9), 1)
+            per_count[name]["bytes_ratio"] = round(baseline["bytes"] / per_count[name]["bytes"], 2)
+        results[str(count)] = per_count
+
+    write_report({
+        "benchmark": "nearby_encoding",
+        "environment": environment_info(),
+        "iterations": args.iterations,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Per-stage latency of the privacy pipeline on a fixed sample set
+
+Runs process_image over the same images with different stage lists
+(face only, plate only, face+plate) in both blur modes, and reports the
+p50/p95 of each step (decode, grayscale, each detector, blur, encode), so
+the marginal cost of the plate stage is visible.
+
+    python -m benchmarks.bench_privacy_pipeline --images-dir samples/
+"""
+
+import argparse
+import glob
+import os
+from collections import defaultdict
+
+from benchmarks.common import (
+    configure_offline_env,
+    environment_info,
+    percentile,
+    synthetic_jpeg,
+    write_report,
+)
+
+configure_offline_env()
+
+from app.services import image_service  # noqa: E402
+
+CONFIGURATIONS = ("face", "plate", "face,plate")
+
+
+def _load_samples(images_dir, width, height, count):
+    if images_dir:
+        paths = sorted(
+            p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(images_dir, ext))
+        )
+        samples = []
+        for path in paths:
+            with open(path, "rb") as f:
+                samples.append(f.read())
+        return samples
+    return [synthetic_jpeg(width, height, seed=s) for s in range(count)]
+
+
+def run_configuration(samples, stage_names: str, mode: str, repeats: int) -> dict:
+    image_service.stages = image_service.build_stages(stage_names)
+    timings = defaultdict(list)
+    for _ in range(repeats):
+        for image_bytes in samples:
+            result = image_service.process_image(image_bytes, mode)
+            for step, ms in result.timings.items():
+                timings[step].append(ms)
+            timings["total"].append(sum(result.timings.values()))
+
+    return {
+        step: {"p50_ms": round(percentile(values, 50), 2), "p95_ms": round(percentile(values, 95), 2)}
+        for step, values in timings.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images-dir")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=["accurate", "fast"])
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    samples = _load_samples(args.images_dir, args.width, args.height, args.count)
+    results = {}
+    for mode in args.modes:
+        for stage_names in CONFIGURATIONS:
+            results[f"{mode}:{stage_names}"] = run_configuration(samples, stage_names, mode, args.repeats)
+
+    write_report({
+        "benchmark": "privacy_pipeline",
+        "environment": environment_info(),
+        "samples": len(samples),
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
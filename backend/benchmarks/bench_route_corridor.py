@@ -0,0 +1,159 @@
+"""
+Route corridor: one along_route query vs tiling the route with /nearby
+
+Seeds a temporary SQLite database with --hazards spread over a region plus
+--on-route hazards within a few meters of a --route-km route (a winding
+polyline with a vertex every ~100m). Hazards within --buffer-m of the route
+are then found two ways with the memory spatial engine:
+
+    tiled     what a client does today: /nearby circles of --radius-km
+              every radius along the route (500 rows max each), results
+              de-duplicated client-side
+    corridor  one along_route query (POST /hazards/route)
+
+Reported per mode: wall ms (median of --repeat), queries, rows loaded and
+corridor hazards found (the tiled client still has to filter by distance
+to the route, and loses hazards when a circle hits the 500-row cap). Offline.
+
+    python -m benchmarks.bench_route_corridor --hazards 200000 --route-km 200
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import configure_offline_env, environment_info, write_report
+
+configure_offline_env()
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.services.spatial_engine import InMemoryQueryEngine, route_segments  # noqa: E402
+from app.utils import decode_polyline, encode_polyline  # noqa: E402
+from benchmarks.bench_nearby_cache import CENTER, _hazard  # noqa: E402
+
+NEARBY_MAX_ROWS = 500
+
+
+def make_route(km: float, rng: random.Random):
+    """Winding route from near CENTER, one vertex per ~100m, via a polyline round trip"""
+    points = [CENTER]
+    heading = rng.uniform(0, 2 * math.pi)
+    for _ in range(int(km * 10)):
+        heading += rng.gauss(0, 0.05)
+        lat, lon = points[-1]
+        points.append((lat + 0.0009 * math.cos(heading), lon + 0.0009 * math.sin(heading) / math.cos(math.radians(lat))))
+    return decode_polyline(encode_polyline(points))
+
+
+def seed(session, args, route, rng: random.Random):
+    lats = [lat for lat, _ in route]
+    lons = [lon for _, lon in route]
+    box = (min(lats) - 0.1, max(lats) + 0.1, min(lons) - 0.1, max(lons) + 0.1)
+    batch = []
+    for n in range(args.hazards + args.on_route):
+        if n < args.hazards:
+            lat, lon = rng.uniform(box[0], box[1]), rng.uniform(box[2], box[3])
+        else:
+            lat, lon = rng.choice(route)
+            lat, lon = lat + rng.gauss(0, 0.0001), lon + rng.gauss(0, 0.0001)
+        batch.append(_hazard(lat, lon))
+        if len(batch) == 5000:
+            session.add_all(batch)
+            session.commit()
+            batch = []
+    session.add_all(batch)
+    session.commit()
+
+
+def tile_centers(route, radius_m: float):
+    """Points every radius_m along the route (circles of radius_m overlap and cover it)"""
+    a_lat, a_lon, b_lat, b_lon, lengths, starts = route_segments(route)
+    centers, next_at = [], 0.0
+    for lat0, lon0, lat1, lon1, length, start in zip(a_lat, a_lon, b_lat, b_lon, lengths, starts):
+        while next_at <= start + length:
+            t = (next_at - start) / length if length else 0.0
+            centers.append((lat0 + t * (lat1 - lat0), lon0 + t * (lon1 - lon0)))
+            next_at += radius_m
+    centers.append(route[-1])
+    return centers
+
+
+def run_tiled(engine, session, route, args):
+    centers = tile_centers(route, args.radius_km * 1000)
+    rows, found = 0, {}
+    for lat, lon in centers:
+        hits = engine.nearby(session, lat, lon, args.radius_km * 1000, NEARBY_MAX_ROWS)
+        rows += len(hits)
+        for hazard, _ in hits:
+            found[hazard.hazard_id] = hazard
+    return {"queries": len(centers), "rows": rows}, set(found)
+
+
+def run_corridor(engine, session, route, args):
+    hits = engine.along_route(session, route, args.buffer_m, settings.ROUTE_MAX_RESULTS)
+    return {"queries": 1, "rows": len(hits)}, {hazard.hazard_id for hazard, _, _ in hits}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=int, default=200000, help="Hazards scattered over the region")
+    parser.add_argument("--on-route", type=int, default=1000, help="Hazards placed on the route")
+    parser.add_argument("--route-km", type=float, default=200.0)
+    parser.add_argument("--buffer-m", type=float, default=50.0)
+    parser.add_argument("--radius-km", type=float, default=2.0, help="Tiled mode: /nearby radius")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    route = make_route(args.route_km, rng)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_engine = create_engine(f"sqlite:///{os.path.join(tmp, 'route.db')}")
+        Base.metadata.create_all(bind=db_engine)
+        session_factory = sessionmaker(bind=db_engine)
+        session = session_factory()
+        seed(session, args, route, rng)
+        engine = InMemoryQueryEngine(
+            settings.SPATIAL_INDEX_CELL_DEGREES, settings.SPATIAL_INDEX_SYNC_SECONDS, session_factory
+        )
+        engine.nearby(session, *CENTER, 1.0, 1)  # Initial index load, not timed
+
+        found = {}
+        for mode, runner in (("tiled", run_tiled), ("corridor", run_corridor)):
+            timings = []
+            for _ in range(args.repeat):
+                session.expunge_all()
+                start = time.perf_counter()
+                stats, found[mode] = runner(engine, session, route, args)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[mode] = dict(stats, ms=round(statistics.median(timings), 1))
+        session.close()
+        db_engine.dispose()
+
+    corridor = found["corridor"]
+    results["tiled"]["corridor_found"] = len(found["tiled"] & corridor)
+    results["corridor"]["corridor_found"] = len(corridor)
+    write_report({
+        "benchmark": "route_corridor",
+        "environment": environment_info(),
+        "hazards": args.hazards + args.on_route,
+        "route_km": round(float(route_segments(route)[4].sum()) / 1000, 1),
+        "route_points": len(route),
+        "buffer_m": args.buffer_m,
+        "results": results,
+        "speedup": round(results["tiled"]["ms"] / max(results["corridor"]["ms"], 1e-9), 1),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+In-process spatial index (SPATIAL_ENGINE=memory) latency
+
+Seeds N hazard points (clustered around a few cities, like real reports),
+then times /nearby-style radius queries and k-nearest queries on the grid
+index against a full NumPy haversine scan over all points (what a
+database without PostGIS has to do). Offline.
+
+    python -m benchmarks.bench_spatial_index --points 100000 1000000 --queries 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import configure_offline_env, environment_info, latency_summary, write_report
+
+configure_offline_env()
+
+from app.config import settings  # noqa: E402
+from app.services.spatial_engine import GridIndex, haversine_m_vec  # noqa: E402
+
+CITIES = [(28.61, 77.21), (19.08, 72.88), (12.97, 77.59), (22.57, 88.36), (13.08, 80.27)]
+
+
+def synthetic_points(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = np.asarray(CITIES)[rng.integers(0, len(CITIES), count)]
+    lats = centers[:, 0] + rng.normal(0, 0.15, count)
+    lons = centers[:, 1] + rng.normal(0, 0.15, count)
+    return lats, lons
+
+
+def brute_force(lats, lons, lat, lon, radius_m, limit):
+    distances = haversine_m_vec(lat, lon, lats, lons)
+    rows = np.nonzero(distances <= radius_m)[0]
+    return rows[np.argsort(distances[rows], kind="stable")][:limit]
+
+
+def run(count: int, queries: int, radius_m: float, limit: int, k: int, cell_deg: float, seed: int) -> dict:
+    lats, lons = synthetic_points(count, seed)
+    index = GridIndex(cell_deg)
+    start = time.perf_counter()
+    for i in range(count):
+        index.add(i, lats[i], lons[i])
+    build_seconds = time.perf_counter() - start
+
+    query_lats, query_lons = synthetic_points(queries, seed + 1)
+    radius_ms, knn_ms, scan_ms = [], [], []
+    for lat, lon in zip(query_lats, query_lons):
+        start = time.perf_counter()
+        index.query_radius(lat, lon, radius_m, limit)
+        radius_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        index.nearest(lat, lon, k)
+        knn_ms.append((time.perf_counter() - start) * 1000)
+
+    # The full scan is slow at large N; a sample is enough for its latency
+    for lat, lon in list(zip(query_lats, query_lons))[:min(queries, 200)]:
+        start = time.perf_counter()
+        brute_force(lats, lons, lat, lon, radius_m, limit)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "points": count,
+        "build_seconds": round(build_seconds, 3),
+        "radius_query": latency_summary(radius_ms),
+        "nearest_k": latency_summary(knn_ms),
+        "full_scan": latency_summary(scan_ms),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--cell-deg", type=float, default=settings.SPATIAL_INDEX_CELL_DEGREES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    write_report({
+        "benchmark": "spatial_index",
+        "environment": environment_info(),
+        "radius_km": args.radius_km,
+        "limit": args.limit,
+        "k": args.k,
+        "cell_deg": args.cell_deg,
+        "results": [
+            run(count, args.queries, args.radius_km * 1000, args.limit, args.k, args.cell_deg, args.seed)
+            for count in args.points
+        ],
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Upload throughput per storage backend
+
+For each backend, uploads the same objects sequentially (one blocking
+upload at a time, like the old inline path) and concurrently through the
+async upload_many API, and reports objects/sec and MB/sec. The local
+backend runs offline; gcs/cloudinary use the credentials from .env.
+
+    python -m benchmarks.bench_storage --backends local --objects 200 --size-kb 300
+
+The local backend simulates a --local-latency-ms round trip per upload.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+from benchmarks.common import configure_offline_env, environment_info, write_report
+
+configure_offline_env()
+
+from app.services.storage_backends import create_storage_backend  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+def _objects(count: int, size_kb: int):
+    payload = os.urandom(size_kb * 1024)
+    run_id = uuid.uuid4().hex[:8]
+    return [(payload, f"bench-{run_id}-{i}.jpg") for i in range(count)]
+
+
+def _rate(count: int, total_bytes: int, elapsed: float) -> dict:
+    return {
+        "objects": count,
+        "seconds": round(elapsed, 3),
+        "objects_per_sec": round(count / elapsed, 2),
+        "mb_per_sec": round(total_bytes / elapsed / 1e6, 2),
+    }
+
+
+def run_backend(name: str, count: int, size_kb: int, cleanup: bool) -> dict:
+    backend = create_storage_backend(name)
+    results = {}
+    try:
+        items = _objects(count, size_kb)
+        total_bytes = sum(len(data) for data, _ in items)
+        start = time.perf_counter()
+        for data, filename in items:
+            backend.upload_blocking(data, filename)
+        results["sequential"] = _rate(count, total_bytes, time.perf_counter() - start)
+
+        items_async = _objects(count, size_kb)
+        start = time.perf_counter()
+        asyncio.run(backend.upload_many(items_async))
+        results["concurrent"] = _rate(count, total_bytes, time.perf_counter() - start)
+
+        if cleanup:
+            for _, filename in items + items_async:
+                backend.delete_blocking(filename)
+    finally:
+        backend.close()
+    results["max_concurrency"] = backend.max_concurrency
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", default=["local"])
+    parser.add_argument("--objects", type=int, default=100)
+    parser.add_argument("--size-kb", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=settings.STORAGE_MAX_CONCURRENCY)
+    parser.add_argument("--local-latency-ms", type=int, default=50,
+                        help="Simulated round trip for the local backend")
+    parser.add_argument("--keep", action="store_true", help="Don't delete uploaded objects")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    settings.STORAGE_MAX_CONCURRENCY = args.concurrency
+    settings.LOCAL_STORAGE_LATENCY_MS = args.local_latency_ms
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if settings.LOCAL_STORAGE_DIR == "./media":
+            settings.LOCAL_STORAGE_DIR = tmp
+        for name in args.backends:
+            results[name] = run_backend(name, args.objects, args.size_kb, not args.keep)
+
+    write_report({
+        "benchmark": "storage",
+        "environment": environment_info(),
+        "object_kb": args.size_kb,
+        "local_latency_ms": args.local_latency_ms,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
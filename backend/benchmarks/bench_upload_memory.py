@@ -0,0 +1,228 @@
+"""
+Upload handling: API-process peak RSS under concurrent uploads
+
+Starts the API with uvicorn in a subprocess (temporary SQLite database,
+local storage, one blur worker) and samples the server process's RSS every
+few milliseconds while --concurrency clients POST /api/v1/hazards. Reported
+per scenario: status codes, p50/p99 latency, peak RSS above idle and that
+peak divided by the concurrency (peak RSS per in-flight request).
+
+Scenarios:
+    valid              dashcam-size JPEGs (unique bytes, so no dedup hits)
+    oversized          --oversized-mb bodies with a Content-Length
+    oversized_chunked  the same without a Content-Length (chunked transfer)
+    not_image          image-size bodies that are not JPEG/PNG/WebP
+
+The client runs in this process, so its own buffers are not counted. Needs
+uvicorn (backend requirement) and Linux /proc.
+
+    python -m benchmarks.bench_upload_memory --concurrency 32 --uploads 128
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import environment_info, latency_summary, synthetic_jpeg, write_report
+
+FORM = {
+    "latitude": "28.61", "longitude": "77.21", "confidence": "0.8",
+    "timestamp": "2026-01-01T10:00:00Z", "device_id": "550e8400-e29b-41d4-a716-446655440000",
+}
+
+
+def _rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class RssSampler:
+    """Background thread recording the peak RSS of a process"""
+
+    def __init__(self, pid: int, interval: float = 0.005):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes(self.pid))
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = _rss_bytes(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(tmp: str, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'upload.db')}",
+        JWT_SECRET_KEY="benchmark-only-secret-key-not-for-production",
+        STORAGE_BACKEND="local",
+        LOCAL_STORAGE_DIR=os.path.join(tmp, "media"),
+        SPOOL_DIR=os.path.join(tmp, "spool"),
+        BLUR_WORKERS="1",
+        INGEST_WORKERS="2",  # Fewer concurrent SQLite writers
+        INGEST_MAX_BACKLOG="100000",
+        NEARBY_CACHE_ENABLED="false",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+
+def _multipart(data: bytes, boundary: str):
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in FORM.items()
+    )
+    head += (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+             f"Content-Type: image/jpeg\r\n\r\n").encode()
+    return head, data, f"\r\n--{boundary}--\r\n".encode()
+
+
+async def _chunks(parts, chunk_size: int = 64 * 1024):
+    for part in parts:
+        for i in range(0, len(part), chunk_size):
+            yield part[i:i + chunk_size]
+
+
+async def upload(client, headers, data: bytes, chunked: bool):
+    boundary = uuid.uuid4().hex
+    parts = _multipart(data, boundary)
+    headers = dict(headers, **{"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    content = _chunks(parts) if chunked else b"".join(parts)
+    try:
+        return (await client.post("/api/v1/hazards", headers=headers, content=content)).status_code
+    except httpx.HTTPError:
+        return "error"  # The server may close the connection after an early 413
+
+
+async def run_scenario(base_url, headers, payload, uploads, concurrency, chunked, pid) -> dict:
+    latencies, statuses = [], {}
+    pending = iter(range(uploads))
+
+    async def client_loop(client):
+        for i in pending:
+            start = time.perf_counter()
+            status = await upload(client, headers, payload(i), chunked)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        idle = _rss_bytes(pid)
+        with RssSampler(pid) as sampler:
+            start = time.perf_counter()
+            await asyncio.gather(*[client_loop(client) for _ in range(concurrency)])
+            elapsed = time.perf_counter() - start
+    growth = max(0, sampler.peak - idle)
+    return {
+        "statuses": statuses,
+        "latency": latency_summary(latencies),
+        "uploads_per_sec": round(uploads / elapsed, 2),
+        "idle_rss_mb": round(idle / 2**20, 1),
+        "peak_rss_growth_mb": round(growth / 2**20, 1),
+        "peak_rss_per_request_kb": round(growth / 1024 / concurrency, 1),
+    }
+
+
+async def run(args, base_url, pid) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        response = await client.post("/api/v1/auth/register", json={
+            "email": "upload-bench@example.com", "password": "benchmark-pass", "name": "Bench",
+        })
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+    frame = synthetic_jpeg(args.image_width, args.image_height, seed=args.seed, quality=95)
+    oversized = b"\xff\xd8" + os.urandom(args.oversized_mb * 2**20)
+    junk = os.urandom(len(frame))
+    scenarios = {
+        # Trailing bytes after the JPEG end marker make each upload unique
+        "valid": (lambda i: frame + i.to_bytes(8, "big"), False),
+        "oversized": (lambda i: oversized, False),
+        "oversized_chunked": (lambda i: oversized, True),
+        "not_image": (lambda i: junk, False),
+    }
+    results = {}
+    for name in args.scenarios:
+        payload, chunked = scenarios[name]
+        results[name] = await run_scenario(base_url, headers, payload, args.uploads, args.concurrency,
+                                           chunked, pid)
+    if "valid" in results:
+        results["valid"]["image_bytes"] = len(frame)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--uploads", type=int, default=128, help="Uploads per scenario")
+    parser.add_argument("--image-width", type=int, default=3200)
+    parser.add_argument("--image-height", type=int, default=1800)
+    parser.add_argument("--oversized-mb", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", default=["valid", "oversized", "oversized_chunked", "not_image"],
+                        choices=("valid", "oversized", "oversized_chunked", "not_image"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = _free_port()
+        server = start_server(tmp, port)
+        try:
+            results = asyncio.run(run(args, f"http://127.0.0.1:{port}", server.pid))
+        finally:
+            server.terminate()
+            server.wait(30)
+
+    write_report({
+        "benchmark": "upload_memory",
+        "label": args.label,
+        "environment": environment_info(),
+        "concurrency": args.concurrency,
+        "uploads": args.uploads,
+        "results": results,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Shared helpers for the benchmark scripts
+
+Kept dependency-light: numpy + OpenCV (already backend requirements) for
+synthetic images, httpx for driving a running server.
+"""
+
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+
+def configure_offline_env():
+    """
+    Provide the settings app.config requires so in-process benchmarks can
+    import app modules without a .env file or external services
+    """
+    os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+
+
+def percentile(samples, pct: float) -> float:
+    """Percentile of a list of samples (0.0 when empty)"""
+    if not samples:
+        return 0.0
+    return float(np.percentile(np.asarray(samples, dtype=np.float64), pct))
+
+
+def latency_summary(latencies_ms) -> dict:
+    """p50/p95/p99/mean/max of latencies in milliseconds"""
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(float(np.mean(latencies_ms)), 2) if latencies_ms else 0.0,
+        "max_ms": round(float(np.max(latencies_ms)), 2) if latencies_ms else 0.0,
+    }
+
+
+def synthetic_dashcam_frame(width: int = 1280, height: int = 720, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic BGR frame that looks roughly like a road scene
+
+    Sky/road gradient, lane markings, a dark pothole ellipse and sensor noise
+    so JPEG sizes and decode costs are in the range of real captures.
+    """
+    rng = np.random.default_rng(seed)
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    horizon = height // 3
+    img[:horizon] = np.linspace(200, 150, horizon, dtype=np.uint8)[:, None, None]
+    img[horizon:] = np.linspace(90, 60, height - horizon, dtype=np.uint8)[:, None, None]
+    cv2.line(img, (width // 2, horizon), (width // 2, height), (220, 220, 220), 8)
+    cx = int(rng.integers(width // 4, 3 * width // 4))
+    cy = int(rng.integers(horizon + 50, height - 50))
+    cv2.ellipse(img, (cx, cy), (90, 35), 0, 0, 360, (25, 25, 30), -1)
+    noise = rng.normal(0, 12, img.shape)
+    return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+def synthetic_jpeg(width: int = 1280, height: int = 720, seed: int = 0, quality: int = 90) -> bytes:
+    """JPEG bytes of synthetic_dashcam_frame()"""
+    ok, buf = cv2.imencode(".jpg", synthetic_dashcam_frame(width, height, seed),
+                           [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("Failed to encode synthetic frame")
+    return buf.tobytes()
+
+
+def environment_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def write_report(report: dict, output: str = None):
+    """Print report as JSON and optionally write it to a file"""
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+
+# Metrics where a larger value is an improvement (the rest: smaller is better)
+HIGHER_IS_BETTER = {"requests_per_sec", "uploads_per_sec", "ingested_per_sec"}
+
+
+def compare_reports(before_path: str, after_path: str, keys=("p50_ms", "p99_ms"),
+                    max_regression_pct: float = None) -> list:
+    """
+    Print a before/after table for two JSON reports with matching 'results'.
+    With max_regression_pct, returns the (scenario, metric, change %) that got
+    worse by more than that.
+    """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    regressions = []
+    print(f"{'scenario':<28}{'metric':<20}{'before':>12}{'after':>12}{'change':>10}")
+    for name, b in before["results"].items():
+        a = after["results"].get(name)
+        if a is None:
+            continue
+        for key in keys:
+            if b.get(key) is None or a.get(key) is None:
+                continue
+            change = (a[key] - b[key]) / b[key] * 100 if b[key] else 0.0
+            worse = -change if key in HIGHER_IS_BETTER else change
+            flag = ""
+            if max_regression_pct is not None and worse > max_regression_pct:
+                regressions.append((name, key, round(change, 1)))
+                flag = "  REGRESSION"
+            print(f"{name:<28}{key:<20}{b[key]:>12.2f}{a[key]:>12.2f}{change:>9.1f}%{flag}")
+    return regressions
@@ -0,0 +1,246 @@
+"""
+Seeded synthetic hazard datasets for the benchmarks
+
+Builds a database with --hazards reports (10k to 10M) and --users accounts,
+the same for a given --seed: hazards clustered around Indian cities (plus a
+share spread over the country's roads), a --duplicate-fraction of them
+being repeat reports of a canonical hazard (canonical_id, report_count and
+aggregate_confidence as clustering would have set them), detection times
+spread over --days, all processed (status ready). The schema comes from
+the alembic migrations and the map tile aggregates are built, so a server
+started on the database has nothing to catch up on.
+
+A JSON manifest describes the dataset for the load generator: the seed
+users' credentials and a sample of hazard ids. SQLite datasets are cached
+by size and seed under --data-dir (cached_dataset); for PostgreSQL, point
+--database-url at an empty database.
+
+    python -m benchmarks.datasets --hazards 1m --output data/hazards-1m.db
+    python -m benchmarks.datasets --hazards 10m --database-url postgresql://... --manifest pg-10m.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+# Bump when the generated rows change, so cached datasets are rebuilt
+DATASET_VERSION = 1
+
+PASSWORD = "benchmark-pass"
+EMAIL_FORMAT = "bench-user-{}@example.com"
+SAMPLE_IDS = 2000
+
+# (latitude, longitude, weight): where reports concentrate
+CITIES = (
+    (28.61, 77.21, 0.22),  # Delhi
+    (19.07, 72.88, 0.18),  # Mumbai
+    (12.97, 77.59, 0.14),  # Bengaluru
+    (13.08, 80.27, 0.10),  # Chennai
+    (22.57, 88.36, 0.10),  # Kolkata
+    (17.39, 78.49, 0.10),  # Hyderabad
+    (18.52, 73.86, 0.08),  # Pune
+    (23.02, 72.57, 0.08),  # Ahmedabad
+)
+CITY_SPREAD_DEG = 0.08  # Standard deviation around a city center (~9 km)
+RURAL_FRACTION = 0.1
+INDIA_BOUNDS = (8.0, 30.0, 70.0, 88.0)  # min lat, max lat, min lon, max lon
+DUPLICATE_SPREAD_DEG = 0.0001  # Repeat reports land within ~10 m of their hazard
+
+
+def parse_count(value: str) -> int:
+    """'10k', '2.5m', '10M' or '20000' -> int"""
+    value = str(value).strip().lower()
+    scale = {"k": 10**3, "m": 10**6}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def _uuids(rng: np.random.Generator, n: int):
+    raw = rng.bytes(16 * n)
+    return [uuid.UUID(bytes=raw[i:i + 16], version=4) for i in range(0, 16 * n, 16)]
+
+
+def _points(rng: np.random.Generator, n: int):
+    """Latitudes and longitudes of n hazards"""
+    weights = np.array([city[2] for city in CITIES])
+    centers = np.array([city[:2] for city in CITIES])[rng.choice(len(CITIES), n, p=weights / weights.sum())]
+    points = centers + rng.normal(0, CITY_SPREAD_DEG, (n, 2))
+    rural = rng.random(n) < RURAL_FRACTION
+    min_lat, max_lat, min_lon, max_lon = INDIA_BOUNDS
+    points[rural, 0] = rng.uniform(min_lat, max_lat, rural.sum())
+    points[rural, 1] = rng.uniform(min_lon, max_lon, rural.sum())
+    return points[:, 0], points[:, 1]
+
+
+def hazard_rows(rng, n: int, user_ids, now: datetime, days: float, duplicate_fraction: float):
+    """
+    Rows of n hazards: (canonical rows, duplicate rows). Duplicates point at a
+    canonical row of the same call, whose aggregates include them.
+    """
+    from app.config import settings
+    from app.models.hazard import STATUS_READY
+    from app.utils import geohash_encode
+
+    duplicates = int(n * duplicate_fraction)
+    canonicals = n - duplicates
+    parents = rng.integers(0, canonicals, duplicates)
+    lats, lons = _points(rng, canonicals)
+    dup_lats = lats[parents] + rng.normal(0, DUPLICATE_SPREAD_DEG, duplicates)
+    dup_lons = lons[parents] + rng.normal(0, DUPLICATE_SPREAD_DEG, duplicates)
+    confidence = rng.uniform(0.5, 0.99, n).round(3)
+    age = rng.uniform(0, days * 86400, n)
+
+    # What clustering would have folded into each canonical hazard
+    report_count = 1 + np.bincount(parents, minlength=canonicals)
+    survival = 1 - confidence[:canonicals]
+    np.multiply.at(survival, parents, 1 - confidence[canonicals:])
+    newest = age[:canonicals].copy()
+    np.minimum.at(newest, parents, age[canonicals:])
+
+    ids = _uuids(rng, n)
+    devices = _uuids(rng, n)
+    owners = rng.integers(0, len(user_ids), n)
+
+    def row(i, lat, lon, canonical_id, count, aggregate, last_age):
+        detected_at = now - timedelta(seconds=float(age[i]))
+        image = f"/media/seed/{ids[i].hex}"
+        return {
+            "hazard_id": ids[i], "user_id": user_ids[owners[i]], "device_id": devices[i],
+            "hazard_type": "pothole", "location": f"SRID=4326;POINT({lon} {lat})",
+            "latitude": float(lat), "longitude": float(lon), "confidence": float(confidence[i]),
+            "image_url": f"{image}.jpg", "thumbnail_url": f"{image}_thumbnail.jpg",
+            "medium_url": f"{image}_medium.jpg", "detected_at": detected_at,
+            "updated_at": now - timedelta(seconds=float(last_age)), "status": STATUS_READY,
+            "processing_attempts": 1, "canonical_id": canonical_id,
+            "geohash": geohash_encode(float(lat), float(lon), settings.CLUSTER_GEOHASH_PRECISION),
+            "report_count": int(count), "aggregate_confidence": aggregate,
+            "last_reported_at": now - timedelta(seconds=float(last_age)),
+        }
+
+    canonical_rows = [
+        row(i, lats[i], lons[i], None, report_count[i], round(float(1 - survival[i]), 4), newest[i])
+        for i in range(canonicals)
+    ]
+    duplicate_rows = [
+        row(canonicals + j, dup_lats[j], dup_lons[j], ids[parents[j]], 1, None, age[canonicals + j])
+        for j in range(duplicates)
+    ]
+    return canonical_rows, duplicate_rows
+
+
+def build(hazards: int, seed: int, users: int, days: float, duplicate_fraction: float,
+          chunk_size: int = 50000, log=print) -> dict:
+    """Seed the configured DATABASE_URL (empty); returns the manifest"""
+    from app.database import SessionLocal, engine, upgrade_schema
+    from app.models.hazard import Hazard
+    from app.models.user import User
+    from app.services.auth_service import hash_password
+    from app.services.tile_service import record_hazards
+
+    started = time.perf_counter()
+    upgrade_schema()
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    user_ids = _uuids(rng, users)
+    password_hash = hash_password(PASSWORD)  # One bcrypt hash for every seed user
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"user_id": user_id, "email": EMAIL_FORMAT.format(i), "password_hash": password_hash,
+             "name": f"Benchmark {i}", "token_version": 0}
+            for i, user_id in enumerate(user_ids)
+        ])
+
+    sample = []
+    done = 0
+    while done < hazards:
+        n = min(chunk_size, hazards - done)
+        canonical_rows, duplicate_rows = hazard_rows(rng, n, user_ids, now, days, duplicate_fraction)
+        db = SessionLocal()
+        try:
+            db.connection().execute(Hazard.__table__.insert(), canonical_rows)
+            if duplicate_rows:
+                db.connection().execute(Hazard.__table__.insert(), duplicate_rows)
+            # Map tile aggregates as inserts keep them (memory bounded by the chunk)
+            record_hazards(db, [SimpleNamespace(**row) for row in canonical_rows])
+            db.commit()
+        finally:
+            db.close()
+        # Detail lookups draw from every chunk in proportion
+        picks = rng.choice(len(canonical_rows), min(len(canonical_rows), -(-SAMPLE_IDS * n // hazards)),
+                           replace=False)
+        sample.extend(str(canonical_rows[i]["hazard_id"]) for i in picks)
+        done += n
+        log(f"{done}/{hazards} hazards ({time.perf_counter() - started:.0f}s)")
+
+    engine.dispose()
+    return {
+        "version": DATASET_VERSION,
+        "hazards": hazards,
+        "seed": seed,
+        "users": users,
+        "email_format": EMAIL_FORMAT,
+        "password": PASSWORD,
+        "days": days,
+        "duplicate_fraction": duplicate_fraction,
+        "centers": [city[:2] for city in CITIES],
+        "city_spread_deg": CITY_SPREAD_DEG,
+        "sample_hazard_ids": sample[:SAMPLE_IDS],
+        "build_seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def cached_dataset(hazards: int, seed: int, data_dir: str) -> tuple:
+    """
+    (SQLite path, manifest) of the default dataset for a size and seed,
+    built on first use (in a subprocess: app settings are read at import)
+    """
+    name = os.path.join(os.path.abspath(data_dir), f"hazards-{hazards}-seed{seed}-v{DATASET_VERSION}")
+    path, manifest_path = f"{name}.db", f"{name}.json"
+    if not os.path.exists(manifest_path):
+        for stale in (path, f"{path}.tmp"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.datasets", "--hazards", str(hazards), "--seed", str(seed),
+             "--output", f"{path}.tmp", "--manifest", manifest_path],
+            check=True,
+        )
+        os.replace(f"{path}.tmp", path)
+    with open(manifest_path) as f:
+        return path, json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hazards", type=parse_count, default=parse_count("10k"), help="e.g. 10k, 1m, 10m")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=float, default=180.0, help="Detection times spread over this many days")
+    parser.add_argument("--duplicate-fraction", type=float, default=0.2)
+    parser.add_argument("--output", help="SQLite database file to create")
+    parser.add_argument("--database-url", help="Empty database to seed instead (e.g. PostgreSQL)")
+    parser.add_argument("--manifest", help="Manifest path (default: next to --output)")
+    args = parser.parse_args()
+    if bool(args.output) == bool(args.database_url):
+        parser.error("pass one of --output or --database-url")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.abspath(args.output)}"
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+    manifest = build(args.hazards, args.seed, args.users, args.days, args.duplicate_fraction)
+    manifest_path = args.manifest or f"{os.path.splitext(args.output)[0]}.json"
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Manifest written to {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+# Settings app.config requires, so tests import app modules without a .env
+# file. Database tests run on a throwaway SQLite file (in-memory spatial
+# index, in-process Redis stand-in) unless TEST_DATABASE_URL says otherwise.
+_TMP_DIR = tempfile.mkdtemp(prefix="safar-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{_TMP_DIR}/test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test-only-secret-key-not-for-production")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(_TMP_DIR, "media")
+os.environ["SPOOL_DIR"] = os.path.join(_TMP_DIR, "spool")
+os.environ.pop("REDIS_URL", None)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def schema():
+    from app.database import upgrade_schema
+    upgrade_schema()
+
+
+def _reset_state():
+    """Empty every table and drop the process-wide caches built on their rows"""
+    from app.database import Base, engine
+    from app.models.hazard import hazards_archive
+    from app.services import auth_cache, nearby_cache, spatial_engine
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+        conn.execute(hazards_archive.delete())
+    spatial_engine._engine = None
+    nearby_cache._cache = None
+    auth_cache._cache = None
+
+
+@pytest.fixture
+def db(schema):
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        _reset_state()
+
+
+@pytest.fixture
+def run_async(db):
+    """Run a coroutine on a fresh event loop (the async engine's pool is reset after)"""
+    from app.database import async_engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def user(db):
+    from app.models.user import User
+
+    account = User(email=f"{uuid.uuid4().hex[:12]}@example.com", password_hash="x", name="Test")
+    db.add(account)
+    db.commit()
+    return account
+
+
+@pytest.fixture
+def auth_headers(user):
+    from app.services.auth_service import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': str(user.user_id)})}"}
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """API client without the background workers (uploads stay pending)"""
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    for name in ("blur_engine", "ingestion_pool", "retention_job"):
+        monkeypatch.setattr(getattr(main, name), "start", lambda: None)
+    monkeypatch.setattr(main, "recover_pending_hazards", lambda: 0)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_hazard(db, user):
+    """Build a canonical, processed Hazard (not added to the session)"""
+    from app.config import settings
+    from app.models.hazard import STATUS_READY, Hazard
+    from app.utils import geohash_encode
+
+    def make(latitude, longitude, detected_at=None, **fields):
+        detected_at = detected_at or datetime.now(timezone.utc)
+        values = dict(
+            hazard_id=uuid.uuid4(), user_id=user.user_id, device_id=uuid.uuid4(), hazard_type="pothole",
+            location=f"SRID=4326;POINT({longitude} {latitude})", latitude=latitude, longitude=longitude,
+            confidence=0.8, detected_at=detected_at, status=STATUS_READY, processing_attempts=0,
+            geohash=geohash_encode(latitude, longitude, settings.CLUSTER_GEOHASH_PRECISION),
+            report_count=1, aggregate_confidence=0.8, last_reported_at=detected_at,
+        )
+        values.update(fields)
+        return Hazard(**values)
+
+    return make
@@ -0,0 +1,57 @@
+"""Token authentication: the verified-token cache and logout-all revocation"""
+
+import pytest
+from sqlalchemy import update
+
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.services.auth_cache import InvalidToken, RevocationList, TokenCache
+from app.services.auth_service import create_user_token
+
+NEARBY = "/api/v1/hazards/nearby?latitude=28.61&longitude=77.21"
+
+
+def _bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_all_revokes_cached_tokens(client, user):
+    phone, car = create_user_token(user), create_user_token(user)
+    assert client.get(NEARBY, headers=_bearer(phone)).status_code == 200
+    assert client.get(NEARBY, headers=_bearer(car)).status_code == 200  # Both now cached
+
+    assert client.post("/api/v1/auth/logout-all", headers=_bearer(phone)).status_code == 204
+
+    for token in (phone, car):
+        response = client.get(NEARBY, headers=_bearer(token))
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token revoked"
+
+
+def test_tokens_issued_after_logout_all_are_valid(client, db, user):
+    old = create_user_token(user)
+    client.post("/api/v1/auth/logout-all", headers=_bearer(old))
+    db.refresh(user)
+
+    assert user.token_version == 1
+    assert client.get(NEARBY, headers=_bearer(create_user_token(user))).status_code == 200
+    assert client.get(NEARBY, headers=_bearer(old)).status_code == 401
+
+
+@pytest.mark.parametrize("mode", ["stateless", "database"])
+def test_other_processes_pick_up_a_logout_all_on_their_next_sync(db, user, run_async, mode):
+    token = create_user_token(user)
+    # Another worker's cache: syncs on every request
+    other = TokenCache(16, 300, mode, RevocationList(sync_seconds=0))
+
+    async def logout_all_elsewhere_then_authenticate():
+        async with AsyncSessionLocal() as session:
+            assert (await other.authenticate(token, session)).user_id == user.user_id
+            await session.execute(
+                update(User).where(User.user_id == user.user_id).values(token_version=User.token_version + 1)
+            )
+            await session.commit()
+            with pytest.raises(InvalidToken, match="revoked"):
+                await other.authenticate(token, session)
+
+    run_async(logout_all_elsewhere_then_authenticate())
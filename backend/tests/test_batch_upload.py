@@ -0,0 +1,81 @@
+"""POST /hazards/batch: invalid items are rejected one by one, the rest stored"""
+
+import json
+import os
+import uuid
+
+import cv2
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.hazard import STATUS_PENDING, Hazard
+from app.services.ingestion_service import ingestion_pool
+
+BATCH = "/api/v1/hazards/batch"
+
+
+def _jpeg(seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    return cv2.imencode(".jpg", pixels)[1].tobytes()
+
+
+def _entry(client_ref, **fields):
+    entry = dict(latitude=28.61, longitude=77.21, confidence=0.8, timestamp="2026-10-18T10:00:00Z",
+                 device_id=str(uuid.uuid4()), client_ref=client_ref)
+    entry.update(fields)
+    return entry
+
+
+def _post(client, headers, entries, images):
+    files = [("images", (f"{n}.jpg", data, "image/jpeg")) for n, data in enumerate(images)]
+    return client.post(BATCH, headers=headers, data={"metadata": json.dumps(entries)}, files=files)
+
+
+@pytest.fixture(autouse=True)
+def queued(monkeypatch):
+    hazard_ids = []
+    monkeypatch.setattr(ingestion_pool, "submit", hazard_ids.append)
+    return hazard_ids
+
+
+def test_invalid_items_are_rejected_and_the_rest_stored(client, auth_headers, db, queued):
+    entries = [
+        _entry("ok-1"),
+        _entry("bad-confidence", confidence=1.5),
+        _entry("not-an-image"),
+        "not an object",
+        _entry("ok-2", latitude=28.70),
+    ]
+    images = [_jpeg(0), _jpeg(1), b"GIF89a not supported", _jpeg(2), _jpeg(3)]
+
+    response = _post(client, auth_headers, entries, images)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["rejected"]) == (2, 3)
+    results = body["results"]
+    assert [r["index"] for r in results] == list(range(5))
+    assert [r["result"] for r in results] == ["created", "rejected", "rejected", "rejected", "created"]
+    assert [r["client_ref"] for r in results] == ["ok-1", "bad-confidence", "not-an-image", None, "ok-2"]
+    assert "confidence" in results[1]["error"]
+    assert "format" in results[2]["error"]
+
+    created = [uuid.UUID(results[i]["hazard_id"]) for i in (0, 4)]
+    assert {hazard.hazard_id for hazard in db.query(Hazard)} == set(created)
+    assert all(results[i]["status"] == STATUS_PENDING for i in (0, 4))
+    assert queued == created
+
+
+def test_rejected_uploads_leave_no_spool_files(client, auth_headers):
+    before = set(os.listdir(settings.SPOOL_DIR)) if os.path.isdir(settings.SPOOL_DIR) else set()
+    response = _post(client, auth_headers, [_entry("empty"), _entry("bad", confidence=-1)], [b"", _jpeg()])
+
+    assert response.json()["created"] == 0
+    assert [r["result"] for r in response.json()["results"]] == ["rejected", "rejected"]
+    assert set(os.listdir(settings.SPOOL_DIR)) - before == set()
+
+
+def test_image_count_must_match_the_metadata(client, auth_headers):
+    response = _post(client, auth_headers, [_entry("a"), _entry("b")], [_jpeg()])
+    assert response.status_code == 400
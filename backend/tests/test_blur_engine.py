@@ -0,0 +1,54 @@
+"""Blur engine: per-image errors, bounded waits and saturation (no worker processes started)"""
+
+import pytest
+
+from app.config import settings
+from app.services import blur_engine as blur_engine_module
+from app.services.blur_engine import BlurEngine, _blur_batch, blur_engine
+
+
+def _engine(**options):
+    """An engine accepting images but never dispatching them"""
+    engine = BlurEngine(**{"num_workers": 1, "queue_size": 8, "batch_size": 4, "batch_wait_ms": 0, **options})
+    engine._running = True
+    return engine
+
+
+def test_any_image_error_fails_only_that_image(monkeypatch):
+    def process(image, derivatives):
+        if image == b"crash":
+            raise RuntimeError("cv2 error")
+        return image
+    monkeypatch.setattr(blur_engine_module, "_process", process)
+
+    assert _blur_batch([b"ok", b"crash", b"ok"]) == [(True, b"ok"), (False, "cv2 error"), (True, b"ok")]
+
+
+def test_process_waits_a_bounded_time_for_the_result(monkeypatch):
+    monkeypatch.setattr(settings, "BLUR_RESULT_TIMEOUT_SECONDS", 0.05)
+
+    with pytest.raises(TimeoutError, match="not blurred within"):
+        _engine().process(b"image")
+
+
+def test_saturated_at_saturation_depth_before_the_queue_fills():
+    engine = _engine(saturation_depth=3)
+    for _ in range(2):
+        engine.submit(b"image")
+    assert not engine.saturated
+
+    engine.submit(b"image")
+    assert engine.saturated and not engine._queue.full()
+
+
+def test_batch_held_for_an_inflight_slot_still_counts():
+    engine = _engine(saturation_depth=3)
+    engine.submit(b"image")
+    engine._held = 2  # The dispatcher took a batch and waits for the pool
+
+    assert engine.queue_depth == 3 and engine.saturated
+
+
+def test_ingestion_workers_can_saturate_the_shared_engine():
+    # Each ingestion worker waits for its image: no more than INGEST_WORKERS ever queue
+    assert blur_engine.saturation_depth <= settings.INGEST_WORKERS
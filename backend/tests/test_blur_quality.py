@@ -0,0 +1,112 @@
+"""
+Privacy blur quality gate on a committed fixture
+
+tests/fixtures/privacy_scene.jpg (1600x1200, synthetic road texture) holds a
+frontal face and a license plate the Haar cascades detect, at known boxes.
+Every blur path must find both (recall) and obscure their detail: the
+Laplacian of a blurred box must no longer correlate with the original's.
+"""
+
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.services import image_service
+from app.services.image_service import BLUR_MODE_ACCURATE, BLUR_MODE_FAST, Frame, OnnxDetectorStage
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "privacy_scene.jpg")
+FACE_BOX = (342, 442, 156, 169)  # Eyes to mouth
+PLATE_BOX = (1050, 800, 320, 70)
+KNOWN_BOXES = {"face": [FACE_BOX], "plate": [PLATE_BOX]}
+
+MIN_RECALL = 0.95
+MIN_COVERAGE = 0.8  # Share of a known box a detected region must cover
+MAX_DETAIL_CORRELATION = 0.5  # An untouched region correlates at ~1.0
+
+
+@pytest.fixture(scope="module")
+def image_bytes():
+    with open(FIXTURE, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def original(image_bytes):
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _coverage(ref_box, boxes) -> float:
+    """Fraction of ref_box area covered by the union of boxes"""
+    x, y, w, h = ref_box
+    mask = np.zeros((h, w), dtype=bool)
+    for bx, by, bw, bh in boxes:
+        x0, y0 = max(bx, x) - x, max(by, y) - y
+        x1, y1 = min(bx + bw, x + w) - x, min(by + bh, y + h) - y
+        if x1 > x0 and y1 > y0:
+            mask[y0:y1, x0:x1] = True
+    return float(mask.mean())
+
+
+def _recall(regions) -> float:
+    found = [box for boxes in regions.values() for box in boxes]
+    known = [box for boxes in KNOWN_BOXES.values() for box in boxes]
+    return sum(1 for box in known if _coverage(box, found) >= MIN_COVERAGE) / len(known)
+
+
+def _detail_correlation(original, blurred, box) -> float:
+    x, y, w, h = box
+    before, after = (
+        cv2.Laplacian(cv2.cvtColor(img[y:y+h, x:x+w], cv2.COLOR_BGR2GRAY), cv2.CV_64F).ravel()
+        for img in (original, blurred)
+    )
+    return float(np.corrcoef(before, after)[0, 1])
+
+
+def _assert_blurred(original, data, boxes):
+    blurred = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert blurred.shape == original.shape
+    for box in boxes:
+        assert _detail_correlation(original, blurred, box) < MAX_DETAIL_CORRELATION, box
+
+
+@pytest.mark.parametrize("mode", [BLUR_MODE_ACCURATE, BLUR_MODE_FAST])
+def test_recall(image_bytes, mode):
+    result = image_service.process_image(image_bytes, mode)
+    assert _recall(result.regions) >= MIN_RECALL, result.regions
+
+
+def test_fast_face_recall_matches_accurate(original):
+    gray = cv2.cvtColor(original, cv2.COLOR_BGR2GRAY)
+    for mode in (BLUR_MODE_ACCURATE, BLUR_MODE_FAST):
+        assert _coverage(FACE_BOX, image_service.detect_faces(gray, mode)) >= MIN_COVERAGE, mode
+
+
+def test_accurate_blurs_known_boxes(image_bytes, original):
+    result = image_service.process_image(image_bytes, BLUR_MODE_ACCURATE)
+    assert not result.passthrough
+    _assert_blurred(original, result.data, [FACE_BOX, PLATE_BOX])
+
+
+@pytest.mark.parametrize("blur_filter", ["pixelate", "box", "gaussian"])
+def test_fast_blurs_known_boxes(image_bytes, original, monkeypatch, blur_filter):
+    monkeypatch.setattr(settings, "BLUR_FAST_FILTER", blur_filter)
+    result = image_service.process_image(image_bytes, BLUR_MODE_FAST)
+    assert not result.passthrough
+    _assert_blurred(original, result.data, [FACE_BOX, PLATE_BOX])
+
+
+@pytest.mark.skipif(not settings.PLATE_ONNX_MODEL_PATH, reason="PLATE_ONNX_MODEL_PATH is not set")
+@pytest.mark.parametrize("mode", [BLUR_MODE_ACCURATE, BLUR_MODE_FAST])
+def test_onnx_plate_stage_blurs_plate(image_bytes, original, monkeypatch, mode):
+    stage = OnnxDetectorStage(
+        "plate", settings.PLATE_ONNX_MODEL_PATH, settings.PLATE_ONNX_INPUT_SIZE,
+        settings.PLATE_ONNX_SCORE_THRESHOLD,
+    )
+    assert _coverage(PLATE_BOX, stage.detect(Frame(original.copy()), mode)) >= MIN_COVERAGE
+
+    monkeypatch.setattr(image_service, "stages", [stage])
+    result = image_service.process_image(image_bytes, mode)
+    _assert_blurred(original, result.data, [PLATE_BOX])
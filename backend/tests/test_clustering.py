@@ -0,0 +1,112 @@
+"""Duplicate-report clustering: nearest-candidate selection and in-batch merges"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import inspect
+
+from app.config import settings
+from app.models.hazard import Hazard
+from app.services.clustering_service import assign_batch_to_clusters
+
+LAT, LON = 28.6139, 77.2090
+METER = 1 / 111195  # Degrees of latitude per meter
+
+
+def _report(make_hazard, offset_m=0.0, **fields):
+    """A new, not yet clustered report offset_m meters north of (LAT, LON)"""
+    return make_hazard(LAT + offset_m * METER, LON, geohash=None, report_count=None,
+                       aggregate_confidence=None, last_reported_at=None, **fields)
+
+
+def test_picks_nearest_canonical(db, make_hazard):
+    far, near = make_hazard(LAT + 15 * METER, LON), make_hazard(LAT + 4 * METER, LON)
+    db.add_all([far, near])
+    db.commit()
+
+    report = _report(make_hazard)
+    [canonical] = assign_batch_to_clusters(db, [report])
+
+    assert canonical.hazard_id == near.hazard_id
+    assert report.canonical_id == near.hazard_id
+
+
+def test_other_types_do_not_crowd_out_the_match(db, make_hazard, monkeypatch):
+    monkeypatch.setattr(settings, "CLUSTER_MAX_CANDIDATES", 2)
+    now = make_hazard(LAT, LON).detected_at
+    match = make_hazard(LAT + 10 * METER, LON, detected_at=now - timedelta(days=2))
+    # Nearer and more recently reported, but of another type
+    others = [make_hazard(LAT + i * METER, LON, hazard_type="speed_bump") for i in range(1, 6)]
+    db.add_all([match, *others])
+    db.commit()
+
+    report = _report(make_hazard)
+    assign_batch_to_clusters(db, [report])
+
+    assert report.canonical_id == match.hazard_id
+
+
+def test_merges_into_existing_canonical(db, make_hazard):
+    canonical = make_hazard(LAT, LON, confidence=0.5, aggregate_confidence=0.5)
+    db.add(canonical)
+    db.commit()
+
+    reports = [_report(make_hazard, 3, confidence=0.5), _report(make_hazard, 6, confidence=0.5)]
+    canonicals = assign_batch_to_clusters(db, reports)
+
+    # The loaded canonical carries the UPDATE's RETURNING values, no refresh needed
+    assert canonicals == [canonical, canonical]
+    assert "report_count" not in inspect(canonical).expired_attributes
+    assert canonical.report_count == 3
+    assert canonical.aggregate_confidence == pytest.approx(1 - 0.5 ** 3)
+    assert canonical.last_reported_at >= canonical.detected_at
+
+    db.add_all(reports)
+    db.commit()
+    db.refresh(canonical)
+    assert canonical.report_count == 3
+    assert {report.canonical_id for report in reports} == {canonical.hazard_id}
+
+
+def test_reports_in_a_batch_merge_with_each_other(db, make_hazard):
+    first = _report(make_hazard, 0, confidence=0.6)
+    second = _report(make_hazard, 5, confidence=0.5, detected_at=first.detected_at + timedelta(minutes=1))
+    elsewhere = _report(make_hazard, 500)
+
+    canonicals = assign_batch_to_clusters(db, [second, first, elsewhere])
+
+    # The earliest report starts the cluster, whatever the input order
+    assert [c.hazard_id for c in canonicals] == [first.hazard_id, first.hazard_id, elsewhere.hazard_id]
+    assert second.canonical_id == first.hazard_id
+    assert first.canonical_id is None and elsewhere.canonical_id is None
+    assert first.report_count == 2
+    assert first.aggregate_confidence == pytest.approx(1 - 0.4 * 0.5)
+    assert first.last_reported_at == second.last_reported_at
+
+
+def test_outside_radius_or_window_starts_a_cluster(db, make_hazard):
+    stale = make_hazard(LAT, LON)
+    stale.last_reported_at -= timedelta(hours=settings.CLUSTER_WINDOW_HOURS + 1)
+    distant = make_hazard(LAT + (settings.CLUSTER_RADIUS_M + 5) * METER, LON)
+    db.add_all([stale, distant])
+    db.commit()
+
+    report = _report(make_hazard)
+    [canonical] = assign_batch_to_clusters(db, [report])
+
+    assert canonical is report
+    assert report.canonical_id is None
+    assert db.query(Hazard).filter(Hazard.hazard_id.in_([stale.hazard_id, distant.hazard_id]),
+                                   Hazard.report_count == 1).count() == 2
+
+
+def test_disabled_keeps_every_report_canonical(db, make_hazard, monkeypatch):
+    monkeypatch.setattr(settings, "CLUSTERING_ENABLED", False)
+    db.add(make_hazard(LAT, LON))
+    db.commit()
+
+    report = _report(make_hazard)
+    assert assign_batch_to_clusters(db, [report]) == [report]
+    assert report.canonical_id is None
+    assert isinstance(report.hazard_id, uuid.UUID)
@@ -0,0 +1,61 @@
+"""Image dedup index: alias resolution, near-duplicate candidates and alias inserts"""
+
+from app.config import settings
+from app.models.image_object import ImageObject
+from app.services import dedup_service
+from app.services.dedup_service import add_alias, add_reference, find_blurred, find_exact, find_exact_many, find_near
+
+
+def _stored(db, raw_hash, dhash_value=0, ref_count=1, blurred_hash=None):
+    obj = ImageObject(**dedup_service._fields(raw_hash, blurred_hash or f"blurred-{raw_hash}", dhash_value,
+                                              f"/media/{raw_hash}.jpg", None, None, ref_count))
+    db.add(obj)
+    db.commit()
+    return obj
+
+
+def test_exact_hit_on_an_alias_references_the_stored_object(db):
+    obj = _stored(db, "a" * 64)
+    add_alias(db, "b" * 64, 0, obj)
+    db.commit()
+
+    hit = find_exact(db, "b" * 64)
+    assert hit is obj
+    assert find_exact_many(db, ["a" * 64, "b" * 64]) == {"a" * 64: obj, "b" * 64: obj}
+
+    add_reference(db, hit)
+    db.commit()
+    assert db.get(ImageObject, "a" * 64).ref_count == 2
+    assert db.get(ImageObject, "b" * 64).ref_count == 0
+    assert find_blurred(db, obj.blurred_hash) is obj
+
+
+def test_near_candidates_keep_the_most_used_objects(db, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_MAX_CANDIDATES", 1)
+    # Same dHash bands, so both are candidates; only one survives the cut
+    for raw_hash, refs in (("0" * 64, 1), ("f" * 64, 5), ("1" * 64, 2)):
+        _stored(db, raw_hash, dhash_value=0b1, ref_count=refs)
+
+    assert find_near(db, 0b11).content_hash == "f" * 64
+
+
+def test_near_hit_on_an_alias_resolves_it(db):
+    obj = _stored(db, "a" * 64, dhash_value=-1)
+    add_alias(db, "b" * 64, 0b111, obj)
+    db.commit()
+
+    assert find_near(db, 0b110) is obj
+
+
+def test_alias_insert_ignores_an_indexed_hash_on_other_dialects(db, monkeypatch):
+    obj = _stored(db, "a" * 64)
+    other = _stored(db, "c" * 64)
+    monkeypatch.setattr(db.get_bind().dialect, "name", "mssql")
+
+    add_alias(db, "b" * 64, 0, obj)
+    add_alias(db, "c" * 64, 0, obj)  # Already indexed: left as is, the transaction goes on
+    db.commit()
+
+    assert db.get(ImageObject, "b" * 64).image_url == obj.image_url
+    db.refresh(other)
+    assert other.ref_count == 1 and other.image_url == f"/media/{'c' * 64}.jpg"
@@ -0,0 +1,86 @@
+"""/nearby bodies: the packed columnar encoding decodes back to the JSON entries"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.hazard import STATUS_FAILED, STATUS_PENDING, STATUS_READY
+from app.services.hazard_encoding import (
+    NEARBY_PACKED_CONTENT_TYPE, decode_nearby_packed, encode_nearby_packed,
+)
+
+BASE = "https://storage.example.com/safar/hazards/"
+START = datetime(2026, 10, 18, 10, 0, tzinfo=timezone.utc)
+
+
+def _item(n, **fields):
+    item = {
+        "hazard_id": str(uuid.uuid4()), "latitude": 28.6 + n / 1000, "longitude": 77.2 - n / 1000,
+        "confidence": 0.5 + n / 20, "timestamp": (START + timedelta(seconds=97 * n)).isoformat(),
+        "image_url": f"{BASE}{n:04d}.jpg", "thumbnail_url": f"{BASE}{n:04d}_thumbnail.webp",
+        "medium_url": f"{BASE}{n:04d}_medium.jpg", "status": STATUS_READY,
+        "report_count": n + 1, "aggregate_confidence": 0.9,
+    }
+    item.update(fields)
+    return item
+
+
+def _assert_round_trip(rows, decoded):
+    assert len(decoded) == len(rows)
+    for (item, distance), back in zip(rows, decoded):
+        for key in ("hazard_id", "image_url", "thumbnail_url", "medium_url", "status", "report_count"):
+            assert back[key] == item[key], key
+        for key in ("latitude", "longitude", "confidence"):
+            assert back[key] == pytest.approx(item[key], abs=1e-5)  # float32
+        if item["aggregate_confidence"] is None:
+            assert back["aggregate_confidence"] is None
+        else:
+            assert back["aggregate_confidence"] == pytest.approx(item["aggregate_confidence"], abs=1e-6)
+        assert back["distance_km"] == pytest.approx(distance / 1000, abs=1e-6)
+        assert back["timestamp"] == int(datetime.fromisoformat(item["timestamp"]).timestamp())
+
+
+def test_round_trip_of_mixed_rows():
+    rows = [
+        (_item(0), 12.5),
+        (_item(1, status=STATUS_PENDING, image_url=None, thumbnail_url=None, medium_url=None,
+               aggregate_confidence=None), 40.0),
+        # Derivatives on another host: nothing shared with the image URL
+        (_item(2, thumbnail_url="https://cdn.example.org/t/2.webp", medium_url=None), 130.25),
+        (_item(3, status=STATUS_FAILED, image_url="https://other.example.net/é/3.jpg",
+               timestamp="2026-10-18T09:00:00"), 4999.0),  # Naive timestamps are UTC
+    ]
+    _assert_round_trip(rows, decode_nearby_packed(encode_nearby_packed(rows)))
+
+
+def test_shared_url_prefix_is_sent_once():
+    rows = [(_item(n), float(n)) for n in range(50)]
+    body = encode_nearby_packed(rows)
+
+    _assert_round_trip(rows, decode_nearby_packed(body))
+    assert body.count(BASE.encode()) == 1
+
+
+def test_empty_body():
+    assert decode_nearby_packed(encode_nearby_packed([])) == []
+
+
+def test_nearby_route_packed_matches_json(client, auth_headers, db, make_hazard):
+    db.add_all([
+        make_hazard(28.6139, 77.2090, image_url=f"{BASE}a.jpg", thumbnail_url=f"{BASE}a_thumbnail.jpg"),
+        make_hazard(28.6150, 77.2100, status=STATUS_PENDING, aggregate_confidence=None),
+    ])
+    db.commit()
+    params = {"latitude": 28.614, "longitude": 77.209, "radius_km": 1}
+
+    as_json = client.get("/api/v1/hazards/nearby", params=params, headers=auth_headers).json()["hazards"]
+    packed = client.get("/api/v1/hazards/nearby", params=params,
+                        headers={**auth_headers, "Accept": NEARBY_PACKED_CONTENT_TYPE})
+
+    assert packed.headers["content-type"] == NEARBY_PACKED_CONTENT_TYPE
+    decoded = decode_nearby_packed(packed.content)
+    assert [h["hazard_id"] for h in decoded] == [h["hazard_id"] for h in as_json]
+    for back, item in zip(decoded, as_json):
+        assert back["distance_km"] == pytest.approx(item["distance_km"], abs=0.005)  # JSON rounds to 10 m
+        _assert_round_trip([(dict(item), back["distance_km"] * 1000)], [back])
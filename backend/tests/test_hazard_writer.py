@@ -0,0 +1,102 @@
+"""Hazard writer: group commit retries and publishing stored hazards"""
+
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.models.hazard import STATUS_PENDING, STATUS_READY, Hazard
+from app.services import hazard_writer
+from app.services.hazard_writer import publish_hazards
+from app.services.ingestion_service import ingestion_pool
+
+
+class _Recorder:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, hazard, event):
+        self.events.append((hazard.hazard_id, event))
+
+    def watching(self, latitude, longitude):
+        return True
+
+
+class _BrokenCache:
+    async def invalidate_many(self, points):
+        raise ConnectionError("redis down")
+
+
+def _broken_engine():
+    raise RuntimeError("index unavailable")
+
+
+def test_publish_queues_pending_hazards_when_notifiers_fail(make_hazard, run_async, monkeypatch):
+    pending, ready = make_hazard(28.6, 77.2, status=STATUS_PENDING), make_hazard(28.7, 77.2, status=STATUS_READY)
+    queued, stream = [], _Recorder()
+    monkeypatch.setattr(ingestion_pool, "submit", queued.append)
+    monkeypatch.setattr(hazard_writer, "get_spatial_engine", _broken_engine)
+    monkeypatch.setattr(hazard_writer, "get_nearby_cache", _BrokenCache)
+    monkeypatch.setattr(hazard_writer, "get_hazard_stream", lambda: stream)
+
+    run_async(publish_hazards(None, [pending, ready], [pending, ready]))
+
+    assert queued == [pending.hazard_id]
+    assert [hazard_id for hazard_id, _ in stream.events] == [pending.hazard_id, ready.hazard_id]
+
+
+def _report(make_hazard, offset_m, **fields):
+    return make_hazard(28.6 + offset_m / 111195, 77.2, status=STATUS_PENDING, geohash=None, report_count=None,
+                       aggregate_confidence=None, last_reported_at=None, **fields)
+
+
+def test_failed_group_is_retried_one_by_one(db, make_hazard, run_async, monkeypatch):
+    monkeypatch.setattr(ingestion_pool, "submit", lambda hazard_id: None)
+    first = _report(make_hazard, 0, confidence=0.5)
+    second = _report(make_hazard, 5, confidence=0.5)
+    bad = _report(make_hazard, 1000, confidence=1.5)  # Violates confidence_range: fails the group
+    writer = hazard_writer.HazardWriter(batch_size=8, batch_wait_ms=0)
+    group_sizes = []
+    store_hazards = hazard_writer.store_hazards
+
+    async def spy(db, hazards):
+        group_sizes.append(len(hazards))
+        return await store_hazards(db, hazards)
+    monkeypatch.setattr(hazard_writer, "store_hazards", spy)
+
+    async def store_together():
+        results = await asyncio.gather(*[writer.submit(h) for h in (first, second, bad)], return_exceptions=True)
+        await writer.stop()
+        return results
+
+    stored_first, stored_second, error = run_async(store_together())
+
+    assert group_sizes == [3, 1, 1, 1]
+    assert isinstance(error, IntegrityError)
+    assert stored_first.hazard_id == stored_second.hazard_id == first.hazard_id
+    db.expire_all()
+    rows = {hazard.hazard_id: hazard for hazard in db.query(Hazard)}
+    assert set(rows) == {first.hazard_id, second.hazard_id}
+    # The merge of the failed attempt is not counted twice
+    assert rows[first.hazard_id].report_count == 2
+    assert rows[first.hazard_id].aggregate_confidence == pytest.approx(0.75)
+    assert rows[second.hazard_id].canonical_id == first.hazard_id
+
+
+def test_merged_canonical_is_streamed_with_its_new_aggregates(db, make_hazard, run_async, monkeypatch):
+    canonical = make_hazard(28.6, 77.2, confidence=0.5, aggregate_confidence=0.5)
+    db.add(canonical)
+    db.commit()
+    published = []
+    stream = _Recorder()
+    stream.publish = lambda hazard, event: published.append((hazard.hazard_id, event, hazard.report_count))
+    monkeypatch.setattr(hazard_writer, "get_hazard_stream", lambda: stream)
+    monkeypatch.setattr(ingestion_pool, "submit", lambda hazard_id: None)
+    writer = hazard_writer.HazardWriter(batch_size=1, batch_wait_ms=0)
+
+    report = _report(make_hazard, 3, confidence=0.5)
+    stored = run_async(writer.submit(report))
+
+    assert stored.hazard_id == canonical.hazard_id
+    assert stored.report_count == 2
+    assert published == [(canonical.hazard_id, hazard_writer.EVENT_UPDATED, 2)]
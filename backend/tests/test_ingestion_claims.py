@@ -0,0 +1,87 @@
+"""Ingestion claims: processes sharing pending hazards never process one twice"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.models.hazard import STATUS_PENDING, Hazard
+from app.services import ingestion_service
+from app.services.ingestion_service import PROCESS_ID, _claim, ingestion_pool, recover_pending_hazards, spool_path
+
+
+@pytest.fixture
+def pending(db, make_hazard):
+    def make(spooled=True, **fields):
+        hazard = make_hazard(28.61, 77.21, **{"status": STATUS_PENDING, **fields})
+        db.add(hazard)
+        db.commit()
+        if spooled:
+            os.makedirs(settings.SPOOL_DIR, exist_ok=True)
+            with open(spool_path(hazard.hazard_id), "wb") as f:
+                f.write(b"raw")
+        return hazard
+    yield make
+    for name in os.listdir(settings.SPOOL_DIR) if os.path.isdir(settings.SPOOL_DIR) else ():
+        os.remove(os.path.join(settings.SPOOL_DIR, name))
+
+
+def _later(seconds=60):
+    return datetime.now(timezone.utc) + timedelta(seconds=seconds)
+
+
+def test_claim_takes_free_and_expired_hazards(db, pending):
+    free = pending()
+    expired = pending(claimed_by="other-host:1:abc", claimed_until=_later(-60))
+
+    assert _claim(db, free.hazard_id)
+    assert _claim(db, expired.hazard_id)
+    assert _claim(db, free.hazard_id)  # Renewing our own claim
+    db.expire_all()
+    assert free.claimed_by == expired.claimed_by == PROCESS_ID
+    assert free.processing_attempts == 2
+
+
+@pytest.mark.parametrize("spooled", [True, False])
+def test_hazard_claimed_elsewhere_is_left_alone(db, pending, spooled):
+    hazard = pending(spooled=spooled, claimed_by="other-host:1:abc", claimed_until=_later())
+
+    ingestion_pool._process(hazard.hazard_id)
+
+    db.expire_all()
+    # A missing spool file is not a failure: the owner may have the image
+    assert hazard.status == STATUS_PENDING
+    assert hazard.processing_attempts == 0
+    assert os.path.exists(spool_path(hazard.hazard_id)) == spooled
+
+
+def test_finished_hazard_is_not_claimed(db, pending):
+    hazard = pending(status="ready")
+    assert not _claim(db, hazard.hazard_id)
+
+    ingestion_pool._process(hazard.hazard_id)
+    assert not os.path.exists(spool_path(hazard.hazard_id))
+
+
+def test_recovery_queues_only_locally_spooled_pending_hazards(db, pending, monkeypatch):
+    local = pending()
+    pending(spooled=False)  # Spooled on another host
+    pending(status="ready")
+    queued = []
+    monkeypatch.setattr(ingestion_pool, "submit", queued.append)
+
+    assert recover_pending_hazards() == 1
+    assert queued == [local.hazard_id]
+    assert db.query(Hazard).count() == 3
+
+
+def test_unexpected_errors_do_not_fail_a_hazard_claimed_elsewhere(db, pending, monkeypatch):
+    hazard = pending(claimed_by="other-host:1:abc", claimed_until=_later())
+    monkeypatch.setattr(ingestion_pool, "max_retries", 1)
+    monkeypatch.setattr(ingestion_service, "discard_spool", lambda hazard_id: pytest.fail("spool discarded"))
+
+    ingestion_pool._unexpected_error(hazard.hazard_id)
+
+    db.expire_all()
+    assert hazard.status == STATUS_PENDING
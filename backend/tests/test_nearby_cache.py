@@ -0,0 +1,90 @@
+"""/nearby cache: exact invalidation across geohash cells, local version counters"""
+
+import asyncio
+
+import pytest
+
+from app.services.nearby_cache import AsyncFakeRedis, FakeRedis, NearbyCache
+from app.utils import geohash_bounds, geohash_encode
+
+LAT, LON = 28.6139, 77.2090
+RADIUS_M = 500  # Version cells of geohash precision 5
+
+
+def _cache(redis=None, version_ttl=60.0):
+    redis = redis or FakeRedis()
+    return NearbyCache(AsyncFakeRedis(redis), redis, 64, 30, 7, version_ttl_seconds=version_ttl)
+
+
+class _Loader:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, lat, lon, radius_m, limit):
+        self.calls += 1
+        return [({"latitude": LAT, "longitude": LON}, 0.0)]
+
+
+def _lookup(cache, load, latitude=LAT, longitude=LON):
+    return asyncio.run(cache.lookup(latitude, longitude, RADIUS_M, 10, load))[1]
+
+
+def _edge_points():
+    """A query point 50 m inside its version cell's north edge and a point 50 m across it"""
+    max_lat = geohash_bounds(geohash_encode(LAT, LON, 5))[2]
+    inside, across = (max_lat - 50 / 111195, LON), (max_lat + 50 / 111195, LON)
+    assert geohash_encode(*inside, 5) != geohash_encode(*across, 5)
+    return inside, across
+
+
+def test_hazard_across_a_version_cell_boundary_invalidates():
+    cache, load = _cache(), _Loader()
+    inside, across = _edge_points()
+    assert _lookup(cache, load, *inside) == "miss"
+    assert _lookup(cache, load, *inside) == "hit_local"
+
+    asyncio.run(cache.invalidate(*across))
+
+    assert _lookup(cache, load, *inside) == "miss"
+    assert load.calls == 2
+
+
+def test_hazard_outside_every_covering_cell_keeps_the_entry():
+    cache, load = _cache(), _Loader()
+    _lookup(cache, load)
+
+    asyncio.run(cache.invalidate(LAT + 0.5, LON))  # ~55 km north
+
+    assert _lookup(cache, load) == "hit_local"
+
+
+def test_version_counters_are_read_from_redis_once_per_ttl(monkeypatch):
+    redis = FakeRedis()
+    cache, load = _cache(redis), _Loader()
+    reads = []
+    mget = redis.mget
+    monkeypatch.setattr(redis, "mget", lambda keys: reads.append(keys) or mget(keys))
+
+    _lookup(cache, load)
+    _lookup(cache, load)
+    cache.invalidate_blocking(LAT, LON)  # Our own invalidation updates the local counters
+    assert _lookup(cache, load) == "miss"
+
+    assert len(reads) == 1
+
+
+@pytest.mark.parametrize("version_ttl, outcome", [(0, "miss"), (60.0, "hit_local")])
+def test_other_processes_invalidations_show_up_after_the_ttl(version_ttl, outcome):
+    redis = FakeRedis()
+    cache, other, load = _cache(redis, version_ttl), _cache(redis), _Loader()
+    _lookup(cache, load)
+
+    other.invalidate_blocking(LAT, LON)
+
+    assert _lookup(cache, load) == outcome
+
+
+def test_nearby_rejects_a_limit_below_one(client, auth_headers):
+    response = client.get("/api/v1/hazards/nearby", params={"latitude": LAT, "longitude": LON, "limit": 0},
+                          headers=auth_headers)
+    assert response.status_code == 400
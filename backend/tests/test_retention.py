@@ -0,0 +1,109 @@
+"""Retention: stale hazards leave the table, map tiles and sync in one transaction"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.config import settings
+from app.models.hazard import Hazard, hazards_archive
+from app.models.tile_cell import HazardTileCell
+from app.models.tombstone import HazardTombstone
+from app.services import retention_service
+from app.services.retention_service import archive_stale_hazards, run_maintenance
+from app.services.tile_service import CELL_BITS, record_hazards
+
+NOW = datetime.now(timezone.utc)
+CUTOFF = NOW - timedelta(days=90)
+
+
+@pytest.fixture
+def hazards(db, make_hazard):
+    """Ids of a stale canonical, its stale duplicate report, and a canonical still reported"""
+    stale = make_hazard(28.61, 77.21, detected_at=CUTOFF - timedelta(days=30))
+    report = make_hazard(28.61, 77.21, detected_at=CUTOFF - timedelta(days=29), canonical_id=stale.hazard_id)
+    # Detected long ago, but reported again since: kept
+    current = make_hazard(28.62, 77.22, detected_at=CUTOFF - timedelta(days=30), last_reported_at=NOW)
+    db.add_all([stale, report, current])
+    record_hazards(db, [stale, current])
+    db.commit()
+    return stale.hazard_id, report.hazard_id, current.hazard_id
+
+
+def _state(db):
+    """(hazard ids, archived ids, tombstone ids, hazards counted in the map tiles)"""
+    return (
+        {hazard_id for (hazard_id,) in db.query(Hazard.hazard_id)},
+        {row.hazard_id for row in db.execute(select(hazards_archive.c.hazard_id))},
+        {hazard_id for (hazard_id,) in db.query(HazardTombstone.hazard_id)},
+        db.query(func.sum(HazardTileCell.hazard_count)).filter(HazardTileCell.z == CELL_BITS).scalar(),
+    )
+
+
+@pytest.mark.parametrize("archive", [True, False])
+def test_stale_hazards_leave_every_structure(db, hazards, monkeypatch, archive):
+    stale, report, current = hazards
+    commits = []
+    commit = db.commit
+    monkeypatch.setattr(db, "commit", lambda: commits.append(1) or commit())
+
+    assert archive_stale_hazards(db, CUTOFF, batch_size=10, archive=archive) == 2
+
+    assert len(commits) == 1
+    remaining, archived, tombstones, in_tiles = _state(db)
+    assert remaining == {current}
+    assert archived == ({stale, report} if archive else set())
+    assert tombstones == {stale}  # Duplicate reports were never synced
+    assert in_tiles == 1
+    assert archive_stale_hazards(db, CUTOFF, batch_size=10, archive=archive) == 0
+
+
+def test_a_failed_batch_changes_nothing(db, hazards, monkeypatch):
+    before = _state(db)
+
+    def fail():
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        archive_stale_hazards(db, CUTOFF, batch_size=10)
+    db.rollback()
+
+    assert _state(db) == before
+
+
+def test_spatial_index_and_nearby_cache_drop_archived_hazards(db, hazards, monkeypatch):
+    stale, _, _ = hazards
+    deleted, invalidated = [], []
+
+    class Spatial:
+        def on_delete(self, hazard_id):
+            deleted.append(hazard_id)
+
+    class Cache:
+        def invalidate_many_blocking(self, points):
+            invalidated.extend(points)
+    monkeypatch.setattr(retention_service, "get_spatial_engine", Spatial)
+    monkeypatch.setattr(retention_service, "get_nearby_cache", Cache)
+
+    archive_stale_hazards(db, CUTOFF, batch_size=10)
+
+    assert deleted == [stale]
+    assert invalidated == [(28.61, 77.21)]
+
+
+def test_maintenance_pass_archives_in_batches_and_prunes_tombstones(db, make_hazard, monkeypatch):
+    old = [make_hazard(28.6 + n / 100, 77.2, detected_at=CUTOFF - timedelta(days=1)) for n in range(5)]
+    db.add_all(old)
+    db.add(HazardTombstone(hazard_id=make_hazard(0, 0).hazard_id, latitude=0, longitude=0,
+                           deleted_at=NOW - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1)))
+    db.commit()
+    monkeypatch.setattr(settings, "RETENTION_DAYS", 90)
+    monkeypatch.setattr(settings, "RETENTION_BATCH_SIZE", 2)
+
+    report = run_maintenance(now=NOW)
+
+    assert (report["archived"], report["tombstones_pruned"]) == (5, 1)
+    db.expire_all()
+    assert db.query(Hazard).count() == 0
+    # Fresh tombstones of the archived hazards are kept
+    assert db.query(HazardTombstone).count() == 5
@@ -0,0 +1,163 @@
+"""In-process grid index against brute-force haversine, and encoded polylines"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.services.spatial_engine import GridIndex, haversine_m_vec
+from app.utils import decode_polyline, encode_polyline, haversine_m
+
+# (latitude, longitude) centres: mid-latitude, across the antimeridian, near a pole
+CENTRES = [(28.61, 77.21), (0.5, 179.98), (-0.5, -179.99), (88.9, 10.0)]
+
+
+def _points(seed=0, count=400, spread_deg=0.3):
+    rng = random.Random(seed)
+    points = {}
+    for n in range(count):
+        lat, lon = CENTRES[n % len(CENTRES)]
+        lat = max(-90.0, min(90.0, lat + rng.uniform(-spread_deg, spread_deg)))
+        lon = (lon + rng.uniform(-spread_deg, spread_deg) + 180) % 360 - 180
+        points[n] = (lat, lon)
+    return points
+
+
+@pytest.fixture
+def index():
+    grid = GridIndex(cell_deg=0.05, capacity=16)  # Small capacity: grows while loading
+    for key, (lat, lon) in _points().items():
+        grid.add(key, lat, lon)
+    return grid
+
+
+def _brute_force(points, lat, lon):
+    return sorted(((haversine_m(lat, lon, *point), key) for key, point in points.items()))
+
+
+@pytest.mark.parametrize("centre", CENTRES)
+@pytest.mark.parametrize("radius_m", [50, 2000, 25000])
+def test_query_radius_matches_brute_force(index, centre, radius_m):
+    expected = [(key, distance) for distance, key in _brute_force(_points(), *centre) if distance <= radius_m]
+
+    hits = index.query_radius(*centre, radius_m)
+
+    assert [key for key, _ in hits] == [key for key, _ in expected]
+    assert [distance for _, distance in hits] == pytest.approx([distance for _, distance in expected])
+
+
+@pytest.mark.parametrize("centre", CENTRES)
+def test_nearest_matches_brute_force(index, centre):
+    expected = [key for _, key in _brute_force(_points(), *centre)[:7]]
+    assert [key for key, _ in index.nearest(*centre, 7)] == expected
+
+
+def test_radius_limit_keeps_the_nearest(index):
+    centre = CENTRES[0]
+    expected = [key for distance, key in _brute_force(_points(), *centre) if distance <= 25000][:5]
+    assert [key for key, _ in index.query_radius(*centre, 25000, limit=5)] == expected
+
+
+def test_moved_and_removed_points_leave_their_old_cells(index):
+    points = _points()
+    index.add(0, 10.0, 10.0)  # Moved far from its centre
+    assert index.remove(1) and not index.remove(1)
+    del points[1]
+    points[0] = (10.0, 10.0)
+
+    centre = CENTRES[0]
+    expected = [key for distance, key in _brute_force(points, *centre) if distance <= 25000]
+    assert [key for key, _ in index.query_radius(*centre, 25000)] == expected
+    assert index.nearest(10.0, 10.0, 1)[0][0] == 0
+    assert len(index) == len(points)
+
+
+# Route corridor (user position first): a bend, then a run across the antimeridian
+ROUTES = [
+    [(28.600, 77.200), (28.610, 77.210), (28.612, 77.230), (28.630, 77.231)],
+    [(0.49, 179.97), (0.50, 179.99), (0.51, -179.99), (0.52, -179.97)],
+]
+
+
+def _densify(route, step_m=1.0):
+    """Points every step_m along the route (great circle steps), with their distance along it"""
+    points, along, start = [], [], 0.0
+    for (lat0, lon0), (lat1, lon1) in zip(route, route[1:]):
+        lon1 = lon0 + (lon1 - lon0 + 180) % 360 - 180
+        length = haversine_m(lat0, lon0, lat1, lon1)
+        steps = max(1, int(length / step_m))
+        for s in range(steps + 1):
+            t = s / steps
+            points.append((lat0 + t * (lat1 - lat0), (lon0 + t * (lon1 - lon0) + 180) % 360 - 180))
+            along.append(start + t * length)
+        start += length
+    return np.array(points), np.array(along)
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_corridor_matches_brute_force(route):
+    buffer_m = 60.0
+    rng = random.Random(1)
+    grid, points = GridIndex(cell_deg=0.01), {}
+    for key in range(300):
+        lat0, lon0 = route[rng.randrange(len(route))]
+        lat, lon = lat0 + rng.uniform(-0.01, 0.01), (lon0 + rng.uniform(-0.01, 0.01) + 180) % 360 - 180
+        points[key] = (lat, lon)
+        grid.add(key, lat, lon)
+    dense, dense_along = _densify(route)
+
+    expected = {}
+    for key, (lat, lon) in points.items():
+        distances = haversine_m_vec(lat, lon, dense[:, 0], dense[:, 1])
+        nearest = int(np.argmin(distances))
+        expected[key] = (float(dense_along[nearest]), float(distances[nearest]))
+
+    hits = {key: (along, offset) for key, along, offset in grid.query_corridor(route, buffer_m)}
+
+    # Points within a meter of the buffer edge may fall either way (planar approximation)
+    assert {k for k, (_, o) in expected.items() if o <= buffer_m - 1} <= set(hits)
+    assert set(hits) <= {k for k, (_, o) in expected.items() if o <= buffer_m + 1}
+    for key, (along, offset) in hits.items():
+        assert along == pytest.approx(expected[key][0], abs=3)
+        assert offset == pytest.approx(expected[key][1], abs=1)
+    ordered = [along for _, along, _ in grid.query_corridor(route, buffer_m)]
+    assert ordered == sorted(ordered)
+    assert [key for key, *_ in grid.query_corridor(route, buffer_m, limit=3)] == \
+           [key for key, *_ in grid.query_corridor(route, buffer_m)][:3]
+
+
+def test_decode_polyline_reference_example():
+    # The example from Google's encoded polyline format documentation
+    assert decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@") == [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+
+
+@pytest.mark.parametrize("precision", [5, 6])
+def test_polyline_round_trip(precision):
+    route = [(28.613912, 77.209021), (28.6, 77.2), (-33.86882, 151.20929), (0.0, -179.999999)]
+    decoded = decode_polyline(encode_polyline(route, precision), precision)
+    assert decoded == [pytest.approx(point, abs=10 ** -precision) for point in route]
+
+
+@pytest.mark.parametrize("encoded", ["_p~iF~ps|U_ulL", "_p~iF", "_p~iF~ps|U_ulL nnqC"])
+def test_malformed_polylines_are_rejected(encoded):
+    with pytest.raises(ValueError):
+        decode_polyline(encoded)
+
+
+def test_route_endpoint_lists_hazards_in_the_order_they_are_reached(client, auth_headers, db, make_hazard):
+    later, first, off_route = make_hazard(28.611, 77.220), make_hazard(28.6005, 77.2005), make_hazard(28.62, 77.20)
+    db.add_all([later, first, off_route])
+    db.commit()
+
+    response = client.post("/api/v1/hazards/route", headers=auth_headers,
+                           json={"polyline": encode_polyline(ROUTES[0]), "buffer_m": 50})
+
+    hazards = response.json()["hazards"]
+    assert [h["hazard_id"] for h in hazards] == [str(first.hazard_id), str(later.hazard_id)]
+    assert hazards[0]["route_distance_km"] < hazards[1]["route_distance_km"]
+    assert all(h["offset_m"] <= 50 for h in hazards)
+
+
+def test_route_endpoint_rejects_a_malformed_polyline(client, auth_headers):
+    response = client.post("/api/v1/hazards/route", headers=auth_headers, json={"polyline": "_p~iF~ps|U_ulL"})
+    assert response.status_code == 400
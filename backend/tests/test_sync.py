@@ -0,0 +1,96 @@
+"""Delta sync: cursor paging over hazards and tombstones, expired cursors"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.models.tombstone import HazardTombstone
+from app.services.sync_service import CursorExpired, changes, decode_cursor, encode_cursor, record_deletions
+
+REGION = (28.0, 77.0, 29.0, 78.0)
+
+
+@pytest.fixture(autouse=True)
+def no_settle(monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SECONDS", 0)
+
+
+@pytest.fixture
+def history(db, make_hazard):
+    """Seven changes in the region a minute apart (alternating hazards and tombstones), plus noise"""
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    expected = []
+    for n in range(7):
+        at = start + timedelta(minutes=n)
+        if n % 3 == 2:
+            tombstone = HazardTombstone(hazard_id=uuid.uuid4(), latitude=28.5, longitude=77.5, deleted_at=at)
+            db.add(tombstone)
+            expected.append(("deleted", str(tombstone.hazard_id)))
+        else:
+            hazard = make_hazard(28.5, 77.5 + n / 100, updated_at=at)
+            db.add(hazard)
+            expected.append(("hazard", str(hazard.hazard_id)))
+    canonical = make_hazard(28.6, 77.6, updated_at=start - timedelta(minutes=1))
+    db.add_all([
+        canonical,
+        make_hazard(28.6, 77.6, canonical_id=canonical.hazard_id, updated_at=start),  # Merged report
+        make_hazard(40.0, 77.5, updated_at=start),  # Outside the region
+        HazardTombstone(hazard_id=uuid.uuid4(), latitude=40.0, longitude=77.5, deleted_at=start),
+    ])
+    db.commit()
+    return [("hazard", str(canonical.hazard_id))] + expected
+
+
+def _sync_all(db, since=None, limit=3):
+    """Page until has_more is false: ([set of changes per page], last cursor)"""
+    pages = []
+    while True:
+        page = changes(db, REGION, since, limit)
+        pages.append({("hazard", item["hazard_id"]) for item in page["hazards"]}
+                     | {("deleted", hazard_id) for hazard_id in page["deleted"]})
+        assert len(page["hazards"]) + len(page["deleted"]) == len(pages[-1]) <= limit
+        since = decode_cursor(page["cursor"])
+        if not page["has_more"]:
+            return pages, since
+
+
+def test_pages_merge_hazards_and_tombstones_in_order(db, history):
+    pages, _ = _sync_all(db)
+
+    # Eight changes in pages of three, oldest first; noise never shows up
+    assert pages == [set(history[0:3]), set(history[3:6]), set(history[6:8])]
+
+
+def test_next_sync_returns_only_newer_changes(db, history, make_hazard):
+    _, cursor = _sync_all(db)
+    assert _sync_all(db, cursor)[0] == [set()]
+
+    hazard = make_hazard(28.5, 77.9)
+    db.add(hazard)
+    db.commit()
+    record_deletions(db, [hazard])
+    db.commit()
+
+    pages, _ = _sync_all(db, cursor)
+    assert pages == [{("hazard", str(hazard.hazard_id)), ("deleted", str(hazard.hazard_id))}]
+
+
+def test_cursor_older_than_the_tombstones_expires(db):
+    too_old = datetime.now(timezone.utc) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS, minutes=1)
+
+    with pytest.raises(CursorExpired):
+        changes(db, REGION, (too_old, uuid.uuid4()), 10)
+
+
+def test_sync_route_answers_410_for_expired_and_400_for_invalid_cursors(client, auth_headers):
+    params = dict(min_latitude=28, min_longitude=77, max_latitude=29, max_longitude=78)
+    too_old = datetime.now(timezone.utc) - timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1)
+
+    expired = client.get("/api/v1/hazards/sync", params={**params, "since": encode_cursor((too_old, uuid.uuid4()))},
+                         headers=auth_headers)
+    invalid = client.get("/api/v1/hazards/sync", params={**params, "since": "not-a-cursor"}, headers=auth_headers)
+
+    assert expired.status_code == 410
+    assert invalid.status_code == 400
@@ -0,0 +1,61 @@
+"""Map tiles: pre-aggregated counts and the packed encoding"""
+
+import struct
+
+import pytest
+
+from app.services.tile_service import PACKED_CONTENT_TYPE, PACKED_MAGIC, record_hazards, remove_hazards, tile_xy
+
+Z = 9
+POINTS = [(28.6139, 77.2090), (28.6141, 77.2093), (28.6200, 77.2300), (28.6010, 77.1950)]
+
+
+def _decode_packed(body: bytes) -> dict:
+    """Inverse of tile_service.encode_packed"""
+    magic, z, x, y, total, n = struct.unpack_from("<4sBIIIH", body)
+    assert magic == PACKED_MAGIC
+    offset = struct.calcsize("<4sBIIIH")
+    clusters = [list(struct.unpack_from("<ffI", body, offset + 12 * i)) for i in range(n)]
+    assert len(body) == offset + 12 * n
+    return {"z": z, "x": x, "y": y, "count": total, "clusters": clusters}
+
+
+@pytest.fixture
+def tile(db, make_hazard):
+    hazards = [make_hazard(lat, lon) for lat, lon in POINTS]
+    db.add_all(hazards)
+    record_hazards(db, hazards)
+    db.commit()
+    x, y = tile_xy(*POINTS[0], Z)
+    assert all(tile_xy(lat, lon, Z) == (x, y) for lat, lon in POINTS)
+    return hazards, f"/api/v1/hazards/tiles/{Z}/{x}/{y}"
+
+
+def test_packed_tile_decodes_to_the_json_tile(client, auth_headers, tile):
+    _, path = tile
+    as_json = client.get(path, headers=auth_headers).json()
+    response = client.get(path, params={"format": "packed"}, headers=auth_headers)
+
+    assert response.headers["content-type"] == PACKED_CONTENT_TYPE
+    packed = _decode_packed(response.content)
+    assert {key: packed[key] for key in ("z", "x", "y", "count")} == \
+           {key: as_json[key] for key in ("z", "x", "y", "count")}
+    assert as_json["count"] == len(POINTS)
+    assert len(packed["clusters"]) == len(as_json["clusters"])
+    for (lat, lon, count), expected in zip(packed["clusters"], as_json["clusters"]):
+        assert (lat, lon) == pytest.approx(tuple(expected[:2]), abs=1e-5)  # float32
+        assert count == expected[2]
+    assert sum(count for *_, count in as_json["clusters"]) == len(POINTS)
+
+
+def test_removed_hazards_leave_the_counts(db, client, auth_headers, tile):
+    hazards, path = tile
+    first = client.get(path, headers=auth_headers)
+
+    remove_hazards(db, hazards[:3])
+    db.commit()
+    response = client.get(path, headers={**auth_headers, "If-None-Match": first.headers["ETag"]})
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+    assert response.json()["clusters"] == [[round(POINTS[3][0], 6), round(POINTS[3][1], 6), 1]]